@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for story parsing: offset-based StorySection objects versus the
+previous dict sections that copied the story before and after every interaction.
+
+Usage: python bench_parse_story.py [--interactions 100 200 400] [--paragraph-words 60]
+"""
+
+import argparse
+import random
+import re
+import time
+import tracemalloc
+
+from story_sections import parse_story_sections
+
+WORDS = ["Sparky", "butterfly", "garden", "box", "rainbow", "button", "friend", "flower",
+         "happy", "jumped", "looked", "found", "magical", "tiny", "bright", "forest"]
+
+
+def generate_story(num_interactions, paragraph_words=60, seed=0):
+    """Generate a long story with num_interactions interaction tags and a closing summary tag."""
+    rng = random.Random(seed)
+    parts = []
+    for i in range(num_interactions):
+        paragraph = " ".join(rng.choice(WORDS) for _ in range(paragraph_words))
+        parts.append(f"{paragraph}.\n\n<interaction vocab=\"{rng.choice(WORDS)}\" role=\"new\">"
+                     f"What do you think happens next ({i})?</interaction>\n\n")
+    parts.append("And they all lived happily ever after.\n\n"
+                 "<interaction vocab=\"summary\">What was your favorite part?</interaction>\n")
+    return "".join(parts)
+
+
+def legacy_parse_story(story_content, special_tags=("summary",)):
+    """The previous parse_story implementation, which stored full context copies per section."""
+    interaction_pattern = r'<interaction(?: vocab="([^"]*)")?(?:\s+role="([^"]*)")?>([^<]*)</interaction>'
+    interaction_matches = list(re.finditer(interaction_pattern, story_content, re.DOTALL))
+    sections = []
+    last_end = 0
+    for match in interaction_matches:
+        vocab = match.group(1) if match.group(1) else None
+        special_tag = vocab if vocab in special_tags else None
+        target_vocab = vocab if vocab and not special_tag else None
+        prompt = match.group(3).strip()
+        sections.append({
+            "text": story_content[last_end:match.start()] + f"<interaction>{prompt}</interaction>",
+            "prompt": prompt,
+            "vocab": target_vocab,
+            "vocab_role": match.group(2) if match.group(2) else None,
+            "special_tag": special_tag,
+            "context_before": story_content[:match.start()],
+            "context_after": story_content[match.end():]
+        })
+        last_end = match.end()
+    if last_end < len(story_content):
+        sections.append({"text": story_content[last_end:], "prompt": None, "vocab": None, "vocab_role": None,
+                         "special_tag": None, "context_before": "", "context_after": ""})
+    return sections
+
+
+def measure(parse, story):
+    """Return (retained bytes, peak bytes, seconds) for parsing story with parse."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    sections = parse(story)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del sections
+    return retained, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--interactions", type=int, nargs="+", default=[100, 200, 400])
+    parser.add_argument("--paragraph-words", type=int, default=60)
+    args = parser.parse_args()
+
+    print(f"{'interactions':>12} {'story KB':>9} | {'legacy KB':>10} {'legacy ms':>9} | "
+          f"{'offsets KB':>10} {'offsets ms':>10} | {'ratio':>6}")
+    for num_interactions in args.interactions:
+        story = generate_story(num_interactions, args.paragraph_words)
+        legacy_retained, _, legacy_time = measure(legacy_parse_story, story)
+        new_retained, _, new_time = measure(parse_story_sections, story)
+        print(f"{num_interactions:>12} {len(story) / 1024:>9.1f} | {legacy_retained / 1024:>10.1f} "
+              f"{legacy_time * 1000:>9.2f} | {new_retained / 1024:>10.1f} {new_time * 1000:>10.2f} | "
+              f"{legacy_retained / max(new_retained, 1):>5.0f}x")
+
+
+if __name__ == "__main__":
+    main()
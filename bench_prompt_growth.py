@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Compare prompt tokens per turn for a story_retelling ending under the previous
+recursive follow-up scheme (history appended to context_before and to the prompt
+at every depth) and the bounded ConversationState used by handle_interaction.
+Each turn counts the retelling evaluator request plus the response generation request.
+
+Usage: python bench_prompt_growth.py [--story-interactions 10] [--depth 6]
+"""
+
+import argparse
+
+from bench_parse_story import generate_story
+from conversation_state import ConversationState
+from response_generator import ResponseGenerator
+from story_sections import parse_story_sections
+
+CHILD_ANSWERS = [
+    "Sparky found a box in the garden",
+    "a butterfly came out",
+    "I don't know",
+    "they played together and were happy",
+    "the flowers",
+    "Sparky said goodbye to the butterfly"
+]
+ROBOT_RESPONSE = "That's a wonderful memory! What did Sparky do after that happened in the garden?"
+
+STORY_RETELLING = {"name": "story_retelling", "support_level": "medium", "complexity_score": 5}
+SPECIAL_INSTRUCTIONS = """
+                SPECIAL INSTRUCTIONS: This is the story retelling section.
+                - Ask the child to retell the story in their own words
+                """
+
+
+def count_tokens(text):
+    """Count tokens with tiktoken when it is installed, otherwise estimate at 4 characters per token."""
+    try:
+        import tiktoken
+        return len(tiktoken.encoding_for_model("gpt-4").encode(text))
+    except ImportError:
+        return len(text) // 4
+
+
+def prompt_tokens(generator, child_input, prompt, context_before, context_after):
+    """Tokens sent for one turn: the retelling evaluation plus the response generation."""
+    with open("prompts/retelling_system_prompt.txt") as f:
+        evaluator_tokens = count_tokens(f.read())
+    with open("prompts/retelling_user_prompt.txt") as f:
+        evaluator_tokens += count_tokens(f.read().format(context=context_before + context_after, response=child_input))
+    messages = generator._build_messages(child_input, prompt, context_before, context_after,
+                                         STORY_RETELLING, None, None, SPECIAL_INSTRUCTIONS)
+    return evaluator_tokens + sum(count_tokens(message["content"]) for message in messages)
+
+
+def legacy_turns(generator, section, depth):
+    """Prompt tokens per turn when each recursion appended the history to the context and the prompt."""
+    prompt, context_before = section.prompt, section.context_before
+    history, child_responses, tokens = [], [], []
+    for turn in range(depth):
+        child_input = CHILD_ANSWERS[turn % len(CHILD_ANSWERS)]
+        child_responses.append(child_input)
+        history.append({"role": "user", "content": child_input})
+        tokens.append(prompt_tokens(generator, child_input, prompt, context_before, section.context_after))
+        history.append({"role": "assistant", "content": ROBOT_RESPONSE})
+
+        context_before = context_before + "\n" + "\n".join(
+            f"{'Child' if item['role'] == 'user' else 'Robot'}: {item['content']}" for item in history[:-1]
+        )
+        conversation_context = "\nPrevious conversation:\n" + "\n".join(
+            f"{item['role'].capitalize()}: {item['content']}" for item in history
+        )
+        conversation_context += "\nPrevious responses from the child:\n"
+        for i, resp in enumerate(child_responses):
+            conversation_context += f"- Turn {i+1}: \"{resp}\"\n"
+        prompt = prompt + conversation_context
+    return tokens
+
+
+def bounded_turns(generator, section, depth):
+    """Prompt tokens per turn with one ConversationState rendered once per prompt."""
+    conversation = ConversationState(section.prompt)
+    tokens = []
+    for turn in range(depth):
+        child_input = CHILD_ANSWERS[turn % len(CHILD_ANSWERS)]
+        prompt = conversation.render_prompt()
+        conversation.add_child(child_input)
+        tokens.append(prompt_tokens(generator, child_input, prompt, section.context_before, section.context_after))
+        conversation.add_robot(ROBOT_RESPONSE)
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--story-interactions", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=6, help="Turns to simulate (story_retelling allows 6)")
+    args = parser.parse_args()
+
+    story = generate_story(args.story_interactions)
+    summary_section = [section for section in parse_story_sections(story) if section.special_tag == "summary"][0]
+    generator = ResponseGenerator(api_key="offline-benchmark")
+
+    legacy = legacy_turns(generator, summary_section, args.depth)
+    bounded = bounded_turns(generator, summary_section, args.depth)
+
+    print(f"story_retelling ending, story of {len(story)} characters")
+    print(f"{'depth':>5} | {'legacy tokens':>13} | {'bounded tokens':>14} | {'saved':>6}")
+    for depth, (old, new) in enumerate(zip(legacy, bounded), 1):
+        print(f"{depth:>5} | {old:>13} | {new:>14} | {1 - new / old:>6.1%}")
+    print(f"Total over {args.depth} turns: legacy {sum(legacy)}, bounded {sum(bounded)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for question detection: the single-pass detect_question versus
+the previous contains_question, which compiled and ran about 60 regexes per call.
+
+Usage: python bench_question_detector.py [--texts 2000] [--repeat 5]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from question_detector import detect_question
+
+SENTENCES = [
+    "That's a wonderful idea!", "Sparky found a tiny box in the garden.",
+    "What do you think was inside the box?", "I love how you noticed the butterfly.",
+    "Can you tell me more about the flowers", "Let's see what happens next.",
+    "Maybe the butterfly was looking for a friend.", "Why do you think Sparky smiled?",
+    "You remembered the magic word!", "Imagine if the box could talk",
+    "The rainbow button glowed brightly.", "Great job, Caro!"
+]
+
+
+def legacy_contains_question(text):
+    """The previous StoryInteractionHandler.contains_question implementation."""
+    if not text or not text.strip():
+        return False, None, None
+    clean_text = text.strip()
+    question_pattern = r"[A-Za-z0-9][^.!?]*\?\s*$"
+    question_match = re.search(question_pattern, clean_text)
+    if question_match:
+        question_text = question_match.group(0)
+        pre_question = clean_text[:clean_text.find(question_text) + len(question_text)]
+        post_question = clean_text[clean_text.find(question_text) + len(question_text):]
+        return True, pre_question, post_question
+    implicit_question_patterns = [
+        r"tell me", r"can you", r"would you", r"could you",
+        r"imagine", r"describe", r"explain", r"share",
+        r"think about", r"remember", r"recall",
+        r"what if", r"how about", r"let's talk about"
+    ]
+    for pattern in implicit_question_patterns:
+        if re.search(rf"\b{pattern}\b", clean_text.lower()):
+            return True, clean_text, ""
+    question_phrases = [
+        r"^how\b", r"^what\b", r"^why\b", r"^who\b", r"^when\b", r"^where\b",
+        r"^can you\b", r"^would you\b", r"^could you\b", r"^do you\b",
+        r"^tell me about\b", r"^describe\b", r"^explain\b",
+        r"^what do you think\b", r"^what if\b", r"^imagine if\b",
+        r"^remember\b", r"^recall\b", r"^think about\b",
+        r"^can you tell me\b", r"^would you like to\b",
+        r"^what was your favorite\b", r"^how did you feel\b"
+    ]
+    for phrase in question_phrases:
+        if re.search(phrase, clean_text.lower()):
+            return True, clean_text, ""
+        if re.search(r"\s" + phrase, clean_text.lower()):
+            return True, clean_text, ""
+    question_indicators = [
+        r"can you", r"would you", r"could you", r"do you",
+        r"tell me", r"describe", r"explain", r"think about",
+        r"remember", r"recall", r"imagine", r"share",
+        r"what if", r"how about", r"let's talk about"
+    ]
+    for indicator in question_indicators:
+        if re.search(rf"\b{indicator}\b", clean_text.lower()):
+            return True, clean_text, ""
+    return False, None, None
+
+
+def generate_texts(count, seed=0):
+    """Robot-response-like texts of one to four sentences."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(SENTENCES) for _ in range(rng.randint(1, 4))) for _ in range(count)]
+
+
+def time_calls(detector, texts, repeat):
+    """Best time over `repeat` runs of detector over all texts."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            detector(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = generate_texts(args.texts)
+    mismatches = sum(legacy_contains_question(text) != detect_question(text) for text in texts)
+    legacy = time_calls(legacy_contains_question, texts, args.repeat)
+    single = time_calls(detect_question, texts, args.repeat)
+
+    print(f"{args.texts} texts, {mismatches} results differ")
+    print(f"legacy contains_question: {legacy / args.texts * 1e6:8.2f} us per call")
+    print(f"detect_question:          {single / args.texts * 1e6:8.2f} us per call ({legacy / single:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+End-to-end session benchmark without a network: runs the pre-story interaction
+and process_story against FakeLLMClient with a scripted child, and reports wall
+time, LLM calls per session and per-turn engine overhead (wall time minus the
+simulated LLM latency spent on the session's own thread, divided by the child's turns).
+
+Usage: python bench_session.py [--sessions 5] [--story-interactions 10] [--latency 0.0]
+                               [--script answers.txt] [--recording calls.jsonl] [--stream]
+                               [--prompt-layout standard|cache_friendly] [--trace traces.jsonl]
+                               [--jitter 0.0] [--error-rate 0.0] [--deadline 20] [--hedge-after SECONDS]
+                               [--model-routing] [--latency-budget SECONDS] [--fused] [--context-paragraphs N]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from bench_parse_story import generate_story
+from channels import ScriptedChannel
+from fake_llm import FakeLLMClient
+from interaction_handler import StoryInteractionHandler
+from resilience import ResiliencePolicy
+from tracing import Tracer
+
+# Check-in, theme choice, the three magic words (each may be retried once), then story answers
+DEFAULT_ANSWERS = [
+    "I saw a big red balloon",
+    "a",
+    "box", "box", "garden", "garden", "flower", "flower",
+    "I think the butterfly wants to play",
+    "yes",
+    "Sparky opened the box because he was curious and found a tiny butterfly inside",
+    "maybe the flower",
+    "I don't know",
+    "they became friends and played in the garden together"
+]
+
+
+def run_session(story_path, answers, latency, stream, recording=None, prompt_layout="standard", tracer=None,
+                jitter=0.0, error_rate=0.0, resilience=None, model_routing_config=None, fused_turns=False,
+                context_paragraphs=None):
+    """Run one scripted session and return its measurements."""
+    client = FakeLLMClient(recording=recording, latency=latency, jitter=jitter, prompt_cache=True, tracer=tracer,
+                           error_rate=error_rate, resilience=resilience)
+    channel = ScriptedChannel(answers, max_default_answers=1000)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        handler = StoryInteractionHandler(story_path, llm_client=client, channel=channel,
+                                          stream_responses=stream, auto_start=False, prompt_layout=prompt_layout,
+                                          model_routing=model_routing_config is not None,
+                                          model_routing_config=model_routing_config, fused_turns=fused_turns,
+                                          context_paragraphs=context_paragraphs)
+        handler.pre_story_interaction()
+        handler.process_story()
+        handler.executor.shutdown(wait=True)
+    wall = time.perf_counter() - start
+    stats = client.stats()
+    # Latency of calls made on this thread; prefetches and side calls overlap with it
+    blocking_latency = sum(call["delay"] for call in client.calls if call["thread"] == threading.get_ident())
+    usage = handler.response_generator.get_usage_stats()
+    models = {}
+    for call in client.calls:
+        models[call["model"]] = models.get(call["model"], 0) + 1
+    # Estimated at 4 characters per token, like FakeLLMClient's usage
+    prompt_tokens = [sum(len(message["content"]) for message in call["messages"]) // 4 for call in client.calls]
+    return {
+        "wall": wall,
+        "models": models,
+        "cached_rate": usage["cached_rate"],
+        "calls": stats["calls"],
+        "recorded": stats["recorded"],
+        "turns": channel.asks,
+        "prompt_tokens": prompt_tokens,
+        "overhead_per_turn": (wall - blocking_latency) / max(channel.asks, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--story-interactions", type=int, default=10)
+    parser.add_argument("--story", help="Story file to use instead of a generated story")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--script", help="File with the child's answers, one per line")
+    parser.add_argument("--recording", help="JSONL recording to replay (see RecordingLLMClient)")
+    parser.add_argument("--stream", action="store_true", help="Stream robot responses")
+    parser.add_argument("--prompt-layout", choices=["standard", "cache_friendly"], default="standard")
+    parser.add_argument("--trace", help="Write LLM call spans to this JSONL file and print a per-call-site summary")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum extra random seconds per LLM call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability that an LLM call fails")
+    parser.add_argument("--deadline", type=float, default=20.0, help="Seconds an LLM call may take in total")
+    parser.add_argument("--hedge-after", type=float, help="Send a backup request for calls slower than this")
+    parser.add_argument("--model-routing", action="store_true", help="Route calls with the default ModelRouter rules")
+    parser.add_argument("--latency-budget", type=float, help="Per-session LLM latency budget (implies --model-routing)")
+    parser.add_argument("--fused", action="store_true", help="Select the technique and respond in one call")
+    parser.add_argument("--context-paragraphs", type=int, help="Story paragraphs kept verbatim in prompts")
+    args = parser.parse_args()
+
+    tracer = Tracer() if args.trace else None
+    resilience = ResiliencePolicy(deadline=args.deadline, hedge_after=args.hedge_after, seed=0)
+    model_routing_config = None
+    if args.model_routing or args.latency_budget is not None:
+        model_routing_config = {"session_budget": args.latency_budget}
+
+    answers = ScriptedChannel.from_file(args.script).answers if args.script else DEFAULT_ANSWERS
+    with tempfile.TemporaryDirectory() as tmp:
+        story_path = args.story
+        if not story_path:
+            story_path = os.path.join(tmp, "story.txt")
+            with open(story_path, "w") as f:
+                f.write(generate_story(args.story_interactions))
+        results = [run_session(story_path, answers, args.latency, args.stream, args.recording, args.prompt_layout,
+                               tracer, args.jitter, args.error_rate, resilience, model_routing_config,
+                               args.fused, args.context_paragraphs)
+                   for _ in range(args.sessions)]
+
+    walls = [r["wall"] for r in results]
+    print(f"{args.sessions} sessions, simulated latency {args.latency * 1000:.0f} ms per call")
+    print(f"Wall time per session: mean {statistics.mean(walls):.3f} s, max {max(walls):.3f} s")
+    print(f"LLM calls per session: {statistics.mean(r['calls'] for r in results):.1f}"
+          + (f" ({statistics.mean(r['recorded'] for r in results):.1f} from the recording)" if args.recording else ""))
+    print(f"Child turns per session: {statistics.mean(r['turns'] for r in results):.1f}")
+    prompt_tokens = [tokens for r in results for tokens in r["prompt_tokens"]]
+    if prompt_tokens:
+        print(f"Prompt tokens per LLM call: mean {statistics.mean(prompt_tokens):.0f}, max {max(prompt_tokens)}")
+    else:
+        print("Prompt tokens per LLM call: no successful calls")
+    models = sorted({model for r in results for model in r["models"]})
+    print("LLM calls per session by model: " + ", ".join(
+        f"{model} {statistics.mean(r['models'].get(model, 0) for r in results):.1f}" for model in models))
+    print(f"Response prompt tokens served from the (simulated) prefix cache: "
+          f"{statistics.mean(r['cached_rate'] for r in results):.0%}")
+    print(f"Engine overhead per turn: {statistics.mean(r['overhead_per_turn'] for r in results) * 1000:.2f} ms")
+    print(resilience.format_stats())
+    if tracer is not None:
+        tracer.export_jsonl(args.trace)
+        print(tracer.format_summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark for output sanitization: the precompiled sanitize_line pipeline
+versus the previous steps, which compiled the emoji regex on every remove_emojis
+call, stripped quotes in clean_response and stripped them again when the log was saved.
+
+Usage: python bench_text_sanitizer.py [--lines 50000]
+"""
+
+import argparse
+import random
+import re
+import time
+
+from text_sanitizer import sanitize_line
+
+WORDS = ["That's", "wonderful", "Caro!", "What", "do", "you", "think", "happens", "next?",
+         "Sparky", "found", "a", "tiny", "box", "in", "the", "garden.", "I", "love", "that", "idea!"]
+EMOJIS = ["\U0001F60A", "\U0001F308", "\U0001F98B", "✨", "\U0001F389"]
+
+
+def legacy_remove_emojis(text):
+    """The previous StoryInteractionHandler.remove_emojis, which compiled its pattern per call."""
+    emoji_pattern = re.compile(
+        "["
+        u"\U0001F600-\U0001F64F"
+        u"\U0001F300-\U0001F5FF"
+        u"\U0001F680-\U0001F6FF"
+        u"\U0001F1E0-\U0001F1FF"
+        u"\U00002700-\U000027BF"
+        u"\U000024C2-\U0001F251"
+        "]+", flags=re.UNICODE)
+    return emoji_pattern.sub(r'', text)
+
+
+def legacy_clean_response(response):
+    """The previous StoryInteractionHandler.clean_response."""
+    if response is None:
+        return ""
+    if response.startswith('"'):
+        response = response[1:]
+    if response.endswith('"'):
+        response = response[:-1]
+    return response.strip()
+
+
+def legacy_log_entry(entry):
+    """The quote stripping save_interaction_log applied to every entry."""
+    cleaned = entry.strip()
+    if cleaned.startswith('Robot: "') and cleaned.endswith('"'):
+        cleaned = f"Robot: {cleaned[8:-1]}"
+    return cleaned
+
+
+def legacy_pipeline(line):
+    return legacy_log_entry("Robot: " + legacy_clean_response(legacy_remove_emojis(line.strip())))
+
+
+def new_pipeline(line):
+    return ("Robot: " + sanitize_line(line)).strip()
+
+
+def generate_lines(count, seed=0):
+    """Robot lines of 8-30 words; a third are quoted and a quarter contain emojis."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 30))]
+        if rng.random() < 0.25:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(EMOJIS))
+        line = " ".join(words)
+        lines.append(f'"{line}"' if rng.random() < 0.33 else line)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=50000)
+    args = parser.parse_args()
+
+    lines = generate_lines(args.lines)
+    timings = {}
+    for name, pipeline in [("legacy", legacy_pipeline), ("sanitize_line", new_pipeline)]:
+        start = time.perf_counter()
+        for line in lines:
+            pipeline(line)
+        timings[name] = time.perf_counter() - start
+
+    print(f"{args.lines} generated lines")
+    for name, seconds in timings.items():
+        print(f"{name:>13}: {seconds:.3f} s ({seconds / args.lines * 1e6:.2f} us per line)")
+    print(f"Speedup: {timings['legacy'] / timings['sanitize_line']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import asyncio
+from typing import Iterable, List, Optional
+
+
+class ConsoleChannel:
+    """Blocking input/output channel that talks to the child through the terminal.
+
+    StoryInteractionHandler sends every child-facing line through a channel:
+    `say` for complete lines, `say_partial` for streamed text that continues on
+    the same line, and `ask` to wait for the child's answer.
+    """
+
+    def say(self, text: str) -> None:
+        """Show a complete line to the child."""
+        print(text)
+
+    def say_partial(self, text: str) -> None:
+        """Show text without ending the line (used for streamed responses)."""
+        print(text, end="", flush=True)
+
+    def ask(self, prompt: str) -> str:
+        """Show a prompt and wait for the child's answer."""
+        return input(prompt)
+
+
+class ScriptedChannel:
+    """Blocking channel that answers from a script instead of a child.
+
+    Used to drive pre_story_interaction and process_story reproducibly, e.g. in
+    benchmarks and offline tests. Every line the robot says is kept in
+    `transcript`. When the script runs out, `default` is answered up to
+    `max_default_answers` times, after which EOFError is raised like input()
+    does at the end of a file.
+    """
+
+    def __init__(self, answers: Iterable[str], default: str = "I don't know",
+                 max_default_answers: int = 50, echo: bool = False):
+        """
+        Args:
+            answers: The child's answers, in order
+            default: Answer given once the script is exhausted
+            max_default_answers: How many default answers are given before EOFError
+            echo: If True, also print the conversation to the terminal
+        """
+        self.answers = list(answers)
+        self.default = default
+        self.max_default_answers = max_default_answers
+        self.echo = echo
+        self.transcript: List[str] = []
+        self.asks = 0
+        self._partial = False
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ScriptedChannel":
+        """Load answers from a text file: one answer per line, '#' lines are comments."""
+        with open(path, "r") as f:
+            answers = [line.rstrip("\n") for line in f if line.strip() and not line.startswith("#")]
+        return cls(answers, **kwargs)
+
+    def say(self, text: str) -> None:
+        if self._partial:
+            # Ends a streamed line
+            self.transcript[-1] += text
+            self._partial = False
+        else:
+            self.transcript.append(text)
+        if self.echo:
+            print(text)
+
+    def say_partial(self, text: str) -> None:
+        if self._partial:
+            self.transcript[-1] += text
+        else:
+            self.transcript.append(text)
+            self._partial = True
+        if self.echo:
+            print(text, end="", flush=True)
+
+    def ask(self, prompt: str) -> str:
+        if self.asks < len(self.answers):
+            answer = self.answers[self.asks]
+        elif self.asks < len(self.answers) + self.max_default_answers:
+            answer = self.default
+        else:
+            raise EOFError("Scripted answers exhausted")
+        self.asks += 1
+        self.transcript.append(f"{prompt}{answer}")
+        if self.echo:
+            print(f"{prompt}{answer}")
+        return answer
+
+
+class QueueChannel:
+    """Asynchronous channel backed by asyncio queues.
+
+    Outgoing messages are put on `outbox` as (kind, text) tuples, where kind is
+    "say", "say_partial" or "ask". The child's answers are read from `inbox`.
+    A websocket or tablet connection can be attached by forwarding between the
+    socket and these two queues, or by implementing the same async methods.
+    """
+
+    def __init__(self, inbox: Optional[asyncio.Queue] = None, outbox: Optional[asyncio.Queue] = None):
+        """
+        Args:
+            inbox: Queue the child's answers arrive on
+            outbox: Queue the robot's lines are written to
+        """
+        self.inbox = inbox or asyncio.Queue()
+        self.outbox = outbox or asyncio.Queue()
+
+    async def say(self, text: str) -> None:
+        await self.outbox.put(("say", text))
+
+    async def say_partial(self, text: str) -> None:
+        await self.outbox.put(("say_partial", text))
+
+    async def ask(self, prompt: str) -> str:
+        await self.outbox.put(("ask", prompt))
+        return await self.inbox.get()
+
+
+class BlockingChannelBridge:
+    """Expose an async channel to the blocking handler running in a worker thread.
+
+    Each call is scheduled on the event loop that owns the async channel and the
+    worker thread waits for it, so the loop itself never blocks on a child.
+    """
+
+    def __init__(self, channel, loop: asyncio.AbstractEventLoop):
+        """
+        Args:
+            channel: Async channel with say, say_partial and ask coroutines
+            loop: Event loop the channel belongs to
+        """
+        self.channel = channel
+        self.loop = loop
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def say(self, text: str) -> None:
+        self._call(self.channel.say(text))
+
+    def say_partial(self, text: str) -> None:
+        self._call(self.channel.say_partial(text))
+
+    def ask(self, prompt: str) -> str:
+        return self._call(self.channel.ask(prompt))
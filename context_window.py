@@ -0,0 +1,216 @@
+import contextvars
+import hashlib
+import re
+import threading
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence
+
+from story_sections import DISPLAY_TAG_PATTERN, StorySection
+from tracing import llm_call_site
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_FIRST_SENTENCE = re.compile(r"^(.+?[.!?])(?:\s|$)", re.DOTALL)
+
+STORY_SO_FAR = "Earlier in the story (summary): "
+LATER_IN_STORY = "Later in the story (summary): "
+
+SUMMARY_SYSTEM_PROMPT = ("You summarize passages of a children's story. Reply with one or two short sentences "
+                         "of at most {max_words} words naming the characters and what happens. No preamble.")
+
+# Summaries shared by every session in the process, keyed by summarizer settings and section text
+_summary_cache: Dict[str, str] = {}
+_summary_lock = threading.Lock()
+
+
+def paragraph_starts(text: str) -> List[int]:
+    """Offsets where the paragraphs of `text` begin, skipping paragraphs that are only interaction tags."""
+    starts = []
+    position = 0
+    for match in list(PARAGRAPH_BREAK.finditer(text)) + [None]:
+        end = match.start() if match else len(text)
+        if DISPLAY_TAG_PATTERN.sub("", text[position:end]).strip():
+            starts.append(position)
+        if match:
+            position = match.end()
+    return starts
+
+
+def extractive_summary(text: str, max_words: int = 30) -> str:
+    """The first sentence of each paragraph, cut to `max_words` words (no LLM needed)."""
+    sentences = []
+    for paragraph in PARAGRAPH_BREAK.split(DISPLAY_TAG_PATTERN.sub("", text)):
+        paragraph = " ".join(paragraph.split())
+        if paragraph:
+            match = _FIRST_SENTENCE.match(paragraph)
+            sentences.append(match.group(1) if match else paragraph)
+    words = " ".join(sentences).split()
+    if len(words) <= max_words:
+        return " ".join(words)
+    return " ".join(words[:max_words]) + " ..."
+
+
+class SectionSummarizer:
+    """Summaries of story sections, computed once per distinct section text in the process.
+
+    Without an LLM client the summary is extractive (the first sentence of each
+    paragraph). With one, gpt-4o-mini writes it; the call is cacheable, so a
+    client with a ResponseCache also reuses it across processes. If the call
+    fails, the extractive summary is used.
+    """
+
+    def __init__(self, llm_client=None, model: str = "gpt-4o-mini", max_words: int = 30):
+        """
+        Args:
+            llm_client: Optional LLMClient for model-written summaries
+            model: Model for the summaries
+            max_words: Target length of each summary
+        """
+        self.client = llm_client
+        self.model = model
+        self.max_words = max_words
+
+    def _cache_key(self, text: str) -> str:
+        mode = f"llm:{self.model}" if self.client is not None else "extractive"
+        return hashlib.sha256(f"{mode}\0{self.max_words}\0{text}".encode("utf-8")).hexdigest()
+
+    def summarize(self, text: str) -> str:
+        key = self._cache_key(text)
+        with _summary_lock:
+            cached = _summary_cache.get(key)
+        if cached is not None:
+            return cached
+        summary = self._llm_summary(text) if self.client is not None else None
+        summary = summary or extractive_summary(text, self.max_words)
+        with _summary_lock:
+            _summary_cache[key] = summary
+        return summary
+
+    def _llm_summary(self, text: str) -> Optional[str]:
+        passage = DISPLAY_TAG_PATTERN.sub("", text).strip()
+        if not passage:
+            return ""
+        try:
+            with llm_call_site("summarize_section"):
+                response = self.client.chat_completion(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT.format(max_words=self.max_words)},
+                        {"role": "user", "content": passage}
+                    ],
+                    max_tokens=self.max_words * 2,
+                    temperature=0,
+                    cacheable=True
+                )
+            return " ".join(response.choices[0].message.content.split())
+        except Exception as e:
+            print(f"Warning: Could not summarize a story section ({e}). Using the extractive summary.")
+            return None
+
+
+class StoryContextWindow:
+    """Story context for prompts with a bounded size, however long the story is.
+
+    The context before an interaction keeps its last `keep_paragraphs`
+    paragraphs verbatim and replaces the sections before them with their
+    summaries; the context after keeps its first `keep_paragraphs` paragraphs
+    and summarizes the sections after them. At most `summary_words` words of
+    summaries are used (the story's opening and the sections nearest to the
+    interaction come first). Contexts that are already short are returned
+    unchanged. Summaries are started on `executor` when the window is created,
+    so they are usually ready before the story reaches them.
+    """
+
+    def __init__(self, sections: Sequence[StorySection], summarizer: Optional[SectionSummarizer] = None,
+                 keep_paragraphs: int = 3, summary_words: int = 150, executor: Optional[Executor] = None):
+        """
+        Args:
+            sections: The story's sections
+            summarizer: Produces the section summaries (defaults to extractive summaries)
+            keep_paragraphs: Paragraphs kept verbatim next to the interaction
+            summary_words: Maximum words of summaries in one context
+            executor: Optional executor that precomputes the summaries in the background
+        """
+        if keep_paragraphs < 1:
+            raise ValueError("keep_paragraphs must be at least 1")
+        self.sections = sections
+        self.summarizer = summarizer or SectionSummarizer()
+        self.keep_paragraphs = keep_paragraphs
+        self.summary_words = summary_words
+        self._contexts: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        self._futures = None
+        if executor is not None:
+            self._futures = [executor.submit(contextvars.copy_context().run, self.summarizer.summarize,
+                                             self._section_text(section))
+                             for section in sections]
+
+    def _section_text(self, section: StorySection) -> str:
+        """Narrative text of a section, without its interaction."""
+        end = section.interaction_start if section.interaction_start is not None else len(section.story)
+        return section.story[section.text_start:end]
+
+    def _summary(self, index: int) -> str:
+        if self._futures is not None:
+            return self._futures[index].result()
+        return self.summarizer.summarize(self._section_text(self.sections[index]))
+
+    def _join_summaries(self, indices: List[int], nearest: int) -> str:
+        """Summaries of `indices` within the word budget, the first one and those nearest to `nearest` first."""
+        if not indices:
+            return ""
+        order = sorted(indices, key=lambda j: (j != indices[0], abs(j - nearest)))
+        chosen, words = set(), 0
+        for j in order:
+            length = len(self._summary(j).split())
+            if chosen and words + length > self.summary_words:
+                continue
+            chosen.add(j)
+            words += length
+        parts = []
+        for position, j in enumerate(indices):
+            if j in chosen:
+                parts.append(self._summary(j))
+            elif position == 0 or indices[position - 1] in chosen:
+                parts.append("...")
+        return " ".join(part for part in parts if part)
+
+    def context_before(self, index: int) -> str:
+        """Windowed story content before interaction `index`."""
+        key = ("before", index)
+        with self._lock:
+            if key in self._contexts:
+                return self._contexts[key]
+        section = self.sections[index]
+        context = section.context_before
+        starts = paragraph_starts(context)
+        if len(starts) > self.keep_paragraphs:
+            boundary = starts[-self.keep_paragraphs]
+            # Sections with text before the verbatim part (context_before starts at offset 0 of the story)
+            summarized = [j for j in range(index + 1) if self.sections[j].text_start < boundary]
+            context = f"{STORY_SO_FAR}{self._join_summaries(summarized, index)}\n\n{context[boundary:]}"
+        with self._lock:
+            self._contexts[key] = context
+        return context
+
+    def context_after(self, index: int) -> str:
+        """Windowed story content after interaction `index`."""
+        key = ("after", index)
+        with self._lock:
+            if key in self._contexts:
+                return self._contexts[key]
+        section = self.sections[index]
+        context = section.context_after
+        starts = paragraph_starts(context)
+        if len(starts) > self.keep_paragraphs:
+            boundary = section.interaction_end + starts[self.keep_paragraphs]
+            summarized = [j for j in range(index + 1, len(self.sections))
+                          if self._section_end(j) > boundary]
+            verbatim = context[:starts[self.keep_paragraphs]].rstrip()
+            context = f"{verbatim}\n\n{LATER_IN_STORY}{self._join_summaries(summarized, index)}"
+        with self._lock:
+            self._contexts[key] = context
+        return context
+
+    def _section_end(self, index: int) -> int:
+        section = self.sections[index]
+        return section.interaction_start if section.interaction_start is not None else len(section.story)
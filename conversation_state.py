@@ -0,0 +1,48 @@
+from collections import deque
+from typing import Dict, List, Optional
+
+
+class ConversationState:
+    """Bounded record of the turns of one interaction.
+
+    The follow-up loop in StoryInteractionHandler.handle_interaction keeps one
+    ConversationState per interaction. Only the last `max_turns` exchanges are
+    kept, and the history is rendered exactly once into each prompt, so the
+    prompt size stays bounded no matter how deep the follow-ups go.
+    """
+
+    def __init__(self, base_prompt: str, max_turns: int = 6, history: Optional[List[Dict[str, str]]] = None):
+        """
+        Args:
+            base_prompt: The interaction's original question to the child
+            max_turns: Number of child/robot exchanges kept in the history
+            history: Optional earlier messages ({"role": "user"|"assistant", "content": ...})
+        """
+        self.base_prompt = base_prompt
+        self.max_turns = max_turns
+        self.messages = deque(history or [], maxlen=max_turns * 2)
+
+    def add_child(self, text: str) -> None:
+        """Record the child's answer."""
+        self.messages.append({"role": "user", "content": text})
+
+    def add_robot(self, text: str) -> None:
+        """Record the robot's response."""
+        self.messages.append({"role": "assistant", "content": text})
+
+    @property
+    def child_responses(self) -> List[str]:
+        """The child's answers still held in the history."""
+        return [item["content"] for item in self.messages if item["role"] == "user"]
+
+    def render_history(self) -> str:
+        """Render the history as 'Child: ...' / 'Robot: ...' lines."""
+        return "\n".join(
+            f"{'Child' if item['role'] == 'user' else 'Robot'}: {item['content']}" for item in self.messages
+        )
+
+    def render_prompt(self) -> str:
+        """Return the base prompt followed by the conversation so far (if any)."""
+        if not self.messages:
+            return self.base_prompt
+        return f"{self.base_prompt}\nPrevious conversation:\n{self.render_history()}"
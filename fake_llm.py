@@ -0,0 +1,330 @@
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import httpx
+import openai
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from resilience import ResiliencePolicy
+from response_cache import ResponseCache
+from tracing import LLMSpan, Tracer, current_trace
+
+# A route's content is either a fixed completion or a function of the messages
+RouteContent = Union[str, Callable[[List[Dict[str, str]]], str]]
+
+
+def _child_input(user_prompt: str) -> str:
+    """The child's answer as quoted in the scaffolding user prompt."""
+    match = re.search(r'^"(.*)"$', user_prompt, re.MULTILINE)
+    return match.group(1) if match else ""
+
+
+def _technique_selection(messages: List[Dict[str, str]]) -> str:
+    """Pick a technique the way the selector expects: short answers get high support.
+
+    The technique is the first one listed for the chosen support level, so the
+    selection is always one of the techniques the prompt offered.
+    """
+    user_prompt = messages[-1]["content"]
+    words = len(_child_input(user_prompt).split())
+    support_level = "high" if words <= 3 else "low"
+    section = user_prompt.split("LOW SUPPORT")[1 if support_level == "low" else 0]
+    technique = re.search(r"^- ([\w-]+):", section.split("HIGH SUPPORT")[-1], re.MULTILINE)
+    return json.dumps({
+        "complexity_score": 2 if support_level == "high" else 7,
+        "support_level": support_level,
+        "selected_technique": technique.group(1) if technique else ""
+    })
+
+
+def _fused_turn(messages: List[Dict[str, str]]) -> str:
+    """Technique selection as in _technique_selection, together with the default reply."""
+    result = json.loads(_technique_selection(messages))
+    result["response"] = DEFAULT_COMPLETION
+    return json.dumps(result)
+
+
+def _section_summary(messages: List[Dict[str, str]]) -> str:
+    """The passage's first sentence, standing in for a model-written summary."""
+    passage = " ".join(messages[-1]["content"].split())
+    match = re.match(r"^(.+?[.!?])(?:\s|$)", passage)
+    return match.group(1) if match else passage
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    """Length of the common prefix of a and b (binary search over slice comparisons)."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+DEFAULT_ROUTES: List[Tuple[str, RouteContent]] = [
+    # FusedTurnGenerator.select_and_respond (its prompt also contains the selection marker)
+    ("write the robot's reply to the child in the same step", _fused_turn),
+    # ScaffoldingSelector.select_technique
+    ("selects appropriate scaffolding techniques", _technique_selection),
+    # Ending evaluators
+    ("story summary questions", json.dumps({"score": 6, "support_level": "medium", "rationale": "fake"})),
+    ("story-retelling answers", json.dumps({"score": 6, "rationale": ["fake"] * 5})),
+    ("alternative-ending", json.dumps({"score": 6, "rationale": ["fake"] * 5})),
+    # context_window.SectionSummarizer
+    ("summarize passages of a children's story", _section_summary),
+    # story_assets.extract_with_llm
+    ("extract facts from a children's story", json.dumps({
+        "characters": ["Sparky", "the butterfly"], "setting": "a garden",
+        "key_events": ["Sparky found a box in the garden.", "A butterfly flew out of the box."],
+        "alternative_ending_seeds": ["What if the box was empty?", "What if the butterfly stayed?",
+                                     "What if Sparky shared the box?"]
+    })),
+]
+DEFAULT_COMPLETION = "That's a wonderful idea! What do you think happens next?"
+# URL reported in the simulated API errors
+FAKE_URL = "https://fake-llm.invalid/v1/chat/completions"
+
+
+class FakeLLMClient:
+    """Offline stand-in for LLMClient that returns recorded or templated completions.
+
+    It has the same chat_completion / chat_completion_stream interface and
+    returns real openai response objects, so ScaffoldingSelector,
+    ResponseGenerator and StoryInteractionHandler run unchanged without a
+    network. A completion is looked up in this order:
+
+    1. the recording (a JSONL file written by RecordingLLMClient), by request key
+    2. the first route whose marker appears in the system message
+    3. the default completion
+
+    Every call sleeps `latency` seconds (plus up to `jitter` seconds) to
+    simulate the API, and fails with a connection error with probability
+    `error_rate`. With a ResiliencePolicy, calls go through the same deadlines,
+    retries, hedging and circuit breaker as LLMClient; an attempt slower than
+    its timeout fails with a timeout error.
+    """
+
+    def __init__(self, recording: Optional[str] = None, routes: Optional[List[Tuple[str, RouteContent]]] = None,
+                 default_completion: str = DEFAULT_COMPLETION, latency: float = 0.0, jitter: float = 0.0,
+                 token_latency: float = 0.0, seed: Optional[int] = None, prompt_cache: bool = False,
+                 tracer: Optional[Tracer] = None, error_rate: float = 0.0,
+                 resilience: Optional[ResiliencePolicy] = None, record_calls: bool = True):
+        """
+        Args:
+            recording: Optional JSONL file of recorded completions
+            routes: (marker, content) pairs tried before DEFAULT_ROUTES
+            default_completion: Completion used when nothing else matches
+            latency: Seconds each call takes (time to first token when streaming)
+            jitter: Maximum extra random seconds added to latency
+            token_latency: Seconds between streamed chunks
+            seed: Seed for the jitter
+            prompt_cache: Simulate provider prompt-prefix caching in the reported usage
+            tracer: Optional Tracer that records a span for every call
+            error_rate: Probability that an attempt fails with a connection error
+            resilience: Optional ResiliencePolicy applied to every call
+            record_calls: Whether every call is kept in `calls` (off for long-running stub servers)
+        """
+        self.recorded: Dict[str, str] = {}
+        if recording:
+            with open(recording, "r") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recorded[entry["key"]] = entry["content"]
+        self.routes = list(routes or []) + DEFAULT_ROUTES
+        self.default_completion = default_completion
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.cache = None
+        self.tracer = tracer
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls: List[Dict[str, Any]] = []
+        self.error_rate = error_rate
+        self.resilience = resilience
+        self.record_calls = record_calls
+        self.counters = {"calls": 0, "recorded": 0, "templated": 0, "errors": 0, "simulated_latency": 0.0}
+        self.prompt_cache = prompt_cache
+        self._seen_prompts: List[str] = []
+
+    def _completion_text(self, model: str, messages: List[Dict[str, str]], params: Dict[str, Any],
+                         timeout: Optional[float] = None) -> str:
+        key = ResponseCache.make_key(model, messages, params)
+        if key in self.recorded:
+            source, content = "recorded", self.recorded[key]
+        else:
+            source, content = "templated", self.default_completion
+            system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+            for marker, route in self.routes:
+                if marker in system:
+                    content = route(messages) if callable(route) else route
+                    break
+
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.error_rate and self._random.random() < self.error_rate
+        if failed:
+            with self._lock:
+                self.counters["errors"] += 1
+            raise openai.APIConnectionError(request=httpx.Request("POST", FAKE_URL))
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            with self._lock:
+                self.counters["errors"] += 1
+            raise openai.APITimeoutError(request=httpx.Request("POST", FAKE_URL))
+        with self._lock:
+            self.counters["calls"] += 1
+            self.counters[source] += 1
+            self.counters["simulated_latency"] += delay
+            if self.record_calls:
+                self.calls.append({"model": model, "source": source, "messages": messages,
+                                   "delay": delay, "thread": threading.get_ident()})
+        if delay:
+            time.sleep(delay)
+        return content
+
+    def _cached_tokens(self, model: str, messages: List[Dict[str, str]]) -> int:
+        """Simulate prefix caching: the longest prefix shared with an earlier prompt counts
+        as cached, in blocks of 128 tokens once it reaches 1024 tokens."""
+        prompt = model + "".join(f"{message['role']}:{message['content']}" for message in messages)
+        with self._lock:
+            shared = max((_common_prefix_length(prompt, seen) for seen in self._seen_prompts), default=0)
+            self._seen_prompts.append(prompt)
+            del self._seen_prompts[:-64]
+        tokens = shared // 4
+        return tokens // 128 * 128 if tokens >= 1024 else 0
+
+    def _usage(self, model: str, messages: List[Dict[str, str]], content: str) -> Dict[str, Any]:
+        """Token usage estimated at 4 characters per token."""
+        prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+        completion_tokens = len(content) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        if self.prompt_cache:
+            usage["prompt_tokens_details"] = {"cached_tokens": min(self._cached_tokens(model, messages), prompt_tokens)}
+        return usage
+
+    def _call(self, model: str, messages: List[Dict[str, str]], params: Dict[str, Any], hedge: bool = False) -> str:
+        """Produce the completion text, under the resilience policy if there is one."""
+        if self.resilience is None:
+            return self._completion_text(model, messages, params)
+        return self.resilience.call(lambda timeout: self._completion_text(model, messages, params, timeout),
+                                    hedge=hedge)
+
+    @contextmanager
+    def _span(self, model: str, trace: Optional[Tuple[str, Dict[str, Any]]] = None) -> Iterator[Optional[LLMSpan]]:
+        if self.tracer is None:
+            yield None
+            return
+        with self.tracer.llm_span(model, trace) as span:
+            try:
+                yield span
+            finally:
+                if self.resilience is not None:
+                    last_call = self.resilience.last_call()
+                    span.retries = max(0, last_call["attempts"] - 1)
+                    span.hedged = last_call["hedged"]
+
+    def chat_completion(self, model: str, messages: List[Dict[str, str]], cacheable: bool = False, **params):
+        """Return a ChatCompletion with the recorded or templated content."""
+        with self._span(model) as span:
+            content = self._call(model, messages, params, hedge=True)
+            response = ChatCompletion.model_validate({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": self._usage(model, messages, content)
+            })
+            if span is not None:
+                span.set_usage(response.usage)
+            return response
+
+    def chat_completion_stream(self, model: str, messages: List[Dict[str, str]], **params) -> Iterator[Any]:
+        """Return the completion as an iterator of ChatCompletionChunks, one word per chunk."""
+        return self._stream(model, messages, current_trace(), params)
+
+    def _stream(self, model: str, messages: List[Dict[str, str]], trace: Tuple[str, Dict[str, Any]],
+                params: Dict[str, Any]) -> Iterator[Any]:
+        with self._span(model, trace) as span:
+            for chunk in self._stream_chunks(model, messages, params):
+                if span is not None:
+                    span.first_token()
+                    span.set_usage(chunk.usage)
+                yield chunk
+
+    def _stream_chunks(self, model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> Iterator[Any]:
+        content = self._call(model, messages, params)
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            yield ChatCompletionChunk.model_validate({
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": None,
+                             "delta": {"content": word if i == len(words) - 1 else word + " "}}]
+            })
+        if params.get("stream_options", {}).get("include_usage"):
+            yield ChatCompletionChunk.model_validate({
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": model, "choices": [], "usage": self._usage(model, messages, content)
+            })
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the call counters."""
+        with self._lock:
+            return dict(self.counters)
+
+    def close(self) -> None:
+        pass
+
+
+class RecordingLLMClient:
+    """Wrap a real LLMClient and append every completion to a JSONL recording.
+
+    The recording can be replayed offline with FakeLLMClient(recording=path).
+    """
+
+    def __init__(self, client, path: str):
+        """
+        Args:
+            client: The LLMClient that makes the real calls
+            path: JSONL file the completions are appended to
+        """
+        self.client = client
+        self.path = path
+        self.cache = getattr(client, "cache", None)
+        self._lock = threading.Lock()
+
+    def _record(self, model: str, messages: List[Dict[str, str]], params: Dict[str, Any], content: str) -> None:
+        entry = {"key": ResponseCache.make_key(model, messages, params), "model": model, "content": content}
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def chat_completion(self, model: str, messages: List[Dict[str, str]], cacheable: bool = False, **params):
+        response = self.client.chat_completion(model, messages, cacheable=cacheable, **params)
+        self._record(model, messages, params, response.choices[0].message.content)
+        return response
+
+    def chat_completion_stream(self, model: str, messages: List[Dict[str, str]], **params) -> Iterator[Any]:
+        return self._stream(self.client.chat_completion_stream(model, messages, **params), model, messages, params)
+
+    def _stream(self, stream: Iterator[Any], model: str, messages: List[Dict[str, str]],
+                params: Dict[str, Any]) -> Iterator[Any]:
+        parts = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            yield chunk
+        self._record(model, messages, params, "".join(parts))
+
+    def close(self) -> None:
+        self.client.close()
@@ -0,0 +1,152 @@
+import json
+import re
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from prompt_registry import ENDING_TECHNIQUES
+from response_generator import ResponseGenerator
+from scaffolding_selector import ScaffoldingSelector
+from tracing import llm_call_site
+
+# Start of the selection prompt's output format, which the fused prompt replaces
+SELECTION_FORMAT_MARKER = "Your response must be in this exact JSON format"
+# Stands in for the story after the interaction, which the model writing the reply must not see
+WITHHELD_CONTEXT_AFTER = "(Not shown in this step. Score the child's response from the story so far.)"
+
+
+class FusedTurnGenerator:
+    """Select the scaffolding technique and write the robot's reply in a single LLM call.
+
+    The system prompt is the technique selection prompt (without its output
+    format), the response guide of every selectable technique, the common
+    response guidelines and prompts/fused_turn_prompt.txt, which asks for the
+    selection and the reply as one JSON object. None of it changes from turn to
+    turn, so the provider's prompt-prefix cache can reuse it. The user message
+    is the selection user prompt, without the story after the interaction: the
+    same model writes the child-facing reply, and the two-call path never shows
+    the upcoming story to the response model for these techniques either. The
+    complexity score is therefore judged from the story so far only.
+
+    The reply is only used if the output is valid JSON, the technique is one of
+    SCAFFOLDING_TECHNIQUES for the returned support level and the reply is not
+    empty. Otherwise select_and_respond returns None and the caller falls back
+    to the separate selection and response calls.
+    """
+
+    # Between the selection (0.2) and response (0.7) temperatures
+    TEMPERATURE = 0.5
+    # Room for the JSON fields on top of the response's 150 tokens
+    MAX_TOKENS = 220
+
+    def __init__(self, selector: ScaffoldingSelector, generator: ResponseGenerator):
+        """
+        Args:
+            selector: Selector whose prompts, technique history and validation are used
+            generator: Generator whose client, model, post-processing and usage log are used
+        """
+        self.selector = selector
+        self.generator = generator
+        self._system_prompt: Optional[Tuple[int, str]] = None
+        self.counters = {"turns": 0, "fused": 0, "invalid": 0, "errors": 0}
+
+    @property
+    def system_prompt(self) -> str:
+        """The fused system prompt, rebuilt only when the prompts are reloaded."""
+        prompt_set = self.selector.prompts.current()
+        if self._system_prompt is None or self._system_prompt[0] != prompt_set.version:
+            selection = self.selector.system_prompt.split(SELECTION_FORMAT_MARKER)[0].rstrip()
+            guides = "\n\n".join(
+                f"RESPONSE GUIDE FOR {name.upper()}:\n{prompt_set.text_or_empty(f'response_{name}.txt')}"
+                for name in self.selector.SCAFFOLDING_TECHNIQUES
+                if name != "transition" and name not in ENDING_TECHNIQUES
+            )
+            text = "\n\n".join([
+                selection,
+                guides,
+                prompt_set.text_or_empty("response_common_guidelines.txt"),
+                prompt_set.text_or_empty("fused_turn_prompt.txt")
+            ])
+            self._system_prompt = (prompt_set.version, text)
+        return self._system_prompt[1]
+
+    def select_and_respond(self, child_input, prompt, context_before,
+                           target_vocab=None, vocab_role=None,
+                           model=None) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Select the technique and generate the response in one call.
+
+        Args:
+            child_input: The child's response
+            prompt: The question or prompt given to the child, with the conversation so far
+            context_before: Story context preceding this interaction
+            target_vocab: Optional target vocabulary word
+            vocab_role: Optional role of the vocabulary word (new, easy, review)
+            model: Model to use (defaults to the generator's DEFAULT_MODEL)
+
+        Returns:
+            Tuple of (selected technique, post-processed response), or None if the
+            call failed or its output did not validate
+        """
+        model = model or self.generator.DEFAULT_MODEL
+        self.counters["turns"] += 1
+        user_prompt = self.selector._selection_user_prompt(child_input, prompt, context_before,
+                                                           WITHHELD_CONTEXT_AFTER, target_vocab, vocab_role)
+        start = time.perf_counter()
+        try:
+            with llm_call_site("select_and_respond"):
+                response = self.generator.client.chat_completion(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": self.system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    max_tokens=self.MAX_TOKENS,
+                    temperature=self.TEMPERATURE
+                )
+            self.generator._record_usage(response.usage, time.perf_counter() - start, model)
+        except Exception as e:
+            if self.generator.router is not None:
+                self.generator.router.record_failure(model, time.perf_counter() - start, e)
+            self.counters["errors"] += 1
+            print(f"Warning: Fused select-and-respond call failed ({e}). Using separate calls.")
+            return None
+
+        response_text = (response.choices[0].message.content or "").strip()
+        try:
+            reply = self._extract_reply(response_text)
+            selected_technique = self.selector._parse_llm_response(response_text, child_input, update_history=False)
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            self.counters["invalid"] += 1
+            print(f"Warning: Fused select-and-respond output did not validate ({e}). Using separate calls.")
+            return None
+
+        self.selector._update_previously_used(selected_technique["name"])
+        self.counters["fused"] += 1
+        return selected_technique, self.generator._postprocess_response(reply, selected_technique, None)
+
+    @staticmethod
+    def _extract_reply(response_text: str) -> str:
+        """Return the non-empty "response" field of the fused JSON output.
+
+        Raises:
+            json.JSONDecodeError: If the output is not JSON
+            ValueError: If the response field is missing or empty
+        """
+        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
+        result = json.loads(json_match.group(0) if json_match else response_text)
+        reply = result.get("response") if isinstance(result, dict) else None
+        if not isinstance(reply, str) or not reply.strip():
+            raise ValueError("missing or empty response")
+        return reply.strip()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the fused turn counters and the share of turns that needed one call."""
+        stats = dict(self.counters)
+        stats["fused_rate"] = stats["fused"] / stats["turns"] if stats["turns"] else 0.0
+        return stats
+
+    def format_stats(self) -> str:
+        """One-line summary of the fused turns."""
+        stats = self.stats()
+        return (f"Fused turns: {stats['fused']} of {stats['turns']} in one call ({stats['fused_rate']:.0%}), "
+                f"{stats['invalid']} invalid, {stats['errors']} failed")
@@ -1,12 +1,33 @@
 import sys
 import os
+import json
 import re
 import random
 import datetime
-import openai
+import contextvars
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from llm_client import LLMClient, get_shared_client
+from resilience import ResiliencePolicy
+from response_cache import ResponseCache
+from channels import ConsoleChannel
+from prefetch import SpeculativePrefetcher
+from prompt_registry import get_prompt_registry
+from question_detector import detect_question
+from text_sanitizer import remove_emojis, sanitize_line, strip_quotes
+from tracing import Tracer, llm_call_site, set_trace_context, trace_context
+from story_sections import parse_story_sections
+from story_compiler import ARTIFACT_SUFFIX, load_compiled_story
+from conversation_state import ConversationState
+from model_router import ModelRouter
 from scaffolding_selector import ScaffoldingSelector
 from response_generator import ResponseGenerator
+from fused_turn import FusedTurnGenerator
+from session_log import SessionLog, SessionLogWriter
+from context_window import SectionSummarizer, StoryContextWindow
+from story_assets import load_story_assets
+from story_scorer import StoryKeywords, load_calibration
 
 # Load environment variables from the specific .env file
 load_dotenv('test-interaction.env')
@@ -24,7 +45,12 @@ class StoryInteractionHandler:
         "A natural biome (like a rainforest or desert)"
     ]
 
-    def __init__(self, story_file_path, api_key=None, max_interaction_depth=3, response_length="short", test_mode=False):
+    def __init__(self, story_file_path, api_key=None, max_interaction_depth=3, response_length="short", test_mode=False,
+                 llm_client=None, stream_responses=False, channel=None, auto_start=True,
+                 fast_path=False, fast_path_config=None, prompt_layout="standard",
+                 model_routing=False, model_routing_config=None, fused_turns=False,
+                 log_sinks=None, log_memory_limit=None, context_paragraphs=None, context_summaries="extractive",
+                 ending_assets=None, ending_scorer=None, ending_scorer_calibration=None):
         """
         Initialize the story interaction handler.
         
@@ -34,6 +60,29 @@ class StoryInteractionHandler:
             max_interaction_depth: Maximum depth of follow-up questions
             response_length: 'short' for 1-2 sentence responses or 'standard' for original behavior
             test_mode: If True, skips to the last interaction for testing
+            llm_client: Shared LLMClient used by the handler, selector and generator
+                        (defaults to the process-wide client for api_key)
+            stream_responses: If True, robot responses are printed token by token as they arrive
+            channel: Input/output channel to the child (defaults to the terminal)
+            auto_start: If True, the pre-story interaction starts as soon as the handler is created
+            fast_path: If True, clear-cut answers are classified locally instead of by the LLM
+            fast_path_config: Overrides for RulePreClassifier.DEFAULT_CONFIG
+            prompt_layout: Response prompt layout, 'standard' or 'cache_friendly'
+            model_routing: If True, a ModelRouter picks the model for each call and its
+                           decisions for robot responses are recorded in the story log
+            model_routing_config: Keyword arguments for ModelRouter (rules, session_budget, ...)
+            fused_turns: If True, turns that need the LLM to select a technique select it and
+                         generate the response in one call (falling back to two calls if invalid)
+            log_sinks: SessionLogWriters that receive every story log entry as it is logged
+            log_memory_limit: Optional number of most recent story log lines kept in memory
+            context_paragraphs: If set, prompts get only this many story paragraphs next to the
+                                interaction verbatim and summaries of the rest of the story
+            context_summaries: 'extractive' (first sentences, no LLM) or 'llm' section summaries
+            ending_assets: If 'local' or 'llm', the ending phase uses the story's precomputed facts
+                           (see story_assets.py) instead of the whole story on every turn
+            ending_scorer: 'first_pass' or 'local' to score retellings and alternative endings with
+                           the story-aware local scorer (see story_scorer.py) before or instead of the LLM
+            ending_scorer_calibration: Optional calibration for the local scores (see story_scorer.fit_calibration)
         """
         self.story_file_path = story_file_path
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
@@ -46,10 +95,14 @@ class StoryInteractionHandler:
         }
         self.response_length = response_length
         self.test_mode = test_mode
+        self.stream_responses = stream_responses
+        self.channel = channel or ConsoleChannel()
+        self.turn_latencies = []  # Time-to-first-token and total latency of each streamed response
         self.child_name = self.CHILD_NAME  # Use fixed child name
         self.child_responses = []  # Track child's responses for personalization
         self.chosen_ending_type = None  # Store the chosen ending type for summary interactions
         self.chosen_theme = None  # Store the chosen adventure theme
+        self.session_id = str(uuid.uuid4())  # Ties the LLM call spans of this session together
         
         # Define special tags that aren't vocabulary words but structural indicators
         self.special_tags = ["summary"]
@@ -57,15 +110,30 @@ class StoryInteractionHandler:
         # Load vocabulary sets
         self.vocab_sets = self.load_vocab_sets()
         
-        if not self.api_key:
+        if not self.api_key and llm_client is None:
             raise ValueError("OpenAI API key is missing! Please provide it as an argument or in .env file.")
         
-        # Initialize OpenAI client for greeting generation
-        self.client = openai.OpenAI(api_key=self.api_key)
+        # One pooled LLM client shared by greeting generation, technique selection and responses
+        self.client = llm_client or get_shared_client(self.api_key)
         
-        self.scaffolding_selector = ScaffoldingSelector()
+        # Worker threads for LLM calls that can run alongside each other within a turn
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        # Pre-story lines generated in the background while the child is typing
+        self.prefetcher = SpeculativePrefetcher(self.executor)
+        
+        # Per-session model routing (None keeps gpt-4 for responses and gpt-4o-mini for everything else)
+        self.model_router = ModelRouter(**(model_routing_config or {})) if model_routing else None
+        
+        self.scaffolding_selector = ScaffoldingSelector(api_key=self.api_key, llm_client=self.client,
+                                                        fast_path=fast_path, fast_path_config=fast_path_config,
+                                                        router=self.model_router, ending_scorer=ending_scorer,
+                                                        ending_scorer_calibration=ending_scorer_calibration)
         # Use the improved ResponseGenerator with the specified response length
-        self.response_generator = ResponseGenerator(api_key=self.api_key, response_length=self.response_length)
+        self.response_generator = ResponseGenerator(api_key=self.api_key, response_length=self.response_length,
+                                                    llm_client=self.client, prompt_layout=prompt_layout,
+                                                    router=self.model_router)
+        # Optional single-call technique selection and response
+        self.fused_turn = FusedTurnGenerator(self.scaffolding_selector, self.response_generator) if fused_turns else None
         
         # Load pre-story prompt template
         try:
@@ -75,12 +143,39 @@ class StoryInteractionHandler:
             print(f"Warning: Could not find {self.PRE_STORY_PROMPT_PATH}. Using default pre-story interaction.")
             self.pre_story_template = None
         
+        # A compiled story artifact (see story_compiler.py) is loaded once per process and shared
+        self.compiled_story = (load_compiled_story(story_file_path)
+                               if story_file_path.endswith(ARTIFACT_SUFFIX) else None)
         self.story_content = self.load_story()
         self.story_sections = self.parse_story()
-        self.story_log = []
+        
+        # Optional bounded story context for long stories
+        self.context_window = None
+        if context_paragraphs:
+            if context_summaries not in ("extractive", "llm"):
+                raise ValueError(f"Unknown context_summaries '{context_summaries}'. Expected 'extractive' or 'llm'.")
+            summarizer = SectionSummarizer(self.client if context_summaries == "llm" else None)
+            # Model-written summaries are precomputed on their own workers during the pre-story interaction
+            summary_executor = ThreadPoolExecutor(max_workers=4) if context_summaries == "llm" else None
+            self.context_window = StoryContextWindow(self.story_sections, summarizer,
+                                                     keep_paragraphs=context_paragraphs, executor=summary_executor)
+            if summary_executor is not None:
+                summary_executor.shutdown(wait=False)
+        
+        # Story facts for the ending phase, loaded from <story>.assets.json (extracted and cached on first use)
+        self._story_assets_future = None
+        if ending_assets:
+            if ending_assets not in ("local", "llm"):
+                raise ValueError(f"Unknown ending_assets '{ending_assets}'. Expected 'local' or 'llm'.")
+            self._story_assets_future = self.executor.submit(
+                contextvars.copy_context().run, load_story_assets, story_file_path, self.story_content,
+                self.client if ending_assets == "llm" else None, self.story_sections
+            )
+        self.story_log = SessionLog(log_sinks, session_id=self.session_id, memory_limit=log_memory_limit)
         
         # Start with pre-story interaction
-        self.pre_story_interaction()
+        if auto_start:
+            self.pre_story_interaction()
         
     def load_vocab_sets(self):
         """
@@ -142,7 +237,16 @@ class StoryInteractionHandler:
             # Final fallback - minimal set
             return [["ant", "alligator", "baseball"], ["cow", "emergency", "duck"], ["garden", "hurricane", "ice"]]
 
+    @property
+    def story_assets(self):
+        """The story's precomputed ending facts, or None if ending_assets is off."""
+        if self._story_assets_future is None:
+            return None
+        return self._story_assets_future.result()
+    
     def load_story(self):
+        if self.compiled_story is not None:
+            return self.compiled_story.story
         with open(self.story_file_path, 'r') as file:
             return file.read()
     
@@ -151,79 +255,22 @@ class StoryInteractionHandler:
         Parse the story content to extract interactions and their vocabulary targets.
         The format for interactions is: <interaction vocab="target_word" role="vocab_role">Prompt text</interaction>
         Special tags like "summary" are identified and treated differently.
-        """
-        # Updated pattern to extract vocab attribute and role
-        interaction_pattern = r'<interaction(?: vocab="([^"]*)")?(?:\s+role="([^"]*)")?>([^<]*)</interaction>'
-        interaction_matches = list(re.finditer(interaction_pattern, self.story_content, re.DOTALL))
-        
-        sections = []
-        
-        if not interaction_matches:
-            return [{"text": self.story_content, "prompt": None, "vocab": None, "vocab_role": None, "special_tag": None}]
-        
-        last_end = 0
-        for i, match in enumerate(interaction_matches):
-            interaction_start = match.start()
-            interaction_end = match.end()
-            vocab = match.group(1) if match.group(1) else None  # Extract the vocab
-            vocab_role = match.group(2) if match.group(2) else None  # Extract the vocab role
-            prompt = match.group(3).strip()
-            
-            # Determine if this is a special tag or a vocabulary target
-            special_tag = None
-            target_vocab = None
-            if vocab in self.special_tags:
-                special_tag = vocab
-            elif vocab:
-                target_vocab = vocab
-            
-            text_before = self.story_content[last_end:interaction_start]
-            full_display_text = text_before + f"<interaction>{prompt}</interaction>"
-            
-            # Use the full story content as context to ensure comprehensive understanding
-            full_story_before = self.story_content[:interaction_start]
-            full_story_after = self.story_content[interaction_end:]
-            
-            sections.append({
-                "text": full_display_text,
-                "prompt": prompt,
-                "vocab": target_vocab,
-                "vocab_role": vocab_role,
-                "special_tag": special_tag,
-                "context_before": full_story_before,
-                "context_after": full_story_after
-            })
-            
-            last_end = interaction_end
         
-        if last_end < len(self.story_content):
-            sections.append({
-                "text": self.story_content[last_end:],
-                "prompt": None,
-                "vocab": None,
-                "vocab_role": None,
-                "special_tag": None,
-                "context_before": "",
-                "context_after": ""
-            })
-        
-        return sections
+        Sections are StorySection objects that store offsets into self.story_content and
+        build their context strings on demand, so they do not copy the story per interaction.
+        """
+        if self.compiled_story is not None:
+            return self.compiled_story.sections
+        return parse_story_sections(self.story_content, self.special_tags)
     
     def remove_emojis(self, text):
         # Remove all emoji characters from the text
-        emoji_pattern = re.compile(
-            "["
-            u"\U0001F600-\U0001F64F"  # emoticons
-            u"\U0001F300-\U0001F5FF"  # symbols & pictographs
-            u"\U0001F680-\U0001F6FF"  # transport & map symbols
-            u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-            u"\U00002700-\U000027BF"  # Dingbats
-            u"\U000024C2-\U0001F251"  # Enclosed characters
-            "]+", flags=re.UNICODE)
-        return emoji_pattern.sub(r'', text)
+        return remove_emojis(text)
 
     def extract_story_vocabs(self):
         """Extract the three main vocab words from the story's interaction tags (excluding 'summary')."""
+        if self.compiled_story is not None:
+            return list(self.compiled_story.vocabs) if self.compiled_story.vocabs else None
         vocab_words = []
         pattern = r'<interaction(?: vocab="([^"]*)")(?:\s+role="([^"]*)")?>([^<]*)</interaction>'
         matches = re.findall(pattern, self.story_content)
@@ -249,11 +296,12 @@ class StoryInteractionHandler:
             return ["story", "adventure", "fun"]
 
     def pre_story_interaction(self):
+        set_trace_context(session_id=self.session_id)
         if not self.pre_story_template:
             self._basic_pre_story_interaction()
             return
 
-        print("\n=== Pre-story interaction ===\n")
+        self.channel.say("\n=== Pre-story interaction ===\n")
 
         # Get target words from the story file if possible
         words = self.select_target_words()
@@ -264,6 +312,22 @@ class StoryInteractionHandler:
             word2=words[1],
             word3=words[2]
         )
+        # Lines that do not depend on the child's answers are generated in the
+        # background while the child is typing
+        prefetcher = self.prefetcher
+        game_styles = [
+            "Magic Word Unlock",
+            "Robot Freeze Game",
+            "Story Hat Chooser",
+            "Oops! Wrong Story!"
+        ]
+        chosen_style = random.choice(game_styles)
+        prefetcher.submit(
+            "game_intro", "game_intro", self._pre_story_line, prompt,
+            f"Introduce the magic word game using the {chosen_style} style. Make it playful and engaging, but do NOT mention or list any of the magic words. Only say that you need three magic words to unlock the story, and ask if the child is ready. Only output a single, short introduction sentence.",
+            call_site="pre_story_game_intro",
+            fallback="I need three magic words to unlock our story. Are you ready?"
+        )
         try:
             # 1. Warm check-in (with variety)
             checkin_templates = [
@@ -293,39 +357,33 @@ class StoryInteractionHandler:
             idx = random.randrange(len(checkin_templates))
             chosen_experience = experiences[idx].replace('{name}', self.child_name)
             chosen_checkin = questions[idx]
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": f"Start by sharing this experience: '{chosen_experience}' and then ask: '{chosen_checkin}'"}
-                ],
-                max_tokens=100,
-                temperature=0.7
-            )
-            check_in = self.remove_emojis(response.choices[0].message.content.strip())
-            print(f"Ella: {check_in}")
+            try:
+                with llm_call_site("pre_story_checkin"):
+                    response = self.client.chat_completion(
+                        model="gpt-4o-mini",
+                        messages=[
+                            {"role": "system", "content": prompt},
+                            {"role": "user", "content": f"Start by sharing this experience: '{chosen_experience}' and then ask: '{chosen_checkin}'"}
+                        ],
+                        max_tokens=100,
+                        temperature=0.7
+                    )
+                check_in = sanitize_line(response.choices[0].message.content)
+            except Exception as e:
+                # The template itself is a complete check-in
+                print(f"Warning: Could not generate the check-in ({e}). Using the template.")
+                check_in = f"{chosen_experience}! {chosen_checkin[0].upper()}{chosen_checkin[1:]}"
+            self.channel.say(f"Ella: {check_in}")
             self.story_log.append(f"Ella: {check_in}")
-            child_response = input(f"{self.child_name}: ")
+            child_response = self.channel.ask(f"{self.child_name}: ")
             self.story_log.append(f"Child: {child_response}")
 
             # ————————————————
             # If the child asks a question, have the LLM answer it briefly and positively:
             child_asked_question, child_question, _ = self.contains_question(child_response)
             if child_asked_question and child_question:
-                resp = self.client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content":
-                         "You are Ella, a caring robot. Please answer the child's question "
-                         "in one short, happy, encouraging sentence."
-                        },
-                        {"role": "user", "content": child_question}
-                    ],
-                    max_tokens=30,
-                    temperature=0.8
-                )
-                quick = self.remove_emojis(resp.choices[0].message.content.strip())
-                print(f"Ella: {quick}")
+                quick = self._answer_child_question(child_question)
+                self.channel.say(f"Ella: {quick}")
                 self.story_log.append(f"Ella: {quick}")
 
             # 2. Adventure intro (personalized, smooth transition)
@@ -354,8 +412,7 @@ class StoryInteractionHandler:
             ]
             segue = random.choice(segue_templates)
             adventure_intro = f"{ack} {rainbow_line} {segue}"
-            adventure_intro = self.remove_emojis(adventure_intro)
-            print(f"Ella: {adventure_intro}")
+            self.channel.say(f"Ella: {adventure_intro}")
             self.story_log.append(f"Ella: {adventure_intro}")
 
             # 3. Theme choice (present only two random themes, add examples after each)
@@ -366,16 +423,23 @@ class StoryInteractionHandler:
                 "A natural biome (like a rainforest or desert)": "(like a rainforest or desert)"
             }
             two_themes = random.sample(self.ADVENTURE_THEMES, 2)
+            for theme in two_themes:
+                prefetcher.submit(
+                    "theme_ack", theme, self._pre_story_line, prompt,
+                    f"Show excitement about their choice of {theme} and then say: 'Let's get ready with our magic words!'",
+                    call_site="pre_story_theme_ack",
+                    fallback=f"Wow, {theme.split('(')[0].strip().lower()}, what a great choice! Let's get ready with our magic words!"
+                )
             # Only print the two theme choices, nothing else
             for i, theme in enumerate(two_themes, 1):
                 base = theme.split('(')[0].strip()
                 example = theme_examples.get(theme, None)
                 if example:
-                    print(f"{i}. {base} {example}")
+                    self.channel.say(f"{i}. {base} {example}")
                 else:
-                    print(f"{i}. {base}")
+                    self.channel.say(f"{i}. {base}")
             while True:
-                child_theme = input(f"{self.child_name}: ").strip().lower()
+                child_theme = self.channel.ask(f"{self.child_name}: ").strip().lower()
                 matches = [theme for theme in two_themes if child_theme in theme.lower()]
                 if not matches:
                     matches = [theme for theme in two_themes if any(word in theme.lower() for word in child_theme.split())]
@@ -383,51 +447,29 @@ class StoryInteractionHandler:
                     self.chosen_theme = matches[0]
                     break
                 else:
-                    print("Ella: That sounds fun! Can you say a few words from the theme you want?")
+                    self.channel.say("Ella: That sounds fun! Can you say a few words from the theme you want?")
             self.story_log.append(f"Child: {self.chosen_theme}")
 
             # 4. Theme acknowledgment (short, direct transition to game)
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": f"Show excitement about their choice of {self.chosen_theme} and then say: 'Let's get ready with our magic words!'"}
-                ],
-                max_tokens=60,
-                temperature=0.7
-            )
-            raw_theme_ack = response.choices[0].message.content.strip()
-            theme_ack = self.remove_emojis(raw_theme_ack)
-            print(f"Ella: {theme_ack}")
+            raw_theme_ack = prefetcher.take(self.chosen_theme)
+            for theme in two_themes:
+                if theme != self.chosen_theme:
+                    prefetcher.discard(theme)
+            theme_ack = sanitize_line(raw_theme_ack)
+            self.channel.say(f"Ella: {theme_ack}")
             self.story_log.append(f"Ella: {theme_ack}")
 
             # 5. Magic word game (use the actual story vocab, check correctness)
-            game_styles = [
-                "Magic Word Unlock",
-                "Robot Freeze Game",
-                "Story Hat Chooser",
-                "Oops! Wrong Story!"
-            ]
-            chosen_style = random.choice(game_styles)
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": f"Introduce the magic word game using the {chosen_style} style. Make it playful and engaging, but do NOT mention or list any of the magic words. Only say that you need three magic words to unlock the story, and ask if the child is ready. Only output a single, short introduction sentence."}
-                ],
-                max_tokens=60,
-                temperature=0.7
-            )
-            raw_game_intro = response.choices[0].message.content.strip().split('\n')[0]
-            game_intro = self.remove_emojis(raw_game_intro)
-            print(f"Ella: {game_intro}")
+            raw_game_intro = prefetcher.take("game_intro").split('\n')[0]
+            game_intro = sanitize_line(raw_game_intro)
+            self.channel.say(f"Ella: {game_intro}")
             self.story_log.append(f"Ella: {game_intro}")
             for idx, word in enumerate(words):
                 ordinal = ["first", "second", "third"][idx]
                 # First attempt
-                print(f"Ella: The {ordinal} magic word is '{word}'. Can you say '{word}'?")
+                self.channel.say(f"Ella: The {ordinal} magic word is '{word}'. Can you say '{word}'?")
                 self.story_log.append(f"Ella: The {ordinal} magic word is '{word}'. Can you say '{word}'?")
-                word_response = input(f"{self.child_name}: ")
+                word_response = self.channel.ask(f"{self.child_name}: ")
                 self.story_log.append(f"Child: {word_response}")
                 
                 # If first attempt is wrong, give one retry
@@ -439,24 +481,19 @@ class StoryInteractionHandler:
                         f"Oops, I didn't hear that clearly. Could you repeat '{word}'?"
                     ]
                     retry_prompt = random.choice(retry_templates)
-                    retry_prompt = self.remove_emojis(retry_prompt)
-                    print(f"Ella: {retry_prompt}")
+                    self.channel.say(f"Ella: {retry_prompt}")
                     self.story_log.append(f"Ella: {retry_prompt}")
-                    word_response = input(f"{self.child_name}: ")
+                    word_response = self.channel.ask(f"{self.child_name}: ")
                     self.story_log.append(f"Child: {word_response}")
                 # Only give special praise after the last word
                 if idx == 2:
-                    response = self.client.chat.completions.create(
-                        model="gpt-4o-mini",
-                        messages=[
-                            {"role": "system", "content": prompt},
-                            {"role": "user", "content": f"Give a special, enthusiastic praise for the child saying all three magic words, referencing their last response: '{word_response}'. Celebrate unlocking the story together!"}
-                        ],
-                        max_tokens=60,
-                        temperature=0.7
-                    )
-                    encouragement = self.remove_emojis(response.choices[0].message.content.strip())
-                    print(f"Ella: {encouragement}")
+                    encouragement = sanitize_line(self._pre_story_line(
+                        prompt,
+                        f"Give a special, enthusiastic praise for the child saying all three magic words, referencing their last response: '{word_response}'. Celebrate unlocking the story together!",
+                        call_site="pre_story_praise",
+                        fallback=f"Hooray, {self.child_name}! You said all three magic words and we unlocked the story together!"
+                    ))
+                    self.channel.say(f"Ella: {encouragement}")
                     self.story_log.append(f"Ella: {encouragement}")
 
             # 6. Story bridge (short, direct, varied transition)
@@ -467,17 +504,48 @@ class StoryInteractionHandler:
                 f"Let's dive into my story and see what I discovered!"
             ]
             story_bridge = random.choice(story_bridges)
-            story_bridge = self.remove_emojis(story_bridge)
-            print(f"Ella: {story_bridge}")
+            self.channel.say(f"Ella: {story_bridge}")
             self.story_log.append(f"Ella: {story_bridge}")
 
-            print("\n=== Starting interactive story session...===\n")
+            self.channel.say("\n=== Starting interactive story session...===\n")
 
         except Exception as e:
+            prefetcher.discard_all()
             print(f"Warning: Could not complete LLM-guided pre-story interaction: {e}")
             print("Falling back to basic pre-story interaction...")
             self._basic_pre_story_interaction()
 
+    def _pre_story_line(self, prompt, instruction, max_tokens=60, call_site="pre_story_line", fallback=None):
+        """Generate one pre-story line with the pre-story system prompt.
+
+        Args:
+            prompt: The formatted pre-story system prompt
+            instruction: What the robot should say
+            max_tokens: Maximum length of the line
+            call_site: Name of the call in the LLM traces
+            fallback: Line used if the call fails (the error is raised if None)
+
+        Returns:
+            str: The stripped model output
+        """
+        try:
+            with llm_call_site(call_site):
+                response = self.client.chat_completion(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content": prompt},
+                        {"role": "user", "content": instruction}
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=0.7
+                )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            if fallback is None:
+                raise
+            print(f"Warning: Could not generate the {call_site} line ({e}). Using a fallback line.")
+            return fallback
+
     def _basic_pre_story_interaction(self):
         # 1) DAILY CHECK-IN (Ella sharing her excitement)
         checkins = [
@@ -502,16 +570,15 @@ class StoryInteractionHandler:
             "Hi {name}! I spotted a bright rainbow after a storm—what beautiful colors did you see today?",
         ]
         checkin_prompt = random.choice(checkins).format(name=self.child_name)
-        checkin_prompt = self.remove_emojis(checkin_prompt)
-        print(f"Ella: {checkin_prompt}")
+        self.channel.say(f"Ella: {checkin_prompt}")
         self.story_log.append(f"Ella: {checkin_prompt}")
-        checkin_answer = input(f"{self.child_name}: ")
+        checkin_answer = self.channel.ask(f"{self.child_name}: ")
         self.story_log.append(f"Child: {checkin_answer}")
 
         # 2) ACKNOWLEDGE AND INTRODUCE ADVENTURES (personalized, smooth transition)
         ack = f"That's wonderful, {self.child_name}! I love hearing about your day and your story about '{checkin_answer}'. You know, I absolutely love adventures too! Now, let me share some of my past adventures with you. You can choose which one you like!"
         ack = self.remove_emojis(ack)
-        print(f"Ella: {ack}")
+        self.channel.say(f"Ella: {ack}")
         self.story_log.append(f"Ella: {ack}")
 
         # 3) PRESENT THEME CHOICES (only two, add examples after each)
@@ -527,25 +594,24 @@ class StoryInteractionHandler:
             base = theme.split('(')[0].strip()
             example = theme_examples.get(theme, None)
             if example:
-                print(f"{i}. {base} {example}")
+                self.channel.say(f"{i}. {base} {example}")
             else:
-                print(f"{i}. {base}")
+                self.channel.say(f"{i}. {base}")
         while True:
             try:
-                choice = int(input(f"\n{self.child_name}: "))
+                choice = int(self.channel.ask(f"\n{self.child_name}: "))
                 if 1 <= choice <= 2:
                     self.chosen_theme = two_themes[choice-1]
                     break
                 else:
-                    print("Ella: Oops! Please choose 1 or 2!")
+                    self.channel.say("Ella: Oops! Please choose 1 or 2!")
             except ValueError:
-                print("Ella: Please enter 1 or 2!")
+                self.channel.say("Ella: Please enter 1 or 2!")
         self.story_log.append(f"Child: {self.chosen_theme}")
 
         # 4) INTRODUCE MAGIC WORDS (use actual story vocab, check correctness)
         magic_intro = "Let's say the three special magic words together!"
-        magic_intro = self.remove_emojis(magic_intro)
-        print(f"Ella: {magic_intro}")
+        self.channel.say(f"Ella: {magic_intro}")
         self.story_log.append(f"Ella: {magic_intro}")
 
         words = self.select_target_words()
@@ -561,9 +627,9 @@ class StoryInteractionHandler:
         for i, word in enumerate(words):
             ordinal = ["first", "second", "third"][i]
             # First attempt
-            print(f"Ella: The {ordinal} magic word is '{word}'. Can you say '{word}'?")
+            self.channel.say(f"Ella: The {ordinal} magic word is '{word}'. Can you say '{word}'?")
             self.story_log.append(f"Ella: The {ordinal} magic word is '{word}'. Can you say '{word}'?")
-            reply = input(f"{self.child_name}: ")
+            reply = self.channel.ask(f"{self.child_name}: ")
             self.story_log.append(f"Child: {reply}")
             
             # If first attempt is wrong, give one retry
@@ -575,15 +641,13 @@ class StoryInteractionHandler:
                     f"Oops, I didn't hear that clearly. Could you repeat '{word}'?"
                 ]
                 retry_prompt = random.choice(retry_templates)
-                retry_prompt = self.remove_emojis(retry_prompt)
-                print(f"Ella: {retry_prompt}")
+                self.channel.say(f"Ella: {retry_prompt}")
                 self.story_log.append(f"Ella: {retry_prompt}")
-                reply = input(f"{self.child_name}: ")
+                reply = self.channel.ask(f"{self.child_name}: ")
                 self.story_log.append(f"Child: {reply}")
             if i < len(words) - 1:
                 encouragement = random.choice(encouraging_responses)
-                encouragement = self.remove_emojis(encouragement)
-                print(f"Ella: {encouragement}")
+                self.channel.say(f"Ella: {encouragement}")
                 self.story_log.append(f"Ella: {encouragement}")
         # 6) STORY BRIDGE (short, direct, varied transition)
         story_transitions = [
@@ -593,8 +657,7 @@ class StoryInteractionHandler:
             f"Let's dive into my story and see what I discovered!"
         ]
         story_transition = random.choice(story_transitions)
-        story_transition = self.remove_emojis(story_transition)
-        print(f"Ella: {story_transition}")
+        self.channel.say(f"Ella: {story_transition}")
         self.story_log.append(f"Ella: {story_transition}")
 
     def get_greeting(self):
@@ -619,7 +682,7 @@ class StoryInteractionHandler:
     def contains_question(self, text):
         """
         Check if text contains a question, with improved detection of question-like phrases.
-        Uses regex to handle various question formats and edge cases.
+        Uses the precompiled single-pass detector in question_detector.
         
         Args:
             text: The text to check
@@ -627,110 +690,174 @@ class StoryInteractionHandler:
         Returns:
             Tuple of (is_question, pre_question, post_question)
         """
-        if not text or not text.strip():
-            return False, None, None
-            
-        # Clean the text
-        clean_text = text.strip()
-        
-        # First check for explicit question marks with regex
-        question_pattern = r"[A-Za-z0-9][^.!?]*\?\s*$"
-        question_match = re.search(question_pattern, clean_text)
-        if question_match:
-            question_text = question_match.group(0)
-            pre_question = clean_text[:clean_text.find(question_text) + len(question_text)]
-            post_question = clean_text[clean_text.find(question_text) + len(question_text):]
-            return True, pre_question, post_question
-            
-        # Check for implicit question patterns
-        implicit_question_patterns = [
-            r"tell me", r"can you", r"would you", r"could you",
-            r"imagine", r"describe", r"explain", r"share",
-            r"think about", r"remember", r"recall",
-            r"what if", r"how about", r"let's talk about"
-        ]
-        
-        for pattern in implicit_question_patterns:
-            if re.search(rf"\b{pattern}\b", clean_text.lower()):
-                return True, clean_text, ""
-            
-        # Fallback: check for question-like phrases
-        question_phrases = [
-            r"^how\b", r"^what\b", r"^why\b", r"^who\b", r"^when\b", r"^where\b",
-            r"^can you\b", r"^would you\b", r"^could you\b", r"^do you\b",
-            r"^tell me about\b", r"^describe\b", r"^explain\b",
-            r"^what do you think\b", r"^what if\b", r"^imagine if\b",
-            r"^remember\b", r"^recall\b", r"^think about\b",
-            r"^can you tell me\b", r"^would you like to\b",
-            r"^what was your favorite\b", r"^how did you feel\b"
-        ]
-        
-        # Check for question phrases at start or after a space
-        for phrase in question_phrases:
-            if re.search(phrase, clean_text.lower()):
-                return True, clean_text, ""
-            if re.search(r"\s" + phrase, clean_text.lower()):
-                return True, clean_text, ""
-        
-        # Check for question-like structure without explicit question mark
-        question_indicators = [
-            r"can you", r"would you", r"could you", r"do you",
-            r"tell me", r"describe", r"explain", r"think about",
-            r"remember", r"recall", r"imagine", r"share",
-            r"what if", r"how about", r"let's talk about"
-        ]
+        return detect_question(text)
+    
+    def _stream_response(self, child_input, prompt, context_before, context_after,
+                         selected_technique, target_vocab, vocab_role, special_instructions, depth, model=None):
+        """
+        Print the robot's response incrementally as it streams in and record its latency.
         
-        for indicator in question_indicators:
-            if re.search(rf"\b{indicator}\b", clean_text.lower()):
-                return True, clean_text, ""
+        Returns:
+            Tuple of (text shown to the child, post-processed response)
+        """
+        stream = self.response_generator.generate_response_stream(
+            child_input, prompt, context_before, context_after,
+            selected_technique, target_vocab, vocab_role, special_instructions, model=model
+        )
+        self.channel.say_partial("Robot: ")
+        shown = ""
+        for chunk in stream:
+            self.channel.say_partial(chunk)
+            shown += chunk
+        self.channel.say("")
         
-        return False, None, None
+        self.turn_latencies.append({
+            "depth": depth,
+            "technique": selected_technique["name"],
+            "first_token_latency": stream.first_token_latency,
+            "total_latency": stream.total_latency
+        })
+        print(f"DEBUG: Response latency - first token {stream.first_token_latency:.2f}s, "
+              f"total {stream.total_latency:.2f}s")
+        return shown, stream.text
+    
+    def _answer_child_question(self, question):
+        """Answer a question the child asked in one short, encouraging sentence."""
+        try:
+            with llm_call_site("answer_child_question"):
+                resp = self.client.chat_completion(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content":
+                         "You are Ella, a caring robot. Please answer the child's question "
+                         "in one short, happy, encouraging sentence."
+                        },
+                        {"role": "user", "content": question}
+                    ],
+                    max_tokens=30,
+                    temperature=0.8
+                )
+        except Exception as e:
+            print(f"Warning: Could not answer the child's question ({e}). Using a fallback line.")
+            return "What a great question! Let's find out together."
+        return sanitize_line(resp.choices[0].message.content)
     
     def clean_response(self, response):
         """Clean up the response text."""
-        if response is None:
-            return ""
-        if response.startswith('"'):
-            response = response[1:]
-        if response.endswith('"'):
-            response = response[:-1]
-        return response.strip()
+        return strip_quotes(response)
     
     def handle_interaction(self, child_input, prompt, context_before, context_after, 
                           target_vocab=None, vocab_role=None, special_tag=None, depth=1, 
                           conversation_history=None, remainder_text=None, child_responses=None):
-        """Handle different types of interactions with the child."""
-        if child_responses is None:
-            child_responses = []
-        if conversation_history is None:
-            conversation_history = []
+        """
+        Handle different types of interactions with the child.
+        
+        Follow-up turns run in a loop until the depth limit is reached or the robot
+        stops asking. All turns share one bounded ConversationState, so every prompt
+        carries the story context once and the conversation history once.
+        
+        Args:
+            conversation_history: Optional earlier messages to seed the conversation with
+            child_responses: Unused; the child's answers are part of the conversation history
+        
+        Returns:
+            Tuple of (final response, technique selected for the first turn)
+        """
+        conversation = ConversationState(prompt, history=conversation_history)
+        start_depth = depth
+        first_technique = None
+        first_post_question = None
+        
+        while True:
+            with trace_context(depth=depth):
+                full_response, selected_technique, should_continue, has_question, post_question = self._handle_turn(
+                    child_input, conversation, context_before, context_after,
+                    target_vocab, vocab_role, special_tag, depth, remainder_text
+                )
+            if first_technique is None:
+                first_technique = selected_technique
+                first_post_question = post_question
+            
+            if not (should_continue and has_question):
+                break
+            
+            depth_indicator = ""
+            if depth > 1:
+                # For story retelling, show just the follow-up number
+                if special_tag == "summary" and self.chosen_ending_type == "story_retelling":
+                    depth_indicator = f"[Follow-up question {depth}]"
+                # For other ending interactions, show progress towards ending_depth_map
+                elif special_tag == "summary":
+                    max_depth = self.ending_depth_map.get(self.chosen_ending_type, self.ending_max_depth)
+                    depth_indicator = f"[Follow-up question {depth}/{max_depth-1}]"
+                    if depth == max_depth - 1:
+                        depth_indicator += " (Final follow-up)"
+                # For regular interactions, show progress towards max_interaction_depth
+                else:
+                    depth_indicator = f"[Follow-up question {depth}/{self.max_interaction_depth-1}]"
+                    if depth == self.max_interaction_depth - 1:
+                        depth_indicator += " (Final follow-up)"
+            
+            follow_up_input = self.channel.ask(f"Child {depth_indicator}: ")
+            
+            if depth > 1:
+                self.story_log.append(f"Child (Follow-up {depth}): {follow_up_input}", depth=depth)
+            else:
+                self.story_log.append(f"Child: {follow_up_input}", depth=depth)
+            
+            child_input = follow_up_input
+            depth += 1
+            remainder_text = None  # Remainder text only applies to the first turn
+        
+        # Append the first turn's post-question text to the final response (top level only)
+        if start_depth == 1 and depth > start_depth:
+            full_response = f"{full_response} {first_post_question}".strip()
+        
+        return full_response, first_technique
+    
+    def _route_response(self, label, technique, support_level, depth, special_tag):
+        """
+        Pick the model for a response request and record the decision in the story log.
+        
+        Returns:
+            The routed model, or None for the generator's default model when routing is off
+        """
+        if self.model_router is None:
+            return None
+        decision = self.model_router.route("response", technique, support_level, depth, special_tag)
+        self.story_log.append(f"[Routing] {label} (depth {depth}) -> {decision.model}: {decision.reason}",
+                              kind="routing", label=label, model=decision.model, rule=decision.rule,
+                              reason=decision.reason)
+        return decision.model
+    
+    def _handle_turn(self, child_input, conversation, context_before, context_after,
+                     target_vocab, vocab_role, special_tag, depth, remainder_text):
+        """
+        Run one turn of an interaction: select a technique, generate and show the response.
+        
+        Returns:
+            Tuple of (full_response, selected_technique, should_continue, has_question, post_question)
+        """
+        # The prompt holds the original question plus the conversation before this answer
+        prompt = conversation.render_prompt()
         
         # Handle empty input
         if not child_input or child_input.strip() == "":
             child_input = "I don't know"
 
         # --- NEW: Let the LLM answer the child's question dynamically ---
+        # The answer does not depend on technique selection, so it runs in the background
+        # while the technique is selected and is printed before the robot's response.
+        quick_answer_future = None
         child_asked_question, child_question, _ = self.contains_question(child_input)
         if child_asked_question and child_question:
-            resp = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content":
-                     "You are Ella, a caring robot. Please answer the child's question "
-                     "in one short, happy, encouraging sentence."
-                    },
-                    {"role": "user", "content": child_question}
-                ],
-                max_tokens=30,
-                temperature=0.8
+            quick_answer_future = self.executor.submit(
+                contextvars.copy_context().run, self._answer_child_question, child_question
             )
-            quick = self.remove_emojis(resp.choices[0].message.content.strip())
-            print(f"Ella: {quick}")
-            self.story_log.append(f"Ella: {quick}")
 
         # Add current response to history
-        child_responses.append(child_input)
-        conversation_history.append({"role": "user", "content": child_input})
+        conversation.add_child(child_input)
+        fused_response = None
         
         # Special handling for summary tag - randomly choose between three ending types
         if special_tag == "summary":
@@ -738,6 +865,15 @@ class StoryInteractionHandler:
             if not self.chosen_ending_type:
                 self.chosen_ending_type = random.choice(["response_summary_closure", "alternative_ending", "story_retelling"])
             
+            # Compact precomputed story facts instead of the whole story on every ending turn
+            story_assets = self.story_assets
+            if story_assets is not None:
+                context_before, context_after = story_assets.as_context(), ""
+            # Keywords for the local ending scorer come from the whole story, whatever context the LLM gets
+            if self.scaffolding_selector.ending_scorer and self.scaffolding_selector.story_keywords is None:
+                self.scaffolding_selector.story_keywords = StoryKeywords.for_story(
+                    self.story_content, self.story_sections, story_assets)
+            
             # Use the appropriate evaluation function based on the chosen ending type
             if self.chosen_ending_type == "story_retelling":
                 evaluation = self.scaffolding_selector._evaluate_retelling_complexity_llm(
@@ -823,6 +959,8 @@ class StoryInteractionHandler:
                 - "What would you have done differently if you were [character]?"
                 - "How did [event] help the characters learn something new?"
                 """
+            if story_assets is not None and story_assets.instructions(self.chosen_ending_type):
+                special_instructions += f"{story_assets.instructions(self.chosen_ending_type)}\n"
         # Adjust technique selection for maximum depth - use transition
         elif depth >= self.max_interaction_depth and not (special_tag == "summary" and self.chosen_ending_type == "story_retelling"):
             selected_technique = {
@@ -834,6 +972,24 @@ class StoryInteractionHandler:
             example = random.choice(self.scaffolding_selector.SCAFFOLDING_TECHNIQUES["transition"]["examples"])
             selected_technique["details"]["example"] = example
             special_instructions = None
+        elif self.fused_turn is not None:
+            special_instructions = None
+            selected_technique = self.scaffolding_selector.select_technique_without_llm(
+                child_input, prompt, context_before, context_after,
+                target_vocab, vocab_role, self.max_interaction_depth, depth
+            )
+            if selected_technique is None:
+                # The upcoming story is left out of the fused call, as it is of the response call
+                fused = self.fused_turn.select_and_respond(
+                    child_input, prompt, context_before, target_vocab, vocab_role,
+                    self._route_response("select_and_respond", None, None, depth, special_tag)
+                )
+                if fused is not None:
+                    selected_technique, fused_response = fused
+                else:
+                    selected_technique = self.scaffolding_selector.select_technique_with_llm(
+                        child_input, prompt, context_before, context_after, target_vocab, vocab_role
+                    )
         else:
             selected_technique = self.scaffolding_selector.select_technique(
                 child_input, prompt, context_before, context_after,
@@ -841,35 +997,52 @@ class StoryInteractionHandler:
             )
             special_instructions = None
         
+        if quick_answer_future is not None:
+            quick = quick_answer_future.result()
+            self.channel.say(f"Ella: {quick}")
+            self.story_log.append(f"Ella: {quick}")
+        
         # Generate response with the updated ResponseGenerator that includes vocab target and role
         # Pass context_after only for transition technique or summary tag
         if selected_technique["name"] == "transition" or special_tag == "summary":
             # For transition or summary, pass both contexts
-            response = self.response_generator.generate_response(
-                child_input, prompt, context_before, context_after, 
-                selected_technique, target_vocab, vocab_role, special_instructions
-            )
+            response_context_after = context_after
         else:
             # For all other scaffolding techniques, only pass context_before
+            response_context_after = None
+        
+        streamed_text = None
+        if fused_response is not None:
+            # Already generated together with the technique selection
+            response = fused_response
+        elif self.stream_responses:
+            model = self._route_response(selected_technique["name"], selected_technique["name"],
+                                         selected_technique.get("support_level"), depth, special_tag)
+            streamed_text, response = self._stream_response(
+                child_input, prompt, context_before, response_context_after,
+                selected_technique, target_vocab, vocab_role, special_instructions, depth, model
+            )
+        else:
+            model = self._route_response(selected_technique["name"], selected_technique["name"],
+                                         selected_technique.get("support_level"), depth, special_tag)
             response = self.response_generator.generate_response(
-                child_input, prompt, context_before, None, 
-                selected_technique, target_vocab, vocab_role, special_instructions
+                child_input, prompt, context_before, response_context_after, 
+                selected_technique, target_vocab, vocab_role, special_instructions, model=model
             )
         
-        # Clean the response to remove any extra quotation marks
-        response = self.clean_response(response)
+        # Remove emojis, extra spaces and surrounding quotation marks once, as the line is produced
+        response = sanitize_line(response)
+        
+        # Check if response contains a question
+        has_question, pre_question, post_question = self.contains_question(response)
         
         # Apply remainder text only at the highest level or when reaching max depth
         full_response = response
         if remainder_text and (depth == 1 or depth >= self.max_interaction_depth):
-            has_q, _, _ = self.contains_question(response)
-            if depth >= self.max_interaction_depth or not has_q or special_tag == "summary":
+            if depth >= self.max_interaction_depth or not has_question or special_tag == "summary":
                 full_response = f"{response} {remainder_text}"
         
-        conversation_history.append({"role": "assistant", "content": full_response})
-        
-        # Check if response contains a question
-        has_question, pre_question, post_question = self.contains_question(response)
+        conversation.add_robot(full_response)
         
         # Clean the response parts
         pre_question = self.clean_response(pre_question)
@@ -892,7 +1065,7 @@ class StoryInteractionHandler:
 
             # ——— 4. make sure NON-final turns contain an invitation ———
             if should_continue:
-                has_q, _, _ = self.contains_question(full_response)
+                has_q = has_question if full_response == response else self.contains_question(full_response)[0]
                 if not has_q:          # no "?" and no question phrases
                     full_response += " What else did you notice in our adventure?"
                     has_question = True
@@ -953,8 +1126,9 @@ class StoryInteractionHandler:
         else:
             should_continue = depth < self.max_interaction_depth
         
-        # Always print the robot's response
-        print(f"Robot: {full_response}")
+        # Always print the robot's response (streamed responses only if post-processing changed them)
+        if streamed_text is None or sanitize_line(streamed_text) != full_response.strip():
+            self.channel.say(f"Robot: {full_response}")
         
         # Log scaffolding strategy and robot's prompt for all depths
         strategy_log = f"[Scaffolding Strategy: {selected_technique['name']} ({selected_technique['support_level']} support) - Complexity Score: {selected_technique['complexity_score']}/10]"
@@ -965,79 +1139,24 @@ class StoryInteractionHandler:
             strategy_log += f" [Target Vocabulary: {vocab_info}]"
         if special_tag:
             strategy_log += f" [Special Tag: {special_tag}]"
-        self.story_log.append(strategy_log)
-        self.story_log.append(f"Robot: {full_response.strip()}")
+        self.story_log.append(strategy_log, kind="strategy", technique=selected_technique["name"],
+                              support_level=selected_technique["support_level"],
+                              score=selected_technique["complexity_score"], vocab=target_vocab,
+                              vocab_role=vocab_role, special_tag=special_tag)
+        self.story_log.append(f"Robot: {full_response.strip()}", technique=selected_technique["name"])
         
-        if should_continue and has_question:
-            depth_indicator = ""
-            if depth > 1:
-                # For story retelling, show just the follow-up number
-                if special_tag == "summary" and self.chosen_ending_type == "story_retelling":
-                    depth_indicator = f"[Follow-up question {depth}]"
-                # For other ending interactions, show progress towards ending_depth_map
-                elif special_tag == "summary":
-                    max_depth = self.ending_depth_map.get(self.chosen_ending_type, self.ending_max_depth)
-                    depth_indicator = f"[Follow-up question {depth}/{max_depth-1}]"
-                    if depth == max_depth - 1:
-                        depth_indicator += " (Final follow-up)"
-                # For regular interactions, show progress towards max_interaction_depth
-                else:
-                    depth_indicator = f"[Follow-up question {depth}/{self.max_interaction_depth-1}]"
-                    if depth == self.max_interaction_depth - 1:
-                        depth_indicator += " (Final follow-up)"
-            
-            follow_up_input = input(f"Child {depth_indicator}: ")
-            
-            if depth > 1:
-                self.story_log.append(f"Child (Follow-up {depth}): {follow_up_input}")
-            else:
-                self.story_log.append(f"Child: {follow_up_input}")
-            
-            modified_context_before = context_before + "\n" + "\n".join(
-                [f"{'Child' if item['role'] == 'user' else 'Robot'}: {item['content']}" 
-                for item in conversation_history[:-1]]
-            )
-            
-            # Include conversation history in the prompt for better context
-            conversation_context = "\nPrevious conversation:\n" + "\n".join(
-                [f"{item['role'].capitalize()}: {item['content']}" for item in conversation_history]
-            )
-            
-            # Add prior conversation to ground follow-up questions
-            if child_responses and len(child_responses) > 0:
-                conversation_context += "\nPrevious responses from the child:\n"
-                for i, resp in enumerate(child_responses):
-                    conversation_context += f"- Turn {i+1}: \"{resp}\"\n"
-            
-            modified_prompt = prompt + conversation_context
-            
-            # Don't pass post_question to recursive calls
-            follow_up_response, follow_up_technique = self.handle_interaction(
-                follow_up_input, 
-                modified_prompt,  # Use modified prompt with conversation history
-                modified_context_before,
-                context_after,
-                target_vocab,  # Pass the target vocabulary to recursive calls
-                vocab_role,    # Pass the vocabulary role to recursive calls
-                special_tag,   # Pass the special tag to recursive calls
-                depth + 1,
-                conversation_history,
-                None,  # Set remainder_text to None for intermediate depths
-                child_responses  # Pass the updated child responses
-            )
-            
-            # Only append post_question at the final return (depth=1)
-            if depth == 1:
-                full_follow_up_response = f"{follow_up_response} {post_question}".strip()
-            else:
-                full_follow_up_response = follow_up_response
-            
-            return full_follow_up_response, selected_technique
-        else:
-            return full_response, selected_technique
+        return full_response, selected_technique, should_continue, has_question, post_question
+    
+    def _story_context(self, index):
+        """Story context before and after interaction `index` (windowed if context_paragraphs is set)."""
+        if self.context_window is None:
+            section = self.story_sections[index]
+            return section['context_before'], section['context_after']
+        return self.context_window.context_before(index), self.context_window.context_after(index)
     
     def process_story(self):
-        print("\n === Starting interactive story session...=== \n")
+        set_trace_context(session_id=self.session_id)
+        self.channel.say("\n === Starting interactive story session...=== \n")
         
         if self.test_mode:
             print("Running in test mode - skipping to last interaction...")
@@ -1049,70 +1168,79 @@ class StoryInteractionHandler:
                     break
             
             if last_section:
-                # Use regex to remove all interaction tags completely
-                display_text = re.sub(r'<interaction.*?</interaction>', '', last_section['text'])
+                # Text without interaction tags (precomputed for compiled stories)
+                display_text = last_section.display_text
                 
-                print(f"Robot:\n{display_text}")
-                print(f"{last_section['prompt']}\n")
-                self.story_log.append(f"Robot:\n{last_section['text']}")
+                self.channel.say(f"Robot:\n{display_text}")
+                self.channel.say(f"{last_section['prompt']}\n")
+                self.story_log.append(f"Robot:\n{last_section['text']}", kind="story")
                 
-                child_input = input(f"{self.child_name}: ")
+                child_input = self.channel.ask(f"{self.child_name}: ")
                 self.story_log.append(f"Child: {child_input}")
                 
                 # Pass both target vocabulary, vocab role, and special tag to handle_interaction
-                ai_response, technique = self.handle_interaction(
-                    child_input, last_section['prompt'], last_section['context_before'], 
-                    last_section['context_after'], last_section['vocab'], last_section['vocab_role'], last_section['special_tag']
-                )
+                index = self.story_sections.index(last_section)
+                context_before, context_after = self._story_context(index)
+                with trace_context(interaction=index):
+                    ai_response, technique = self.handle_interaction(
+                        child_input, last_section['prompt'], context_before, 
+                        context_after, last_section['vocab'], last_section['vocab_role'], last_section['special_tag']
+                    )
                 
                 if not self.contains_question(ai_response)[0]:
-                    print(f"Robot: {ai_response}")
+                    self.channel.say(f"Robot: {ai_response}")
             else:
-                print("No interactive sections found in the story.")
+                self.channel.say("No interactive sections found in the story.")
         else:
             # Original process_story logic
             for i, section in enumerate(self.story_sections):
                 if section['prompt']:
-                    # Use regex to remove all interaction tags completely
-                    display_text = re.sub(r'<interaction.*?</interaction>', '', section['text'])
+                    # Text without interaction tags (precomputed for compiled stories)
+                    display_text = section.display_text
                     
-                    print(f"Robot:\n{display_text}")
-                    print(f"{section['prompt']}\n")
-                    self.story_log.append(f"Robot:\n{section['text']}")
+                    self.channel.say(f"Robot:\n{display_text}")
+                    self.channel.say(f"{section['prompt']}\n")
+                    self.story_log.append(f"Robot:\n{section['text']}", kind="story")
                     
-                    child_input = input(f"{self.child_name}: ")
-                    self.story_log.append(f"Child: {child_input}")
+                    child_input = self.channel.ask(f"{self.child_name}: ")
+                    self.story_log.append(f"Child: {child_input}", interaction=i)
                     
                     # Pass both target vocabulary, vocab role, and special tag to handle_interaction
-                    ai_response, technique = self.handle_interaction(
-                        child_input, section['prompt'], section['context_before'], 
-                        section['context_after'], section['vocab'], section['vocab_role'], section['special_tag']
-                    )
+                    context_before, context_after = self._story_context(i)
+                    with trace_context(interaction=i):
+                        ai_response, technique = self.handle_interaction(
+                            child_input, section['prompt'], context_before, 
+                            context_after, section['vocab'], section['vocab_role'], section['special_tag']
+                        )
                     
                     if not self.contains_question(ai_response)[0]:
-                        print(f"Robot: {ai_response}")
+                        self.channel.say(f"Robot: {ai_response}")
                 else:
                     # Also clean any interaction tags from non-prompt sections
-                    clean_text = re.sub(r'<interaction.*?</interaction>', '', section['text'])
-                    print(f"Robot:\n{clean_text.strip()}\n")
-                    self.story_log.append(f"Robot:\n{section['text']}")
+                    clean_text = section.display_text
+                    self.channel.say(f"Robot:\n{clean_text.strip()}\n")
+                    self.story_log.append(f"Robot:\n{section['text']}", kind="story")
         
         return self.story_log
 
+    def close(self):
+        """Wait for the session's background LLM calls, stop its worker threads and close the story log."""
+        self.executor.shutdown(wait=True)
+        self.story_log.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
     def save_interaction_log(self, output_file):
         with open(output_file, 'w') as file:
             log_entries = []
             
             for entry in self.story_log:
-                # Clean each entry
+                # Robot lines were already sanitized when they were generated
                 cleaned = entry.strip()
-                
-                # Handle quote removal for log entries
-                if cleaned.startswith('Robot: "') and cleaned.endswith('"'):
-                    cleaned = f"Robot: {cleaned[8:-1]}"
-                elif cleaned.startswith('Child: "') and cleaned.endswith('"'):
-                    cleaned = f"Child: {cleaned[8:-1]}"
-                    
                 if cleaned:  # Skip empty lines
                     log_entries.append(cleaned)
             
@@ -1123,7 +1251,7 @@ class StoryInteractionHandler:
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python interaction_handler.py  [openai_api_key] [--max-depth N] [--response-length short|standard] [--test-mode]")
+        print("Usage: python interaction_handler.py  [openai_api_key] [--max-depth N] [--response-length short|standard] [--test-mode] [--prompt-layout standard|cache_friendly] [--stream] [--cache] [--cache-db PATH] [--fast-path] [--fast-path-shadow RATE] [--reload-prompts] [--trace PATH] [--trace-format jsonl|otlp] [--deadline SECONDS] [--hedge-after SECONDS] [--model-routing] [--routing-config PATH] [--latency-budget SECONDS] [--fused] [--jsonl-log PATH] [--context-paragraphs N] [--context-summaries extractive|llm] [--ending-assets local|llm] [--ending-scorer first_pass|local] [--scorer-calibration PATH]")
         sys.exit(1)
     
     story_file_path = sys.argv[1]
@@ -1131,6 +1259,24 @@ def main():
     max_depth = 3
     response_length = "short"  # Default to short responses
     test_mode = False
+    stream_responses = False
+    use_cache = False
+    cache_db = None
+    fast_path = False
+    fast_path_config = None
+    prompt_layout = "standard"
+    trace_path = None
+    trace_format = "jsonl"
+    resilience_options = {}
+    model_routing = False
+    model_routing_config = {}
+    fused_turns = False
+    jsonl_log = None
+    context_paragraphs = None
+    context_summaries = "extractive"
+    ending_assets = None
+    ending_scorer = None
+    ending_scorer_calibration = None
     
     i = 2
     while i < len(sys.argv):
@@ -1148,9 +1294,116 @@ def main():
             else:
                 print(f"Error: --response-length must be 'short' or 'standard', got '{sys.argv[i+1]}'")
                 sys.exit(1)
+        elif sys.argv[i] == "--prompt-layout" and i+1 < len(sys.argv):
+            if sys.argv[i+1] in ResponseGenerator.PROMPT_LAYOUTS:
+                prompt_layout = sys.argv[i+1]
+                i += 2
+            else:
+                print(f"Error: --prompt-layout must be 'standard' or 'cache_friendly', got '{sys.argv[i+1]}'")
+                sys.exit(1)
         elif sys.argv[i] == "--test-mode":
             test_mode = True
             i += 1
+        elif sys.argv[i] == "--stream":
+            stream_responses = True
+            i += 1
+        elif sys.argv[i] == "--cache":
+            use_cache = True
+            i += 1
+        elif sys.argv[i] == "--cache-db" and i+1 < len(sys.argv):
+            use_cache = True
+            cache_db = sys.argv[i+1]
+            i += 2
+        elif sys.argv[i] == "--reload-prompts":
+            get_prompt_registry(hot_reload=True)
+            i += 1
+        elif sys.argv[i] == "--trace" and i+1 < len(sys.argv):
+            trace_path = sys.argv[i+1]
+            i += 2
+        elif sys.argv[i] == "--trace-format" and i+1 < len(sys.argv):
+            if sys.argv[i+1] in ["jsonl", "otlp"]:
+                trace_format = sys.argv[i+1]
+                i += 2
+            else:
+                print(f"Error: --trace-format must be 'jsonl' or 'otlp', got '{sys.argv[i+1]}'")
+                sys.exit(1)
+        elif sys.argv[i] in ["--deadline", "--hedge-after"] and i+1 < len(sys.argv):
+            try:
+                resilience_options[sys.argv[i][2:].replace("-", "_")] = float(sys.argv[i+1])
+                i += 2
+            except ValueError:
+                print(f"Error: {sys.argv[i]} requires a number of seconds, got '{sys.argv[i+1]}'")
+                sys.exit(1)
+        elif sys.argv[i] == "--model-routing":
+            model_routing = True
+            i += 1
+        elif sys.argv[i] == "--routing-config" and i+1 < len(sys.argv):
+            try:
+                with open(sys.argv[i+1], "r") as f:
+                    model_routing_config.update(json.load(f))
+                model_routing = True
+                i += 2
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Error: Could not read routing config '{sys.argv[i+1]}': {e}")
+                sys.exit(1)
+        elif sys.argv[i] == "--latency-budget" and i+1 < len(sys.argv):
+            try:
+                model_routing_config["session_budget"] = float(sys.argv[i+1])
+                model_routing = True
+                i += 2
+            except ValueError:
+                print(f"Error: --latency-budget requires a number of seconds, got '{sys.argv[i+1]}'")
+                sys.exit(1)
+        elif sys.argv[i] == "--jsonl-log" and i+1 < len(sys.argv):
+            jsonl_log = sys.argv[i+1]
+            i += 2
+        elif sys.argv[i] == "--fused":
+            fused_turns = True
+            i += 1
+        elif sys.argv[i] == "--context-paragraphs" and i+1 < len(sys.argv):
+            try:
+                context_paragraphs = int(sys.argv[i+1])
+                i += 2
+            except ValueError:
+                print(f"Error: --context-paragraphs requires a number of paragraphs, got '{sys.argv[i+1]}'")
+                sys.exit(1)
+        elif sys.argv[i] == "--context-summaries" and i+1 < len(sys.argv):
+            if sys.argv[i+1] not in ("extractive", "llm"):
+                print(f"Error: --context-summaries must be 'extractive' or 'llm', got '{sys.argv[i+1]}'")
+                sys.exit(1)
+            context_summaries = sys.argv[i+1]
+            i += 2
+        elif sys.argv[i] == "--ending-assets" and i+1 < len(sys.argv):
+            if sys.argv[i+1] not in ("local", "llm"):
+                print(f"Error: --ending-assets must be 'local' or 'llm', got '{sys.argv[i+1]}'")
+                sys.exit(1)
+            ending_assets = sys.argv[i+1]
+            i += 2
+        elif sys.argv[i] == "--ending-scorer" and i+1 < len(sys.argv):
+            if sys.argv[i+1] not in ("first_pass", "local"):
+                print(f"Error: --ending-scorer must be 'first_pass' or 'local', got '{sys.argv[i+1]}'")
+                sys.exit(1)
+            ending_scorer = sys.argv[i+1]
+            i += 2
+        elif sys.argv[i] == "--scorer-calibration" and i+1 < len(sys.argv):
+            try:
+                ending_scorer_calibration = load_calibration(sys.argv[i+1])
+            except (OSError, ValueError) as e:
+                print(f"Error: could not read the scorer calibration: {e}")
+                sys.exit(1)
+            ending_scorer = ending_scorer or "first_pass"
+            i += 2
+        elif sys.argv[i] == "--fast-path":
+            fast_path = True
+            i += 1
+        elif sys.argv[i] == "--fast-path-shadow" and i+1 < len(sys.argv):
+            try:
+                fast_path = True
+                fast_path_config = {"shadow_rate": float(sys.argv[i+1])}
+                i += 2
+            except ValueError:
+                print(f"Error: --fast-path-shadow requires a number between 0 and 1, got '{sys.argv[i+1]}'")
+                sys.exit(1)
         elif not api_key:
             api_key = sys.argv[i]
             i += 1
@@ -1158,17 +1411,74 @@ def main():
             i += 1
     
     output_file = os.path.splitext(story_file_path)[0] + "_interaction_log.txt"
+    # The transcript is written as the session goes, so a crash keeps everything up to the last few seconds
+    log_sinks = [SessionLogWriter(output_file)]
+    if jsonl_log:
+        log_sinks.append(SessionLogWriter(jsonl_log, format="jsonl"))
     
     try:
-        handler = StoryInteractionHandler(story_file_path, api_key, max_depth, response_length, test_mode)
+        llm_client = None
+        # Record a span for every LLM call with --trace
+        tracer = Tracer() if trace_path else None
+        if use_cache or tracer is not None or resilience_options:
+            # Cache deterministic evaluation/selection calls in memory (and on disk with --cache-db)
+            cache = ResponseCache(db_path=cache_db) if use_cache else None
+            llm_client = LLMClient(api_key=api_key, cache=cache, tracer=tracer,
+                                   resilience=ResiliencePolicy(**resilience_options))
+        handler = StoryInteractionHandler(story_file_path, api_key, max_depth, response_length, test_mode,
+                                          llm_client=llm_client, stream_responses=stream_responses,
+                                          fast_path=fast_path, fast_path_config=fast_path_config,
+                                          prompt_layout=prompt_layout, model_routing=model_routing,
+                                          model_routing_config=model_routing_config, fused_turns=fused_turns,
+                                          log_sinks=log_sinks, log_memory_limit=1000,
+                                          context_paragraphs=context_paragraphs, context_summaries=context_summaries,
+                                          ending_assets=ending_assets, ending_scorer=ending_scorer,
+                                          ending_scorer_calibration=ending_scorer_calibration)
         handler.process_story()
-        handler.save_interaction_log(output_file)
+        handler.close()
+        print(f"Interaction log saved to {output_file}")
+        if jsonl_log:
+            print(f"Structured interaction log saved to {jsonl_log}")
+        print(handler.response_generator.format_usage_stats())
+        print(handler.prefetcher.format_stats())
+        print(handler.client.resilience.format_stats())
+        if handler.model_router is not None:
+            print(handler.model_router.format_stats())
+        if handler.fused_turn is not None:
+            print(handler.fused_turn.format_stats())
+        if use_cache:
+            print(llm_client.cache.format_stats())
+        if tracer is not None:
+            if trace_format == "otlp":
+                tracer.export_otlp_json(trace_path)
+            else:
+                tracer.export_jsonl(trace_path)
+            print(f"LLM call traces written to {trace_path}")
+            print(tracer.format_summary())
+        if fast_path:
+            stats = handler.scaffolding_selector.get_fast_path_stats()
+            print(f"Fast path: {stats['resolved']} resolved locally, {stats['escalated']} escalated to the LLM "
+                  f"({stats['resolved_rate']:.0%} resolved) {stats['rules']}")
+            if stats["shadow_checks"]:
+                print(f"Fast path agreement with the LLM over {stats['shadow_checks']} checks: "
+                      f"support level {stats['support_agreement_rate']:.0%}, "
+                      f"technique {stats['technique_agreement_rate']:.0%}")
+        if ending_scorer:
+            stats = handler.scaffolding_selector.get_ending_scorer_stats()
+            print(f"Ending scorer: {stats['resolved']} answers scored locally, {stats['escalated']} sent to the LLM")
+            if stats["comparisons"]:
+                print(f"Ending scorer agreement with the LLM over {stats['comparisons']} escalated answers: "
+                      f"support level {stats['support_agreement_rate']:.0%}, "
+                      f"mean score difference {stats['mean_abs_error']:.1f}")
         print("\n === Interactive Story Session completed. ===")
     except ValueError as e:
         print(f"Error: {e}")
         print("\nYou can provide your API key directly as an command line argument:")
         print("python interaction_handler.py story_file.txt your_api_key")
         sys.exit(1)
+    finally:
+        for sink in log_sinks:
+            sink.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
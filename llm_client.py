@@ -0,0 +1,212 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from openai.types.chat import ChatCompletion
+
+from resilience import ResiliencePolicy
+from response_cache import ResponseCache
+from tracing import LLMSpan, Tracer, current_trace
+
+# Load environment variables from .env file
+load_dotenv()
+
+
+class LLMClient:
+    """Shared OpenAI chat client with one pooled HTTP connection set per process.
+
+    StoryInteractionHandler, ScaffoldingSelector and ResponseGenerator all accept an
+    LLMClient so that a session (or a process running many sessions) keeps a single
+    warm keep-alive pool, one set of timeouts and per-model concurrency limits.
+    """
+
+    # Maximum number of in-flight requests per model (models not listed use default_concurrency)
+    DEFAULT_MODEL_CONCURRENCY = {
+        "gpt-4": 8,
+        "gpt-4o-mini": 16
+    }
+
+    def __init__(self, api_key: Optional[str] = None, timeout: float = 30.0, connect_timeout: float = 5.0,
+                 max_connections: int = 32, max_keepalive_connections: int = 16, keepalive_expiry: float = 60.0,
+                 model_concurrency: Optional[Dict[str, int]] = None, default_concurrency: int = 8,
+                 cache: Optional[ResponseCache] = None, tracer: Optional[Tracer] = None,
+                 resilience: Optional[ResiliencePolicy] = None, base_url: Optional[str] = None):
+        """Initialize the pooled client.
+
+        Args:
+            api_key: OpenAI API key (optional if set in environment)
+            timeout: Read/write timeout in seconds for a single request
+            connect_timeout: Timeout in seconds for establishing a connection
+            max_connections: Upper bound on open connections in the pool
+            max_keepalive_connections: Idle connections kept open for reuse
+            keepalive_expiry: Seconds an idle connection is kept alive
+            model_concurrency: Optional per-model overrides of in-flight request limits
+            default_concurrency: In-flight request limit for models without an override
+            cache: Optional ResponseCache used by calls made with cacheable=True
+            tracer: Optional Tracer that records a span for every call
+            resilience: Deadline, retry, hedging and circuit breaker policy (defaults to ResiliencePolicy())
+            base_url: Optional API base URL (e.g. a local stub server; defaults to the OpenAI API)
+        """
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not self.api_key:
+            raise ValueError("OpenAI API key is missing! Please provide it as an argument or in .env file.")
+
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.cache = cache
+        self.tracer = tracer
+        self.resilience = resilience or ResiliencePolicy()
+        if self.resilience.hedge_workers is None:
+            # Hedged requests need no more threads than there are connections to send them on
+            self.resilience.hedge_workers = max_connections
+        self.model_concurrency = dict(self.DEFAULT_MODEL_CONCURRENCY)
+        self.model_concurrency.update(model_concurrency or {})
+        self.default_concurrency = default_concurrency
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._semaphores_lock = threading.Lock()
+
+        # One keep-alive pool shared by every request made through this client
+        self.http_client = openai.DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout)
+        )
+        # Retries are made by the resilience policy, not by the SDK
+        self.client = openai.OpenAI(api_key=self.api_key, base_url=base_url, http_client=self.http_client,
+                                    max_retries=0)
+
+    def _get_semaphore(self, model: str) -> threading.BoundedSemaphore:
+        """Return the concurrency limiter for a model, creating it on first use."""
+        with self._semaphores_lock:
+            if model not in self._semaphores:
+                limit = self.model_concurrency.get(model, self.default_concurrency)
+                self._semaphores[model] = threading.BoundedSemaphore(limit)
+            return self._semaphores[model]
+
+    def _attempt_timeout(self, seconds: float) -> httpx.Timeout:
+        """Timeout for one attempt: the time left before the call's deadline, capped by the client's timeouts."""
+        return httpx.Timeout(min(seconds, self.timeout), connect=min(seconds, self.connect_timeout))
+
+    @contextmanager
+    def _span(self, model: str, trace: Optional[Tuple[str, Dict[str, Any]]] = None) -> Iterator[Optional[LLMSpan]]:
+        """Trace one call if a tracer is configured."""
+        if self.tracer is None:
+            yield None
+            return
+        with self.tracer.llm_span(model, trace) as span:
+            try:
+                yield span
+            finally:
+                if not span.cache_hit:
+                    last_call = self.resilience.last_call()
+                    span.retries = max(0, last_call["attempts"] - 1)
+                    span.hedged = last_call["hedged"]
+
+    def chat_completion(self, model: str, messages: List[Dict[str, str]], cacheable: bool = False, **params: Any):
+        """Create a chat completion, waiting for a free slot under the model's concurrency limit.
+
+        Args:
+            model: Model name, e.g. "gpt-4o-mini"
+            messages: Chat messages in OpenAI format
+            cacheable: If True and a cache is configured, identical requests are served from the cache.
+                       Only use for deterministic (low-temperature) calls.
+            **params: Additional completion parameters (max_tokens, temperature, ...)
+
+        Returns:
+            The OpenAI ChatCompletion response
+
+        Raises:
+            CircuitOpenError: If the provider is failing and the circuit breaker is open
+            Exception: The OpenAI error once the resilience policy gives up
+        """
+        with self._span(model) as span:
+            cache_key = None
+            if cacheable and self.cache is not None:
+                cache_key = ResponseCache.make_key(model, messages, params)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    response = ChatCompletion.model_validate_json(cached)
+                    if span is not None:
+                        span.cache_hit = True
+                        span.set_usage(response.usage)
+                    return response
+
+            semaphore = self._get_semaphore(model)
+            with semaphore:
+                response = self.resilience.call(
+                    lambda seconds: self.client.chat.completions.create(
+                        model=model, messages=messages, timeout=self._attempt_timeout(seconds), **params
+                    ),
+                    hedge=True,
+                    hedge_slot=semaphore
+                )
+
+            if span is not None:
+                span.set_usage(response.usage)
+            if cache_key is not None:
+                self.cache.set(cache_key, response.model_dump_json())
+            return response
+
+    def chat_completion_stream(self, model: str, messages: List[Dict[str, str]], **params: Any) -> Iterator[Any]:
+        """Stream a chat completion, holding the model's concurrency slot until the stream ends.
+
+        Args:
+            model: Model name, e.g. "gpt-4"
+            messages: Chat messages in OpenAI format
+            **params: Additional completion parameters (max_tokens, temperature, ...)
+
+        Returns:
+            An iterator of ChatCompletionChunk objects as they arrive; the request
+            is sent when iteration starts
+        """
+        return self._stream(model, messages, current_trace(), params)
+
+    def _stream(self, model: str, messages: List[Dict[str, str]], trace: Tuple[str, Dict[str, Any]],
+                params: Dict[str, Any]) -> Iterator[Any]:
+        with self._span(model, trace) as span, self._get_semaphore(model):
+            # Retried until the response starts; errors in the middle of a stream are not retried
+            stream = self.resilience.call(
+                lambda seconds: self.client.chat.completions.create(
+                    model=model, messages=messages, stream=True, timeout=self._attempt_timeout(seconds), **params
+                )
+            )
+            for chunk in stream:
+                if span is not None:
+                    span.first_token()
+                    span.set_usage(getattr(chunk, "usage", None))
+                yield chunk
+
+    def close(self) -> None:
+        """Close the underlying connection pool."""
+        self.http_client.close()
+        self.resilience.close()
+
+
+# Process-wide clients keyed by API key, so sessions in the same process share one pool
+_shared_clients: Dict[str, LLMClient] = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(api_key: Optional[str] = None) -> LLMClient:
+    """Return the process-wide LLMClient for an API key, creating it on first use.
+
+    Args:
+        api_key: OpenAI API key (optional if set in environment)
+
+    Returns:
+        The shared LLMClient instance
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OpenAI API key is missing! Please provide it as an argument or in .env file.")
+    with _shared_clients_lock:
+        if api_key not in _shared_clients:
+            _shared_clients[api_key] = LLMClient(api_key=api_key)
+        return _shared_clients[api_key]
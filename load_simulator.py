@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Load simulator: drive many complete story sessions through
+StoryInteractionHandler from a pool of processes, with synthetic children
+answering, against a local stub of the OpenAI chat completions API.
+
+Each session runs the pre-story interaction and every story section, and the
+sessions cycle through the three ending types. Each child has a persona drawn
+from the answer mix (disengaged, short, rich or questions) and answers mostly,
+but not only, in that style. The report gives sessions per second, LLM calls
+per session, peak memory per session (with --memory) and the latency the child
+waits between answering and the robot's reply.
+
+Usage: python load_simulator.py [--sessions 200] [--processes N] [--latency 0.05] [--jitter 0.0]
+                                [--error-rate 0.0] [--mix rich=0.4,short=0.3,disengaged=0.2,questions=0.1]
+                                [--story PATH] [--story-interactions 10] [--script answers.txt]
+                                [--stream] [--fused] [--model-routing] [--memory] [--seed 0]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+import contextlib
+import io
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import openai
+
+from bench_parse_story import generate_story
+from channels import ScriptedChannel
+from fake_llm import FakeLLMClient
+from interaction_handler import StoryInteractionHandler
+from llm_client import LLMClient
+from tracing import Tracer, _percentile
+
+ENDING_TYPES = ("response_summary_closure", "alternative_ending", "story_retelling")
+
+# Answers of each child persona
+ANSWER_PROFILES = {
+    "disengaged": ["I don't know", "idk", "no", "I forgot", "dunno", "not sure"],
+    "short": ["a box", "yes", "the butterfly", "maybe", "happy", "the garden", "flowers", "both"],
+    "rich": [
+        "I think Sparky opened the box because he was curious and wanted to see what was inside",
+        "The butterfly was scared at first but then it became friends with Sparky in the garden",
+        "Maybe they could plant more flowers so the butterfly has a home, like my grandma does",
+        "I would give the butterfly some water because it looks tired after flying so far away"
+    ],
+    "questions": ["What is a rocket?", "Why did the butterfly fly away?", "Can butterflies talk?",
+                  "Where does Sparky live?"]
+}
+DEFAULT_MIX = {"rich": 0.4, "short": 0.3, "disengaged": 0.2, "questions": 0.1}
+# Share of a child's answers in their persona's style; the rest come from the whole mix
+PERSONA_CONSISTENCY = 0.8
+
+_SAY_WORD = re.compile(r"say '([^']+)'")
+_THEME_OPTION = re.compile(r"^\d\. (.+?)(?: \(|$)")
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parse "rich=0.4,short=0.3,..." into normalized persona weights."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ANSWER_PROFILES:
+            raise ValueError(f"Unknown answer profile '{name}'. Expected one of {sorted(ANSWER_PROFILES)}")
+        mix[name] = float(weight)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("Answer mix weights must add up to more than 0")
+    return {name: weight / total for name, weight in mix.items()}
+
+
+class SyntheticChildChannel(ScriptedChannel):
+    """A scripted channel whose answers come from a persona instead of a fixed list.
+
+    The child repeats the magic word when asked to say one (unless disengaged),
+    names one of the offered themes, and otherwise answers from the persona's
+    profile. Answers from `answers` (a script) are used first. The time between
+    each answer and the next question is recorded in `turn_latencies`, which
+    is how long the child waited for the robot.
+    """
+
+    def __init__(self, persona: str, mix: Dict[str, float], rng: random.Random,
+                 answers: Optional[List[str]] = None, max_answers: int = 500):
+        """
+        Args:
+            persona: The child's answer profile
+            mix: Persona weights used for the answers that are not in the persona's style
+            rng: Random generator of this session
+            answers: Optional scripted answers given before the synthetic ones
+            max_answers: Answers after which EOFError is raised (guards against endless loops)
+        """
+        super().__init__(answers or [], max_default_answers=0)
+        self.persona = persona
+        self.mix = mix
+        self.rng = rng
+        self.max_answers = max_answers
+        self.turn_latencies: List[float] = []
+        self._answered_at: Optional[float] = None
+
+    def _profile_answer(self) -> str:
+        profile = self.persona
+        if self.rng.random() > PERSONA_CONSISTENCY:
+            profile = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        return self.rng.choice(ANSWER_PROFILES[profile])
+
+    def _synthetic_answer(self, prompt: str) -> str:
+        if prompt.startswith("\n"):
+            # Numbered theme choice of the basic pre-story flow
+            return self.rng.choice(["1", "2"])
+        last_line = self.transcript[-1] if self.transcript else ""
+        word = _SAY_WORD.search(last_line)
+        if word and (self.persona != "disengaged" or self.rng.random() < 0.5):
+            return word.group(1)
+        options = [match.group(1) for line in self.transcript[-2:] for match in [_THEME_OPTION.match(line)] if match]
+        if options:
+            return self.rng.choice(options).split()[-1]
+        return self._profile_answer()
+
+    def ask(self, prompt: str) -> str:
+        if self._answered_at is not None:
+            self.turn_latencies.append(time.perf_counter() - self._answered_at)
+        if self.asks >= self.max_answers:
+            raise EOFError("Synthetic child answered too many questions")
+        if self.asks < len(self.answers):
+            answer = self.answers[self.asks]
+        else:
+            answer = self._synthetic_answer(prompt)
+        self.asks += 1
+        self.transcript.append(f"{prompt}{answer}")
+        self._answered_at = time.perf_counter()
+        return answer
+
+
+class StubLLMServer:
+    """Local HTTP server speaking the chat completions API, answered by FakeLLMClient.
+
+    Completions are templated the same way as in offline runs (technique
+    selection JSON, evaluator JSON, a default reply), so sessions take their
+    usual paths. Every request sleeps `latency` (plus up to `jitter`) seconds
+    and fails with HTTP 500 with probability `error_rate`. Streaming requests
+    are answered as server-sent events.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0, seed: Optional[int] = None):
+        """
+        Args:
+            latency: Seconds each request takes
+            jitter: Maximum extra random seconds per request
+            error_rate: Probability that a request fails with HTTP 500
+            host: Address to listen on
+            port: Port to listen on (0 picks a free port)
+            seed: Seed for the jitter and errors
+        """
+        fake = FakeLLMClient(latency=latency, jitter=jitter, error_rate=error_rate, seed=seed,
+                             record_calls=False)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this, delayed ACKs add ~40 ms per call
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                model, messages = request.pop("model"), request.pop("messages")
+                stream = request.pop("stream", False)
+                try:
+                    if not stream:
+                        self._send_json(200, fake.chat_completion(model, messages, **request).model_dump())
+                        return
+                    chunks = list(fake._stream_chunks(model, messages, request))
+                except openai.APIConnectionError:
+                    self._send_json(500, {"error": {"message": "Simulated server error"}})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for chunk in chunks:
+                    self.wfile.write(f"data: {chunk.model_dump_json()}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+
+        self.fake = fake
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stub-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "StubLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+# Per-process state of the worker processes
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(base_url: str, measure_memory: bool) -> None:
+    """Create the worker process's pooled LLM client (shared by the sessions it runs)."""
+    _worker["client"] = LLMClient(api_key="stub", base_url=base_url)
+    _worker["measure_memory"] = measure_memory
+    if measure_memory:
+        tracemalloc.start()
+
+
+def run_session(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one complete session for a synthetic child and return its measurements."""
+    rng = random.Random(task["seed"])
+    random.seed(task["seed"])
+    mix = task["mix"]
+    persona = rng.choices(list(mix), weights=list(mix.values()))[0]
+    channel = SyntheticChildChannel(persona, mix, rng, answers=task.get("answers"))
+    client = _worker["client"]
+    client.tracer = Tracer()
+    measure_memory = _worker["measure_memory"]
+    if measure_memory:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+
+    start = time.perf_counter()
+    error = None
+    handler = None
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            handler = StoryInteractionHandler(task["story_path"], llm_client=client, channel=channel,
+                                              auto_start=False, **task["handler_options"])
+            # Cycle through the ending types so every one of them is exercised
+            handler.chosen_ending_type = task["ending_type"]
+            handler.pre_story_interaction()
+            handler.process_story()
+            handler.executor.shutdown(wait=True)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - start
+
+    spans = client.tracer.spans
+    return {
+        "wall": wall,
+        "persona": persona,
+        "ending_type": task["ending_type"],
+        "calls": len(spans),
+        "call_latencies": [span["latency"] for span in spans],
+        "llm_errors": sum(1 for span in spans if span["error"]),
+        "turns": channel.asks,
+        "turn_latencies": channel.turn_latencies,
+        "memory": tracemalloc.get_traced_memory()[1] - baseline if measure_memory else None,
+        "error": error,
+        "pid": os.getpid()
+    }
+
+
+def run_load(story_path: str, sessions: int, processes: int, base_url: str, mix: Dict[str, float],
+             handler_options: Optional[Dict[str, Any]] = None, answers: Optional[List[str]] = None,
+             measure_memory: bool = False, seed: int = 0) -> Dict[str, Any]:
+    """Run `sessions` sessions on a pool of `processes` processes and aggregate the measurements."""
+    tasks = [{"story_path": story_path, "seed": seed + i, "mix": mix, "answers": answers,
+              "ending_type": ENDING_TYPES[i % len(ENDING_TYPES)], "handler_options": handler_options or {}}
+             for i in range(sessions)]
+    context = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    with context.Pool(processes, initializer=_init_worker, initargs=(base_url, measure_memory)) as pool:
+        results = list(pool.imap_unordered(run_session, tasks))
+    return summarize(results, time.perf_counter() - start, processes)
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float, processes: int) -> Dict[str, Any]:
+    """Aggregate per-session measurements."""
+    turn_latencies = [latency for r in results for latency in r["turn_latencies"]]
+    call_latencies = [latency for r in results for latency in r["call_latencies"]]
+    memory = [r["memory"] for r in results if r["memory"] is not None]
+    counts = lambda key: {value: sum(1 for r in results if r[key] == value)
+                          for value in sorted({r[key] for r in results})}
+    return {
+        "sessions": len(results),
+        "processes": processes,
+        "elapsed": elapsed,
+        "sessions_per_second": len(results) / elapsed if elapsed else 0.0,
+        "calls_per_session": statistics.mean(r["calls"] for r in results) if results else 0.0,
+        "turns_per_session": statistics.mean(r["turns"] for r in results) if results else 0.0,
+        "session_wall": {q: _percentile([r["wall"] for r in results], f) for q, f in (("p50", 0.5), ("p95", 0.95))}
+        if results else {},
+        "turn_latency": {q: _percentile(turn_latencies, f) for q, f in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+        if turn_latencies else {},
+        "call_latency": {q: _percentile(call_latencies, f) for q, f in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+        if call_latencies else {},
+        "memory_per_session": {"mean": statistics.mean(memory), "max": max(memory)} if memory else None,
+        "llm_errors": sum(r["llm_errors"] for r in results),
+        "failed_sessions": [r["error"] for r in results if r["error"]],
+        "ending_types": counts("ending_type"),
+        "personas": counts("persona"),
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    ms = lambda values: " / ".join(f"{name} {value * 1000:.0f} ms" for name, value in values.items())
+    lines = [
+        f"{report['sessions']} sessions in {report['elapsed']:.1f} s on {report['processes']} processes: "
+        f"{report['sessions_per_second']:.1f} sessions/s",
+        f"LLM calls per session: {report['calls_per_session']:.1f} ({report['llm_errors']} failed calls in total)",
+        f"Child turns per session: {report['turns_per_session']:.1f}",
+        f"Session wall time: {ms(report['session_wall'])}",
+        f"Turn latency (child answer to next question): {ms(report['turn_latency'])}",
+        f"LLM call latency: {ms(report['call_latency'])}",
+    ]
+    if report["memory_per_session"]:
+        lines.append(f"Peak memory per session: mean {report['memory_per_session']['mean'] / 1024:.0f} KB, "
+                     f"max {report['memory_per_session']['max'] / 1024:.0f} KB")
+    lines.append("Ending types: " + ", ".join(f"{name} {count}" for name, count in report["ending_types"].items()))
+    lines.append("Child personas: " + ", ".join(f"{name} {count}" for name, count in report["personas"].items()))
+    lines.append(f"Failed sessions: {len(report['failed_sessions'])}")
+    for error in sorted(set(report["failed_sessions"]))[:5]:
+        lines.append(f"  {error}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds each stub LLM request takes")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum extra random seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability that a stub request fails")
+    parser.add_argument("--mix", default=",".join(f"{name}={weight}" for name, weight in DEFAULT_MIX.items()),
+                        help="Child persona weights, e.g. rich=0.4,short=0.3,disengaged=0.2,questions=0.1")
+    parser.add_argument("--story", help="Story file or compiled artifact (defaults to a generated story)")
+    parser.add_argument("--story-interactions", type=int, default=10)
+    parser.add_argument("--script", help="File with answers every child gives first, one per line")
+    parser.add_argument("--stream", action="store_true", help="Stream robot responses")
+    parser.add_argument("--fused", action="store_true", help="Select the technique and respond in one call")
+    parser.add_argument("--model-routing", action="store_true", help="Route calls with the default ModelRouter")
+    parser.add_argument("--memory", action="store_true", help="Measure peak memory per session (slower)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    answers = ScriptedChannel.from_file(args.script).answers if args.script else None
+    handler_options = {"stream_responses": args.stream, "fused_turns": args.fused,
+                       "model_routing": args.model_routing}
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            StubLLMServer(args.latency, args.jitter, args.error_rate, seed=args.seed) as server:
+        story_path = args.story
+        if not story_path:
+            story_path = os.path.join(tmp, "story.txt")
+            with open(story_path, "w") as f:
+                f.write(generate_story(args.story_interactions))
+        print(f"Stub LLM server at {server.base_url}, {args.latency * 1000:.0f} ms per request")
+        report = run_load(os.path.abspath(story_path), args.sessions, args.processes, server.base_url, mix,
+                          handler_options, answers, args.memory, args.seed)
+
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import openai
+
+# Model used for each kind of call when no rule matches
+DEFAULT_MODELS = {
+    "response": "gpt-4",
+    "selection": "gpt-4o-mini",
+    "evaluation": "gpt-4o-mini"
+}
+# Faster model to fall back to when a model is too slow or the session's latency budget is spent
+FASTER_MODELS = {
+    "gpt-4": "gpt-4o-mini"
+}
+# First matching rule wins. A rule matches when every key it sets matches the call:
+# purpose, techniques, support_levels, special_tags (lists), min_depth (int).
+# Pinned rules are never downgraded for latency.
+DEFAULT_RULES = [
+    {"name": "co_participating_strongest", "purpose": "response", "techniques": ["co-participating"],
+     "model": "gpt-4", "pin": True},
+    {"name": "transition_fast", "purpose": "response", "techniques": ["transition"], "model": "gpt-4o-mini"},
+]
+# Rolling latency (seconds) above which a purpose's calls move to the faster model
+DEFAULT_LATENCY_TARGETS = {
+    "response": 4.0
+}
+
+
+class RoutingDecision(NamedTuple):
+    model: str
+    rule: Optional[str]
+    reason: str
+
+
+class ModelRouter:
+    """Choose the model for each LLM call from the turn's technique, support level, depth and special tag.
+
+    Rules map turns to models (e.g. transition turns to a fast model). On top
+    of the rules, the router keeps an exponentially weighted moving average of
+    each model's latency and moves unpinned calls to the faster model when
+    that average exceeds the purpose's latency target, or once the session's
+    latency budget (total seconds spent waiting on the LLM) is used up. While a
+    model is skipped for being slow, every `probe_interval`-th call still goes
+    to it so its average can recover.
+
+    One router belongs to one session.
+    """
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None, default_models: Optional[Dict[str, str]] = None,
+                 faster_models: Optional[Dict[str, str]] = None,
+                 latency_targets: Optional[Dict[str, float]] = None, session_budget: Optional[float] = None,
+                 smoothing: float = 0.3, probe_interval: int = 5):
+        """
+        Args:
+            rules: Routing rules (defaults to DEFAULT_RULES)
+            default_models: Overrides of DEFAULT_MODELS
+            faster_models: Overrides of FASTER_MODELS
+            latency_targets: Overrides of DEFAULT_LATENCY_TARGETS
+            session_budget: Optional seconds of LLM latency the session may spend before calls are downgraded
+            smoothing: Weight of the newest measurement in the rolling latency average
+            probe_interval: Every this many calls downgraded for latency, one goes to the slow model
+        """
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self.default_models = {**DEFAULT_MODELS, **(default_models or {})}
+        self.faster_models = {**FASTER_MODELS, **(faster_models or {})}
+        self.latency_targets = {**DEFAULT_LATENCY_TARGETS, **(latency_targets or {})}
+        self.session_budget = session_budget
+        self.smoothing = smoothing
+        self.probe_interval = probe_interval
+        self._skipped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.rolling_latency: Dict[str, float] = {}
+        self.spent = 0.0
+        self.decisions: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def _matches(rule: Dict[str, Any], purpose: str, technique: Optional[str], support_level: Optional[str],
+                 depth: Optional[int], special_tag: Optional[str]) -> bool:
+        if rule.get("purpose", "response") != purpose:
+            return False
+        if "techniques" in rule and technique not in rule["techniques"]:
+            return False
+        if "support_levels" in rule and support_level not in rule["support_levels"]:
+            return False
+        if "special_tags" in rule and special_tag not in rule["special_tags"]:
+            return False
+        if "min_depth" in rule and (depth is None or depth < rule["min_depth"]):
+            return False
+        return True
+
+    def route(self, purpose: str = "response", technique: Optional[str] = None, support_level: Optional[str] = None,
+              depth: Optional[int] = None, special_tag: Optional[str] = None) -> RoutingDecision:
+        """Choose the model for one call.
+
+        Args:
+            purpose: "response", "selection" or "evaluation"
+            technique: Name of the selected technique (or evaluated ending type)
+            support_level: "high", "medium" or "low"
+            depth: Depth of the turn within its interaction
+            special_tag: The interaction's special tag (e.g. "summary")
+
+        Returns:
+            RoutingDecision with the model, the matching rule's name and the reason
+        """
+        if purpose not in self.default_models:
+            raise ValueError(f"Unknown routing purpose '{purpose}'. Expected one of {sorted(self.default_models)}")
+        rule = next((rule for rule in self.rules
+                     if self._matches(rule, purpose, technique, support_level, depth, special_tag)), None)
+        if rule is not None:
+            model, rule_name, reason = rule["model"], rule.get("name"), f"rule {rule.get('name', 'unnamed')}"
+        else:
+            model, rule_name, reason = self.default_models[purpose], None, f"default {purpose} model"
+
+        faster = self.faster_models.get(model)
+        if faster and not (rule and rule.get("pin")):
+            with self._lock:
+                rolling = self.rolling_latency.get(model)
+                spent = self.spent
+            target = self.latency_targets.get(purpose)
+            if self.session_budget is not None and spent >= self.session_budget:
+                model, reason = faster, f"session latency budget spent ({spent:.1f}/{self.session_budget:.1f} s)"
+            elif target is not None and rolling is not None and rolling > target:
+                with self._lock:
+                    skipped = self._skipped.get(model, 0) + 1
+                    self._skipped[model] = 0 if skipped >= self.probe_interval else skipped
+                if skipped >= self.probe_interval:
+                    reason = f"probing {model} latency (rolling {rolling:.1f} s > {target:.1f} s)"
+                else:
+                    model, reason = faster, f"{model} rolling latency {rolling:.1f} s > {target:.1f} s"
+
+        with self._lock:
+            self.decisions.append({"purpose": purpose, "technique": technique, "depth": depth,
+                                   "model": model, "rule": rule_name, "reason": reason})
+        return RoutingDecision(model, rule_name, reason)
+
+    def record_latency(self, model: str, seconds: float) -> None:
+        """Feed one call's latency into the model's rolling average and the session budget."""
+        with self._lock:
+            previous = self.rolling_latency.get(model)
+            self.rolling_latency[model] = seconds if previous is None else (
+                self.smoothing * seconds + (1 - self.smoothing) * previous)
+            self.spent += seconds
+
+    def record_failure(self, model: str, seconds: float, error: BaseException) -> None:
+        """Count a failed call's time like a latency if it failed by being slow (a timeout or the deadline)."""
+        # DeadlineExceededError is a TimeoutError
+        if isinstance(error, (TimeoutError, openai.APITimeoutError)):
+            self.record_latency(model, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return calls per model, the rolling latencies and the budget spent."""
+        with self._lock:
+            per_model: Dict[str, int] = {}
+            for decision in self.decisions:
+                per_model[decision["model"]] = per_model.get(decision["model"], 0) + 1
+            return {"calls_per_model": per_model, "rolling_latency": dict(self.rolling_latency),
+                    "spent": self.spent, "session_budget": self.session_budget}
+
+    def format_stats(self) -> str:
+        """One-line summary of the routing decisions."""
+        stats = self.stats()
+        models = ", ".join(f"{model} {count}" for model, count in sorted(stats["calls_per_model"].items()))
+        budget = f"/{stats['session_budget']:.1f}" if stats["session_budget"] is not None else ""
+        return f"Model routing: {models or 'no calls'}; LLM latency spent {stats['spent']:.1f}{budget} s"
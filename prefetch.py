@@ -0,0 +1,63 @@
+import contextvars
+import threading
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict
+
+
+class SpeculativePrefetcher:
+    """Start LLM calls in the background as soon as their inputs are known.
+
+    Each prefetch is submitted under a key and grouped by name (e.g.
+    "theme_ack"). When the line is needed, take() waits for the result; lines
+    that turn out not to be needed (e.g. the acknowledgement for the theme the
+    child did not pick) are discarded. Per-name counters record how many
+    prefetches were used and how many were wasted.
+    """
+
+    def __init__(self, executor: Executor):
+        """
+        Args:
+            executor: Executor the prefetch calls run on
+        """
+        self.executor = executor
+        self._futures: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[str, int]] = {}
+
+    def submit(self, name: str, key: str, fn: Callable[..., Any], *args, **kwargs) -> None:
+        """Start fn(*args, **kwargs) in the background under key, in a copy of the current context."""
+        future = self.executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        with self._lock:
+            self._futures[key] = (name, future)
+            self.counters.setdefault(name, {"used": 0, "wasted": 0})
+
+    def take(self, key: str) -> Any:
+        """Wait for and return the result of the prefetch stored under key."""
+        with self._lock:
+            name, future = self._futures.pop(key)
+            self.counters[name]["used"] += 1
+        return future.result()
+
+    def discard(self, key: str) -> None:
+        """Drop a prefetch that is no longer needed (cancelled if it has not started yet)."""
+        with self._lock:
+            entry = self._futures.pop(key, None)
+            if entry is None:
+                return
+            name, future = entry
+            self.counters[name]["wasted"] += 1
+        future.cancel()
+
+    def discard_all(self) -> None:
+        """Drop every pending prefetch, e.g. when the interaction is aborted."""
+        with self._lock:
+            keys = list(self._futures)
+        for key in keys:
+            self.discard(key)
+
+    def format_stats(self) -> str:
+        """One-line summary of used and wasted prefetches per name."""
+        with self._lock:
+            parts = [f"{name} {counts['used']} used/{counts['wasted']} wasted"
+                     for name, counts in self.counters.items()]
+        return "Prefetch: " + (", ".join(parts) if parts else "none")
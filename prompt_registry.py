@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+# Techniques whose response prompt is prompts/response_<technique>.txt plus the common guidelines
+RESPONSE_TECHNIQUES = (
+    "co-participating",
+    "reducing_choices",
+    "eliciting",
+    "generalizing",
+    "reasoning",
+    "predicting",
+    "story_retelling",
+    "alternative_ending"
+)
+# Guideline files used by ResponseGenerator
+RESPONSE_GUIDELINES = (
+    "response_common_guidelines.txt",
+    "response_transition.txt",
+    "response_summary_closure.txt",
+    "response_default.txt"
+)
+
+# Ending techniques that are not part of scaffolding_techniques.json
+ENDING_TECHNIQUES = {
+    "story_retelling": {
+        "full_definition": "Assesses the child's comprehension and memory of the story through retelling",
+        "support_level": "low",
+        "examples": [
+            "Can you tell me what happened in the story?",
+            "What do you remember about Sparky's adventure?",
+            "Tell me about what happened with Sparky and the butterfly"
+        ]
+    },
+    "alternative_ending": {
+        "full_definition": "Encourages creative thinking by asking for a different story ending",
+        "support_level": "low",
+        "examples": [
+            "How else could the story have ended?",
+            "What if Sparky and the butterfly had done something different?",
+            "Can you think of another way the story could have ended?"
+        ]
+    },
+    "response_summary_closure": {
+        "full_definition": "Helps children reflect on and summarize their understanding of the story through story-specific questions.",
+        "support_level": "low",
+        "examples": [
+            "What was the most exciting part of the story for you?",
+            "How did the characters solve their problem in the story?",
+            "What would you have done if you were in the story?",
+            "What lesson did we learn from the story?",
+            "How did the story make you feel and why?",
+            "What was the biggest challenge in the story?",
+            "How did the characters help each other?",
+            "What would you tell a friend about this story?"
+        ]
+    }
+}
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively turn dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class PromptSet:
+    """Immutable snapshot of every prompt file, loaded and pre-concatenated once.
+
+    Attributes:
+        texts: File name (e.g. "retelling_user_prompt.txt") -> content, for every .txt file
+        technique_prompts: Response technique -> technique prompt followed by the common guidelines
+        scaffolding_techniques: scaffolding_techniques.json plus ENDING_TECHNIQUES, read-only
+        version: Incremented on every reload
+    """
+
+    __slots__ = ("prompt_dir", "texts", "technique_prompts", "scaffolding_techniques", "version", "mtime")
+
+    def __init__(self, prompt_dir: str, version: int = 1):
+        """
+        Args:
+            prompt_dir: Directory holding the prompt files
+
+        Raises:
+            FileNotFoundError: If scaffolding_techniques.json is missing
+            json.JSONDecodeError: If scaffolding_techniques.json is invalid
+        """
+        self.prompt_dir = prompt_dir
+        self.version = version
+        self.mtime = _directory_mtime(prompt_dir)
+
+        texts = {}
+        if os.path.isdir(prompt_dir):
+            for name in sorted(os.listdir(prompt_dir)):
+                if name.endswith(".txt"):
+                    with open(os.path.join(prompt_dir, name), "r") as f:
+                        texts[name] = f.read()
+        self.texts: Mapping[str, str] = MappingProxyType(texts)
+
+        for name in RESPONSE_GUIDELINES + tuple(f"response_{technique}.txt" for technique in RESPONSE_TECHNIQUES):
+            if name not in texts:
+                print(f"Warning: Could not find {os.path.join(prompt_dir, name)}. Using default empty string.")
+
+        common_guidelines = self.text_or_empty("response_common_guidelines.txt")
+        self.technique_prompts: Mapping[str, str] = MappingProxyType({
+            technique: f"{self.text_or_empty(f'response_{technique}.txt')}\n\n{common_guidelines}"
+            for technique in RESPONSE_TECHNIQUES
+        })
+
+        with open(os.path.join(prompt_dir, "scaffolding_techniques.json"), "r") as f:
+            techniques = json.load(f)
+        techniques.update(ENDING_TECHNIQUES)
+        self.scaffolding_techniques: Mapping[str, Mapping[str, Any]] = _freeze(techniques)
+
+    def text(self, name: str) -> Optional[str]:
+        """Return the content of a prompt file, or None if it does not exist."""
+        return self.texts.get(name)
+
+    def text_or_empty(self, name: str) -> str:
+        """Return the content of a prompt file, or "" if it does not exist."""
+        return self.texts.get(name, "")
+
+
+def _directory_mtime(prompt_dir: str) -> float:
+    """Latest modification time of the prompt directory and the files in it."""
+    try:
+        with os.scandir(prompt_dir) as entries:
+            return max([os.stat(prompt_dir).st_mtime] + [entry.stat().st_mtime for entry in entries])
+    except FileNotFoundError:
+        return 0.0
+
+
+class PromptRegistry:
+    """Process-wide holder of the current PromptSet.
+
+    The prompts are read once; every ScaffoldingSelector and ResponseGenerator
+    shares the same snapshot. With hot_reload enabled, current() checks the
+    directory's modification times at most every `check_interval` seconds and
+    swaps in a new snapshot when a file changed, so prompts can be edited
+    without restarting running workers. A reload that fails (e.g. a file saved
+    half-way) keeps the previous snapshot.
+    """
+
+    def __init__(self, prompt_dir: str = "prompts", hot_reload: bool = False, check_interval: float = 2.0):
+        """
+        Args:
+            prompt_dir: Directory holding the prompt files
+            hot_reload: Whether to reload prompts when the files change
+            check_interval: Minimum seconds between modification time checks
+        """
+        self.prompt_dir = prompt_dir
+        self.hot_reload = hot_reload
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = PromptSet(prompt_dir)
+        self._last_check = time.monotonic()
+
+    def current(self) -> PromptSet:
+        """Return the current prompt snapshot, reloading it first if hot reload is on and files changed."""
+        if self.hot_reload and time.monotonic() - self._last_check >= self.check_interval:
+            self._maybe_reload()
+        return self._snapshot
+
+    def _maybe_reload(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            if _directory_mtime(self.prompt_dir) <= self._snapshot.mtime:
+                return
+            try:
+                self._snapshot = PromptSet(self.prompt_dir, version=self._snapshot.version + 1)
+                print(f"DEBUG - Reloaded prompts from {self.prompt_dir} (version {self._snapshot.version})")
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not reload prompts from {self.prompt_dir}: {e}. Keeping the previous prompts.")
+
+
+_registries: Dict[str, PromptRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_prompt_registry(prompt_dir: str = "prompts", hot_reload: Optional[bool] = None) -> PromptRegistry:
+    """Return the process-wide registry for prompt_dir, creating it on first use.
+
+    Args:
+        prompt_dir: Directory holding the prompt files
+        hot_reload: If given, turns hot reload on or off for the shared registry
+
+    Raises:
+        FileNotFoundError: If scaffolding_techniques.json is missing
+        json.JSONDecodeError: If scaffolding_techniques.json is invalid
+    """
+    key = os.path.abspath(prompt_dir)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = PromptRegistry(prompt_dir)
+            _registries[key] = registry
+    if hot_reload is not None:
+        registry.hot_reload = hot_reload
+    return registry
@@ -0,0 +1,62 @@
+import re
+from typing import Optional, Tuple
+
+# Phrases that invite the child to answer even without a question mark
+QUESTION_CUES = [
+    "tell me", "can you", "would you", "could you", "do you",
+    "imagine", "describe", "explain", "share",
+    "think about", "remember", "recall",
+    "what if", "how about", "let's talk about"
+]
+# Question words that only count at the very start of the text
+QUESTION_STARTS = ["how", "what", "why", "who", "when", "where"]
+
+# All cues in one alternation, compiled once at import and searched in one pass
+_CUE_PATTERN = re.compile(
+    r"^(?:{starts})\b|\b(?:{cues})\b".format(
+        starts="|".join(QUESTION_STARTS),
+        cues="|".join(re.escape(cue) for cue in QUESTION_CUES)
+    )
+)
+_ALNUM = re.compile(r"[A-Za-z0-9]")
+
+
+def _trailing_question(text: str) -> Optional[str]:
+    """Return the final question of text (from its first letter or digit to the
+    closing '?'), or None if text does not end with one."""
+    if not text.endswith("?"):
+        return None
+    # The question starts after the last sentence end before the closing '?'
+    start = max(text.rfind(".", 0, -1), text.rfind("!", 0, -1), text.rfind("?", 0, -1)) + 1
+    match = _ALNUM.search(text, start, len(text) - 1)
+    if not match:
+        return None
+    return text[match.start():]
+
+
+def detect_question(text: Optional[str]) -> Tuple[bool, Optional[str], Optional[str]]:
+    """Check if text contains a question, either a trailing '?' or a question-like phrase.
+
+    Args:
+        text: The text to check
+
+    Returns:
+        Tuple of (is_question, pre_question, post_question). For a trailing
+        question, pre_question runs up to the end of the first occurrence of the
+        question text and post_question is the rest; for a question-like phrase,
+        pre_question is the whole text and post_question is "".
+    """
+    if not text or not text.strip():
+        return False, None, None
+
+    clean_text = text.strip()
+
+    question_text = _trailing_question(clean_text)
+    if question_text:
+        end = clean_text.find(question_text) + len(question_text)
+        return True, clean_text[:end], clean_text[end:]
+
+    if _CUE_PATTERN.search(clean_text.lower()):
+        return True, clean_text, ""
+
+    return False, None, None
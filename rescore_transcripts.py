@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Re-score the child's story answers in saved session logs with the current prompts.
+
+Reads text logs written by save_interaction_log (or streamed during a session)
+and JSONL session logs, rebuilds each answer's story context and conversation,
+and scores every answer again: answers to ending questions with the evaluator
+of the session's ending type, all other answers with technique selection.
+Identical (evaluator, context, answer) inputs are scored once. Scores are
+checkpointed as they arrive, so an interrupted run resumes where it stopped,
+and the results are written as Parquet (with pyarrow installed) or CSV. With
+--calibrate, the story-aware local scorer is fitted to the LLM's scores of the
+retellings and alternative endings and the calibration is saved for sessions.
+
+Usage: python rescore_transcripts.py LOG_OR_DIR [...] [--out rescored.parquet] [--checkpoint PATH]
+                                     [--concurrency 8] [--api-key KEY] [--fake] [--dry-run]
+                                     [--calibrate calibration.json]
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from conversation_state import ConversationState
+from prompt_registry import PromptSet
+from scaffolding_selector import ScaffoldingSelector
+from session_log import SessionLogWriter, _read_text, load_entries
+from story_scorer import SCORED_ENDINGS, StoryKeywords, StoryScorer, fit_calibration, save_calibration
+from story_sections import parse_story_sections
+
+ENDING_TYPES = ("response_summary_closure", "alternative_ending", "story_retelling")
+LOG_PATTERNS = ("*_interaction_log.txt", "*.jsonl", "*.jsonl.gz")
+CHECKPOINT_SUFFIX = ".checkpoint.jsonl"
+
+# Lines that end a story block in the text log
+_LOG_LINE = re.compile(r"^(Ella:|Robot:|Child(?: \(Follow-up \d+\))?:|\[Scaffolding Strategy:|\[Routing\])")
+_CHILD = re.compile(r"^Child(?: \(Follow-up \d+\))?: ?(.*)$", re.DOTALL)
+_STRATEGY = re.compile(
+    r"^\[Scaffolding Strategy: (\S+) \((\w+) support\) - Complexity Score: ([\d.]+)/10\]"
+    r"(?: \[Target Vocabulary: (.+?)(?: \((\w+)\))?\])?(?: \[Special Tag: (\w+)\])?"
+)
+_BARE_TAG = re.compile(r"<interaction>([^<]*)</interaction>\s*$")
+
+OUTPUT_COLUMNS = ("source", "session_id", "interaction", "depth", "evaluator", "child_input", "question",
+                  "vocab", "vocab_role", "original_technique", "original_support_level", "original_score",
+                  "technique", "support_level", "score", "rationale", "method", "error", "key")
+
+
+def read_log(path: str) -> Tuple[List[str], Optional[str]]:
+    """The lines of a session log as save_interaction_log writes them, and the session id if logged.
+
+    JSONL logs (gzipped or not) are converted to the text log's lines.
+    """
+    if path.endswith((".jsonl", ".jsonl.gz")):
+        entries = load_entries(path)
+        lines = [entry.get("line", "").strip() for entry in entries]
+        session_id = entries[0].get("session_id") if entries else None
+        return "\n".join(line for line in lines if line).split("\n"), session_id
+    return _read_text(path).split("\n"), None
+
+
+def parse_transcript(lines: List[str], source: str, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Extract the child's story answers from a session log.
+
+    The story is rebuilt from the logged story sections, with each
+    interaction tag's vocab, role and special tag restored from the strategy
+    lines, so the contexts match the ones the session used. Each answer's
+    prompt is the interaction question plus the conversation before it, as
+    in StoryInteractionHandler.handle_interaction.
+
+    Args:
+        lines: Lines of the log
+        source: Name of the log, recorded with each answer
+        session_id: Optional session id recorded with each answer
+
+    Returns:
+        One dict per answer (answers before the story are skipped)
+    """
+    blocks: List[str] = []
+    tags: List[Dict[str, Optional[str]]] = []
+    answers: List[Dict[str, Any]] = []
+    conversation = None
+    depth = 0
+    pending = None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.strip() == "Robot:":
+            # A story section: every line up to its interaction tag or the next log line
+            block = []
+            i += 1
+            while i < len(lines) and not _LOG_LINE.match(lines[i]):
+                block.append(lines[i])
+                i += 1
+                if _BARE_TAG.search(block[-1]):
+                    break
+            conversation = None
+            pending = None
+            if not "".join(block).strip():
+                # Trailing whitespace of the story (the log strips it)
+                continue
+            blocks.append("\n".join(block))
+            tags.append({})
+            match = _BARE_TAG.search(blocks[-1])
+            conversation = ConversationState(match.group(1).strip()) if match else None
+            depth = 0
+            continue
+        i += 1
+        child = _CHILD.match(line)
+        strategy = _STRATEGY.match(line)
+        if child and conversation is not None:
+            child_input = child.group(1) if child.group(1).strip() else "I don't know"
+            depth += 1
+            pending = {
+                "source": source, "session_id": session_id, "interaction": len(blocks) - 1, "depth": depth,
+                "child_input": child_input, "prompt": conversation.render_prompt(),
+                "original_technique": None, "original_support_level": None, "original_score": None
+            }
+            conversation.add_child(child_input)
+            answers.append(pending)
+        elif strategy and pending is not None:
+            technique, support_level, score, vocab, vocab_role, special_tag = strategy.groups()
+            pending.update(original_technique=technique, original_support_level=support_level,
+                           original_score=float(score))
+            tags[-1] = {"vocab": special_tag or vocab, "role": vocab_role}
+            pending = None
+        elif line.startswith("Robot: ") and conversation is not None:
+            conversation.add_robot(line[len("Robot: "):])
+
+    story = "".join(_restore_tag(block, tag) for block, tag in zip(blocks, tags))
+    sections = parse_story_sections(story)
+    if len(sections) != len(blocks):
+        print(f"Warning: Could not rebuild the story of {source}; skipping its {len(answers)} answers.")
+        return []
+    for answer in answers:
+        section = sections[answer["interaction"]]
+        answer.update(question=section.prompt, vocab=section.vocab, vocab_role=section.vocab_role,
+                      special_tag=section.special_tag, context_before=section.context_before,
+                      context_after=section.context_after)
+        if section.special_tag == "summary":
+            answer["evaluator"] = answer["original_technique"] if answer["original_technique"] in ENDING_TYPES else None
+        else:
+            answer["evaluator"] = "selection"
+    return [answer for answer in answers if answer["evaluator"]]
+
+
+def _restore_tag(block: str, tag: Dict[str, Optional[str]]) -> str:
+    """Put the vocab and role attributes back into a logged section's bare interaction tag."""
+    if not tag.get("vocab"):
+        return block
+    attributes = f' vocab="{tag["vocab"]}"' + (f' role="{tag["role"]}"' if tag.get("role") else "")
+    return _BARE_TAG.sub(lambda m: f"<interaction{attributes}>{m.group(1)}</interaction>", block)
+
+
+def find_logs(paths: Iterable[str]) -> List[str]:
+    """Expand directories into the session logs they contain."""
+    logs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in LOG_PATTERNS:
+                logs.extend(sorted(log for log in glob.glob(os.path.join(path, "**", pattern), recursive=True)
+                                   if not log.endswith(CHECKPOINT_SUFFIX)))
+        else:
+            logs.append(path)
+    return logs
+
+
+def load_answers(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """Parse every log under `paths` and return all their story answers."""
+    answers = []
+    for path in find_logs(paths):
+        lines, session_id = read_log(path)
+        answers.extend(parse_transcript(lines, os.path.basename(path), session_id))
+    return answers
+
+
+def rubric_fingerprint(prompt_set: PromptSet) -> str:
+    """Hash of the prompt files and techniques, so scores from other prompts are never reused."""
+    digest = hashlib.sha256()
+    for name, text in sorted(prompt_set.texts.items()):
+        digest.update(f"{name}\0{text}\0".encode("utf-8"))
+    digest.update(json.dumps(prompt_set.scaffolding_techniques, default=dict, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def answer_key(answer: Dict[str, Any], fingerprint: str) -> str:
+    """Deduplication and checkpoint key: the evaluator's inputs and the rubric."""
+    if answer["evaluator"] == "selection":
+        inputs = [answer["child_input"], answer["prompt"], answer["context_before"], answer["context_after"],
+                  answer["vocab"], answer["vocab_role"]]
+    elif answer["evaluator"] == "response_summary_closure":
+        inputs = [answer["child_input"], answer["context_before"]]
+    else:
+        inputs = [answer["child_input"], answer["context_before"] + answer["context_after"]]
+    payload = json.dumps([fingerprint, answer["evaluator"]] + inputs, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def score_answer(selector: ScaffoldingSelector, answer: Dict[str, Any]) -> Dict[str, Any]:
+    """Score one answer with its evaluator.
+
+    Raises:
+        RuntimeError: If the evaluator fell back to its default score (the call failed)
+    """
+    evaluator = answer["evaluator"]
+    if evaluator == "selection":
+        args = (answer["child_input"], answer["prompt"], answer["context_before"], answer["context_after"],
+                answer["vocab"], answer["vocab_role"])
+        # Disengaged answers are scored locally by the selector too; depth 1 of 2 avoids the transition
+        result = selector.select_technique_without_llm(*args, max_depth=2, depth=1)
+        method = "local"
+        if result is None:
+            result = selector._select_technique_llm(*args, update_history=False)
+            method = "llm"
+        return {"technique": result["name"], "support_level": result["support_level"],
+                "score": float(result["complexity_score"]), "rationale": None, "method": method}
+
+    if evaluator == "story_retelling":
+        result = selector._evaluate_retelling_complexity_llm(
+            answer["child_input"], answer["context_before"] + answer["context_after"])
+    elif evaluator == "alternative_ending":
+        result = selector._evaluate_alt_ending_complexity_llm(
+            answer["child_input"], answer["context_before"] + answer["context_after"])
+    else:
+        result = selector._evaluate_summary_closure_complexity(answer["child_input"], answer["context_before"])
+    rationale = result.get("rationale")
+    if rationale == ["fallback"] * 5 or str(rationale).startswith("Error in evaluation"):
+        raise RuntimeError(f"{evaluator} evaluation failed")
+    return {"technique": evaluator, "support_level": result["support_level"], "score": float(result["score"]),
+            "rationale": rationale if isinstance(rationale, str) else json.dumps(rationale), "method": "llm"}
+
+
+def load_checkpoint(path: str) -> Dict[str, Dict[str, Any]]:
+    """Scores saved by earlier runs, by key (an entry cut off by an interruption is ignored)."""
+    if not os.path.exists(path):
+        return {}
+    return {entry["key"]: entry["result"] for entry in load_entries(path)}
+
+
+def rescore(answers: List[Dict[str, Any]], selector: ScaffoldingSelector, checkpoint_path: str,
+            concurrency: int = 8) -> Dict[str, Any]:
+    """Score the distinct inputs among `answers` and fill in each answer's scores.
+
+    Args:
+        answers: Answers from parse_transcript; updated in place with the new scores
+        selector: Selector whose client and prompts do the scoring
+        checkpoint_path: JSONL file the scores are appended to as they arrive
+        concurrency: Maximum number of evaluations in flight
+
+    Returns:
+        Counts of answers, distinct inputs, scores reused from the checkpoint, new scores and failures
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    fingerprint = rubric_fingerprint(selector.prompts.current())
+    unique = {}
+    for answer in answers:
+        answer["key"] = answer_key(answer, fingerprint)
+        unique.setdefault(answer["key"], answer)
+    results = load_checkpoint(checkpoint_path)
+    reused = sum(1 for key in unique if key in results)
+    todo = [answer for key, answer in unique.items() if key not in results]
+    errors: Dict[str, str] = {}
+
+    with SessionLogWriter(checkpoint_path, format="jsonl", append=True, fsync_interval=1.0) as checkpoint, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(score_answer, selector, answer): answer["key"] for answer in todo}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                errors[key] = f"{type(e).__name__}: {e}"
+                continue
+            checkpoint.write({"key": key, "result": results[key]})
+
+    for answer in answers:
+        answer.update(results.get(answer["key"], {"technique": None, "support_level": None, "score": None,
+                                                  "rationale": None, "method": None}))
+        answer["error"] = errors.get(answer["key"])
+    return {"answers": len(answers), "distinct": len(unique), "reused": reused,
+            "scored": len(todo) - len(errors), "failed": len(errors)}
+
+
+def calibrate_local_scorer(answers: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Fit the local ending scorer to the LLM scores of the rescored retellings and alternative endings."""
+    pairs = []
+    for answer in answers:
+        if answer["evaluator"] in SCORED_ENDINGS and answer.get("score") is not None:
+            # The ending question's context is the whole story
+            keywords = StoryKeywords.for_story(answer["context_before"] + answer["context_after"])
+            local = StoryScorer(keywords).score(answer["evaluator"], answer["child_input"])
+            pairs.append((answer["evaluator"], local["raw_score"], answer["score"]))
+    return fit_calibration(pairs)
+
+
+def write_results(answers: List[Dict[str, Any]], path: str) -> str:
+    """Write one row per answer as Parquet (for .parquet paths, if pyarrow is installed) or CSV.
+
+    Returns:
+        Path of the written file
+    """
+    rows = [{column: answer.get(column) for column in OUTPUT_COLUMNS} for answer in answers]
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            table = pyarrow.Table.from_pylist(rows) if rows else pyarrow.table({c: [] for c in OUTPUT_COLUMNS})
+            pyarrow.parquet.write_table(table, path)
+            return path
+        except ImportError:
+            path = path[:-len(".parquet")] + ".csv"
+            print(f"Warning: pyarrow is not installed. Writing {path} instead.")
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("logs", nargs="+", help="Session logs, or directories to search for them")
+    parser.add_argument("--out", default="rescored.parquet", help="Output file (.parquet or .csv)")
+    parser.add_argument("--checkpoint", help="Checkpoint file (defaults to <out>.checkpoint.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum evaluations in flight")
+    parser.add_argument("--api-key", help="OpenAI API key (defaults to OPENAI_API_KEY)")
+    parser.add_argument("--fake", action="store_true", help="Score with FakeLLMClient (no network)")
+    parser.add_argument("--dry-run", action="store_true", help="Only parse the logs and count the answers")
+    parser.add_argument("--calibrate", metavar="PATH",
+                        help="Fit the local ending scorer to the LLM scores and save the calibration here")
+    args = parser.parse_args()
+
+    answers = load_answers(args.logs)
+    by_evaluator = {}
+    for answer in answers:
+        by_evaluator[answer["evaluator"]] = by_evaluator.get(answer["evaluator"], 0) + 1
+    print(f"{len(answers)} answers: " + ", ".join(f"{name} {count}" for name, count in sorted(by_evaluator.items())))
+    if args.dry_run:
+        return
+
+    llm_client = None
+    if args.fake:
+        from fake_llm import FakeLLMClient
+        llm_client = FakeLLMClient()
+    selector = ScaffoldingSelector(api_key=args.api_key, llm_client=llm_client)
+    checkpoint_path = args.checkpoint or os.path.splitext(args.out)[0] + CHECKPOINT_SUFFIX
+    start = time.perf_counter()
+    counts = rescore(answers, selector, checkpoint_path, args.concurrency)
+    print(f"{counts['distinct']} distinct inputs: {counts['reused']} from the checkpoint, "
+          f"{counts['scored']} scored, {counts['failed']} failed ({time.perf_counter() - start:.1f} s)")
+    print(f"Results written to {write_results(answers, args.out)}")
+    if args.calibrate:
+        calibration = calibrate_local_scorer(answers)
+        save_calibration(calibration, args.calibrate)
+        for ending_type, fit in sorted(calibration.items()):
+            print(f"{ending_type}: score = {fit['slope']:.2f} * local + {fit['intercept']:.2f} over {fit['samples']} "
+                  f"answers, mean difference {fit['mean_abs_error']:.1f}, "
+                  f"support level agreement {fit['support_agreement']:.0%}")
+        print(f"Local scorer calibration written to {args.calibrate}")
+    if counts["failed"]:
+        print("Run again to retry the failed inputs.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+import openai
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit breaker is open."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a call's deadline passes before any attempt could be made."""
+
+
+class CircuitBreaker:
+    """Stop calling the provider after repeated failures.
+
+    After `failure_threshold` consecutive retryable failures the breaker opens
+    and every call fails fast with CircuitOpenError, so callers switch to their
+    local fallbacks at once instead of waiting out retries. After
+    `reset_timeout` seconds one probe call is let through (half-open); its
+    success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            reset_timeout: Seconds the breaker stays open before a probe call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        """"closed", "open" or "half_open"."""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow_request(self) -> bool:
+        """Return whether a call may go to the provider now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                print("DEBUG: Circuit breaker closed, the LLM provider is answering again")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                if self._opened_at is None:
+                    self.times_opened += 1
+                    print(f"Warning: Circuit breaker opened after {self._failures} failed LLM calls; "
+                          f"using local fallbacks for {self.reset_timeout:.0f} s")
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class ResiliencePolicy:
+    """Deadlines, retries with jittered exponential backoff, hedging and a circuit breaker for LLM calls.
+
+    Every call gets `deadline` seconds in total. Each attempt's timeout is the
+    time left before the deadline (capped by `attempt_timeout`). Retryable
+    failures (timeouts, connection errors, 408/409/429 and 5xx responses) are
+    retried up to `max_attempts` times, sleeping a random time between 0 and
+    min(backoff_max, backoff_base * 2**retry) seconds, or as long as the
+    provider's Retry-After header asks. With `hedge_after` set, a hedgeable call
+    that has not answered after that many seconds sends a second identical
+    request and returns whichever finishes first. The timer starts when the
+    request starts running, and the pool that runs hedged requests has
+    `hedge_workers` threads (LLMClient sizes it from its connection limit), so
+    requests queued behind others are not hedged for the time they spent waiting.
+
+    One policy is shared by all call sites of an LLMClient, so the circuit
+    breaker sees every failure.
+    """
+
+    RETRYABLE_STATUS_CODES = (408, 409, 429)
+
+    def __init__(self, deadline: float = 20.0, attempt_timeout: Optional[float] = None, max_attempts: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 4.0, hedge_after: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None, seed: Optional[int] = None,
+                 hedge_workers: Optional[int] = None):
+        """
+        Args:
+            deadline: Seconds a call may take in total, including retries and backoff
+            attempt_timeout: Optional cap on a single attempt's timeout
+            max_attempts: Maximum number of attempts per call
+            backoff_base: Backoff ceiling in seconds before the first retry (doubled for each further retry)
+            backoff_max: Maximum backoff ceiling in seconds
+            hedge_after: Seconds after which a slow hedgeable call sends a second request (None disables hedging)
+            breaker: Circuit breaker (defaults to CircuitBreaker())
+            seed: Seed for the backoff jitter
+            hedge_workers: Threads running hedgeable requests and their backups (defaults to 32)
+        """
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.hedge_workers = hedge_workers
+        self.breaker = breaker or CircuitBreaker()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        # Attempts made by the last call on each thread, read by LLMClient for its trace spans
+        self._local = threading.local()
+        self.counters = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+                         "failures": 0, "deadline_exceeded": 0, "short_circuited": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    @classmethod
+    def is_retryable(cls, error: BaseException) -> bool:
+        """Timeouts, connection errors, throttling and server errors are worth retrying."""
+        if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, TimeoutError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in cls.RETRYABLE_STATUS_CODES or error.status_code >= 500
+        return False
+
+    @staticmethod
+    def _retry_after(error: BaseException) -> Optional[float]:
+        """Seconds the provider asked us to wait, if it did."""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+        try:
+            if "retry-after-ms" in headers:
+                return float(headers["retry-after-ms"]) / 1000
+            if "retry-after" in headers:
+                return float(headers["retry-after"])
+        except ValueError:
+            return None
+        return None
+
+    def backoff(self, retry: int) -> float:
+        """Jittered delay before retry number `retry` (0 for the first retry)."""
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** retry)
+        with self._lock:
+            return self._random.uniform(0, ceiling)
+
+    def last_call(self) -> Dict[str, Any]:
+        """Attempts and hedging of the last call made on the current thread."""
+        return {"attempts": getattr(self._local, "attempts", 0), "hedged": getattr(self._local, "hedged", False)}
+
+    def call(self, fn: Callable[[float], Any], hedge: bool = False,
+             hedge_slot: Optional[threading.Semaphore] = None) -> Any:
+        """Call fn(timeout) under the policy and return its result.
+
+        Args:
+            fn: Makes one attempt; receives the attempt's timeout in seconds
+            hedge: Whether a slow attempt may be duplicated (only for idempotent, non-streaming calls)
+            hedge_slot: Optional concurrency limiter a backup request must take a free slot of
+                        (no backup is sent while it has none)
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            DeadlineExceededError: If the deadline passed before an attempt could be made
+            Exception: The last attempt's error once retries are exhausted, or a non-retryable error
+        """
+        self._local.attempts = 0
+        self._local.hedged = False
+        self._count("calls")
+        if not self.breaker.allow_request():
+            self._count("short_circuited")
+            raise CircuitOpenError("LLM provider circuit breaker is open")
+
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.max_attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count("deadline_exceeded")
+                raise DeadlineExceededError(f"LLM call deadline of {self.deadline:.1f} s exceeded")
+            timeout = min(remaining, self.attempt_timeout) if self.attempt_timeout else remaining
+            self._local.attempts += 1
+            try:
+                result = self._attempt(fn, timeout, hedge, hedge_slot)
+            except Exception as e:
+                if not self.is_retryable(e):
+                    # The provider answered (e.g. 400 Bad Request), so it is not an outage
+                    self.breaker.record_success()
+                    raise
+                self._count("failures")
+                self.breaker.record_failure()
+                delay = max(self.backoff(attempt), self._retry_after(e) or 0.0)
+                if time.monotonic() + delay >= deadline:
+                    self._count("deadline_exceeded")
+                    raise
+                if attempt == self.max_attempts - 1 or not self.breaker.allow_request():
+                    raise
+                print(f"DEBUG: LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                self._count("retries")
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _attempt(self, fn: Callable[[float], Any], timeout: float, hedge: bool,
+                 hedge_slot: Optional[threading.Semaphore] = None) -> Any:
+        """Make one attempt, sending a backup request if it runs for longer than hedge_after."""
+        if not hedge or self.hedge_after is None or timeout <= self.hedge_after:
+            return fn(timeout)
+
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=self.hedge_workers or 32,
+                                                          thread_name_prefix="llm-hedge")
+            executor = self._hedge_executor
+        submitted = time.monotonic()
+        started = threading.Event()
+
+        def primary_attempt(seconds: float) -> Any:
+            started.set()
+            return fn(seconds)
+
+        primary = executor.submit(contextvars.copy_context().run, primary_attempt, timeout)
+        # Time spent queued for a worker does not count towards hedge_after
+        if not started.wait(timeout) and primary.cancel():
+            raise TimeoutError(f"No free worker for an LLM request within {timeout:.1f} s")
+        started_at = time.monotonic()
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+        # Never exceed the caller's concurrency limit with the backup
+        if hedge_slot is not None and not hedge_slot.acquire(blocking=False):
+            return primary.result()
+
+        def backup_attempt(seconds: float) -> Any:
+            try:
+                return fn(seconds)
+            finally:
+                if hedge_slot is not None:
+                    hedge_slot.release()
+
+        self._count("hedges")
+        self._local.hedged = True
+        remaining = timeout - (started_at - submitted) - self.hedge_after
+        backup = executor.submit(contextvars.copy_context().run, backup_attempt, max(remaining, 0.0))
+        pending = {primary, backup}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        self._count("hedge_wins")
+                    return future.result()
+        # Both failed: report the primary's error
+        return primary.result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the counters and the circuit breaker state."""
+        with self._lock:
+            stats = dict(self.counters)
+        stats["breaker_state"] = self.breaker.state
+        stats["breaker_opened"] = self.breaker.times_opened
+        return stats
+
+    def format_stats(self) -> str:
+        """One-line summary of retries, hedges and circuit breaker activity."""
+        stats = self.stats()
+        return (f"LLM resilience: {stats['calls']} calls, {stats['retries']} retries, "
+                f"{stats['hedges']} hedged ({stats['hedge_wins']} won by the backup), "
+                f"{stats['deadline_exceeded']} past deadline, {stats['short_circuited']} short-circuited, "
+                f"circuit breaker {stats['breaker_state']} (opened {stats['breaker_opened']} times)")
+
+    def close(self) -> None:
+        """Stop the hedging threads."""
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
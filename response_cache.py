@@ -0,0 +1,127 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class ResponseCache:
+    """Opt-in cache for deterministic LLM calls, keyed by (model, messages, params).
+
+    Entries live in an in-memory LRU and, if db_path is given, in an on-disk
+    SQLite tier shared across processes and restarts. Both tiers expire entries
+    after `ttl` seconds. Intended for the low-temperature evaluation and
+    selection calls, whose inputs (story context plus short answers such as
+    "I don't know" or "yes") repeat heavily across sessions.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 7 * 24 * 3600, db_path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            ttl: Seconds an entry stays valid
+            db_path: Optional path of a SQLite database used as a second tier
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0}
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+        """Content-address a request: sha256 over the model, messages and parameters."""
+        material = json.dumps({"model": model, "messages": messages, "params": params},
+                              sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached payload for key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return payload
+                del self._entries[key]
+                self.counters["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute("SELECT payload, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    payload, expires_at = row
+                    if expires_at > now:
+                        self._remember(key, payload, expires_at)
+                        self.counters["disk_hits"] += 1
+                        return payload
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.counters["expired"] += 1
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key: str, payload: str) -> None:
+        """Store a payload in every tier."""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, payload, expires_at)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO responses (key, payload, expires_at) VALUES (?, ?, ?)",
+                                 (key, payload, expires_at))
+                self._db.commit()
+
+    def _remember(self, key: str, payload: str, expires_at: float) -> None:
+        """Insert into the in-memory LRU, evicting the least recently used entry when full."""
+        self._entries[key] = (expires_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def purge_expired(self) -> int:
+        """Drop expired entries from both tiers. Returns the number of entries removed."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+            removed = len(expired)
+            if self._db is not None:
+                removed += self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,)).rowcount
+                self._db.commit()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the overall hit rate."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def format_stats(self) -> str:
+        """One-line summary of the cache statistics."""
+        stats = self.stats()
+        return (f"Response cache: {stats['memory_hits']} memory hits, {stats['disk_hits']} disk hits, "
+                f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), {stats['expired']} expired")
+
+    def close(self) -> None:
+        """Close the SQLite tier."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
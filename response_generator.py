@@ -1,84 +1,197 @@
-import openai
 import os
+import time
 from dotenv import load_dotenv
 
+from llm_client import get_shared_client
+from prompt_registry import get_prompt_registry
+from tracing import llm_call_site
+
 # Try to load from .env file first
 load_dotenv()
 
 class ResponseGenerator:
     """Class to generate responses using selected scaffolding techniques with tailored prompts."""
     
-    def __init__(self, api_key=None, response_length="short"):
+    # Returned when the API call fails
+    FALLBACK_RESPONSE = "That's interesting! Can you tell me more about that?"
+    
+    # Supported user prompt layouts
+    PROMPT_LAYOUTS = ("standard", "cache_friendly")
+    
+    # Model used unless the caller routes the request elsewhere
+    DEFAULT_MODEL = "gpt-4"
+    
+    def __init__(self, api_key=None, response_length="short", llm_client=None, prompt_layout="standard",
+                 router=None):
         """Initialize the response generator with OpenAI API.
         
         Args:
             api_key: OpenAI API key (optional if set in environment)
             response_length: Controls verbosity - 'short' (1-2 sentences) or 'standard' (original behavior)
+            llm_client: Shared LLMClient (defaults to the process-wide client for api_key)
+            prompt_layout: 'standard' or 'cache_friendly' (stable parts first, so the
+                provider's prompt-prefix cache can reuse them across turns)
+            router: Optional ModelRouter that receives the latency of every request
         """
+        if prompt_layout not in self.PROMPT_LAYOUTS:
+            raise ValueError(f"Unknown prompt layout '{prompt_layout}'. Expected one of {self.PROMPT_LAYOUTS}.")
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.response_length = response_length
+        self.prompt_layout = prompt_layout
+        self.router = router
+        # Prompt token usage and latency of every response request
+        self.usage_log = []
         
         # Ensure the API key is loaded
-        if not self.api_key:
+        if not self.api_key and llm_client is None:
             raise ValueError("OpenAI API key is missing! Please provide it as an argument or in .env file.")
         
-        # Set up OpenAI client
-        self.client = openai.OpenAI(api_key=self.api_key)
+        # Set up the shared LLM client
+        self.client = llm_client or get_shared_client(self.api_key)
         
-        # Define common guidelines and technique-specific system prompts
-        self.common_guidelines = self._load_text_file("prompts/response_common_guidelines.txt")
-        self.transition_guidelines = self._load_text_file("prompts/response_transition.txt")
-        self.summary_closure_guidelines = self._load_text_file("prompts/response_summary_closure.txt")
-        self.default_guidelines = self._load_text_file("prompts/response_default.txt")
-        self._init_technique_prompts()
+        # Prompts are loaded once per process and shared by all instances
+        self.prompts = get_prompt_registry()
+    
+    @property
+    def common_guidelines(self):
+        return self.prompts.current().text_or_empty("response_common_guidelines.txt")
+    
+    @property
+    def transition_guidelines(self):
+        return self.prompts.current().text_or_empty("response_transition.txt")
     
-    def _load_text_file(self, filepath):
-        """Load text content from a file.
+    @property
+    def summary_closure_guidelines(self):
+        return self.prompts.current().text_or_empty("response_summary_closure.txt")
+    
+    @property
+    def default_guidelines(self):
+        return self.prompts.current().text_or_empty("response_default.txt")
+    
+    @property
+    def technique_prompts(self):
+        """Technique-specific system prompts, each followed by the common guidelines."""
+        return self.prompts.current().technique_prompts
+    
+    def generate_response(self, child_input, prompt, context_before, context_after, 
+                         selected_technique, target_vocab=None, vocab_role=None, special_instructions=None,
+                         model=None):
+        """
+        Generate a response based on the child's input and selected technique.
         
         Args:
-            filepath: Path to the text file
-            
-        Returns:
-            String content of the file
+            model: Model to use (defaults to DEFAULT_MODEL)
         """
+        model = model or self.DEFAULT_MODEL
+        messages = self._build_messages(child_input, prompt, context_before, context_after,
+                                        selected_technique, target_vocab, vocab_role, special_instructions)
+        start = time.perf_counter()
         try:
-            with open(filepath, 'r') as file:
-                return file.read()
-        except FileNotFoundError:
-            print(f"Warning: Could not find {filepath}. Using default empty string.")
-            return ""
+            with llm_call_site("generate_response"):
+                response = self.client.chat_completion(
+                    model=model,
+                    messages=messages,
+                    max_tokens=150,
+                    temperature=0.7
+                )
+            self._record_usage(response.usage, time.perf_counter() - start, model)
+            response = response.choices[0].message.content.strip()
+            return self._postprocess_response(response, selected_technique, special_instructions)
+        except Exception as e:
+            # A model that times out must still look slow to the router
+            if self.router is not None:
+                self.router.record_failure(model, time.perf_counter() - start, e)
+            print(f"Error generating response: {e}")
+            return self.FALLBACK_RESPONSE
     
-    def _init_technique_prompts(self):
-        """Initialize the technique-specific system prompts by load from files."""
+    def generate_response_stream(self, child_input, prompt, context_before, context_after,
+                                 selected_technique, target_vocab=None, vocab_role=None, special_instructions=None,
+                                 model=None):
+        """
+        Streaming variant of generate_response.
         
-        # Initialize technique_prompts dictionary
-        self.technique_prompts = {}
+        Returns a ResponseStream that yields text chunks as they arrive. The same
+        post-processing as generate_response runs on the complete text once the
+        stream is exhausted; the result is available as ResponseStream.text.
+        """
+        model = model or self.DEFAULT_MODEL
+        messages = self._build_messages(child_input, prompt, context_before, context_after,
+                                        selected_technique, target_vocab, vocab_role, special_instructions)
+        with llm_call_site("generate_response"):
+            stream = self.client.chat_completion_stream(
+                model=model,
+                messages=messages,
+                max_tokens=150,
+                temperature=0.7,
+                stream_options={"include_usage": True}
+            )
         
-        # Define the scaffolding techniques to load
-        techniques = [
-            "co-participating",
-            "reducing_choices", 
-            "eliciting", 
-            "generalizing", 
-            "reasoning", 
-            "predicting",
-            "story_retelling",
-            "alternative_ending"
-        ]
+        def chunks():
+            # The request is only sent once iteration starts
+            start = time.perf_counter()
+            usage = None
+            try:
+                for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+                    # The final chunk carries the usage and no choices
+                    if getattr(chunk, "usage", None):
+                        usage = chunk.usage
+            except Exception as e:
+                if self.router is not None:
+                    self.router.record_failure(model, time.perf_counter() - start, e)
+                raise
+            # Latency is recorded even if the provider sent no usage chunk
+            self._record_usage(usage, time.perf_counter() - start, model)
         
-        # Load each technique prompt from its file
-        for technique in techniques:
-            prompt_path = f"prompts/response_{technique}.txt"
-            prompt_content = self._load_text_file(prompt_path)
-            
-            # Add the common guidelines to each technique prompt
-            self.technique_prompts[technique] = f"{prompt_content}\n\n{self.common_guidelines}"
+        return ResponseStream(
+            chunks(),
+            lambda text: self._postprocess_response(text, selected_technique, special_instructions),
+            self.FALLBACK_RESPONSE
+        )
     
-    def generate_response(self, child_input, prompt, context_before, context_after, 
-                         selected_technique, target_vocab=None, vocab_role=None, special_instructions=None):
-        """
-        Generate a response based on the child's input and selected technique.
-        """
+    def _record_usage(self, usage, latency, model=None):
+        """Record prompt tokens, cached prompt tokens and latency of one request."""
+        if self.router is not None:
+            self.router.record_latency(model or self.DEFAULT_MODEL, latency)
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        entry = {
+            "prompt_tokens": usage.prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "latency": latency,
+            "model": model or self.DEFAULT_MODEL
+        }
+        self.usage_log.append(entry)
+    
+    def get_usage_stats(self):
+        """Return cached vs uncached prompt tokens and the mean latency over all requests."""
+        prompt_tokens = sum(entry["prompt_tokens"] for entry in self.usage_log)
+        cached_tokens = sum(entry["cached_tokens"] for entry in self.usage_log)
+        requests = len(self.usage_log)
+        return {
+            "requests": requests,
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "uncached_tokens": prompt_tokens - cached_tokens,
+            "cached_rate": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+            "mean_latency": sum(entry["latency"] for entry in self.usage_log) / requests if requests else 0.0
+        }
+    
+    def format_usage_stats(self):
+        """One-line summary of the prompt token usage."""
+        stats = self.get_usage_stats()
+        return (f"Response prompts ({self.prompt_layout} layout): {stats['requests']} requests, "
+                f"{stats['prompt_tokens']} prompt tokens, {stats['cached_tokens']} cached "
+                f"({stats['cached_rate']:.0%}), {stats['uncached_tokens']} uncached, "
+                f"mean latency {stats['mean_latency']:.2f}s")
+    
+    def _build_messages(self, child_input, prompt, context_before, context_after,
+                        selected_technique, target_vocab, vocab_role, special_instructions):
+        """Build the system and user messages for a response request."""
         # Extract conversation history from the prompt if it exists
         conversation_history = ""
         if "Previous conversation:" in prompt:
@@ -178,8 +291,43 @@ class ResponseGenerator:
                     - "Can you tell me about the part where [event]?"
                     """
 
+        instructions = """Based on the child's response and the conversation history, generate a follow-up question that:
+        1. Builds upon their previous responses
+        2. Explores a different aspect of the story
+        3. Uses warm, encouraging language
+        4. Avoids repeating previous questions
+        5. Maintains engagement and interest
+        6. Provides appropriate scaffolding based on their response length and confidence
+        7. Always connects back to specific story elements
+        8. Uses the child's own words when possible
+        9. NEVER ends with a statement - ALWAYS end with a question
+        10. If the child seems unsure, offer simpler options or hints
+
+        Your response should be a single question that continues the conversation naturally.
+        """
+
         # Construct the user prompt with all context
-        user_prompt = f"""
+        if self.prompt_layout == "cache_friendly":
+            # Stable parts first: the story context only grows from one interaction to
+            # the next, so consecutive requests share a long prefix. The parts that
+            # change on every turn (history, per-answer hints, the answer) come last.
+            user_prompt = f"""
+        {context_section}
+
+        {vocab_section}
+
+        {conversation_history}
+
+        {child_responses}
+
+        {special_section}
+
+        Child's response to the question "{base_prompt}":
+        "{child_input}"
+
+        {instructions}"""
+        else:
+            user_prompt = f"""
         {context_section}
 
         {vocab_section}
@@ -193,20 +341,7 @@ class ResponseGenerator:
         Child's response to the question "{base_prompt}":
         "{child_input}"
 
-        Based on the child's response and the conversation history, generate a follow-up question that:
-        1. Builds upon their previous responses
-        2. Explores a different aspect of the story
-        3. Uses warm, encouraging language
-        4. Avoids repeating previous questions
-        5. Maintains engagement and interest
-        6. Provides appropriate scaffolding based on their response length and confidence
-        7. Always connects back to specific story elements
-        8. Uses the child's own words when possible
-        9. NEVER ends with a statement - ALWAYS end with a question
-        10. If the child seems unsure, offer simpler options or hints
-
-        Your response should be a single question that continues the conversation naturally.
-        """
+        {instructions}"""
 
         # Add strong question formatting requirement for summary interactions
         if selected_technique["name"] in ["response_summary_closure", "alternative_ending", "story_retelling"]:
@@ -256,46 +391,88 @@ class ResponseGenerator:
                 self.default_guidelines
             )
 
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _postprocess_response(self, response, selected_technique, special_instructions):
+        """Apply question/closing fixes to a complete response text."""
+        # Debug logging for response analysis
+        print(f"[DEBUG] Final robot response: {response}")
+        print(f"[DEBUG] Ends with question: {response.strip().endswith('?')}")
+        
+        # Check if this is a final closing message
+        is_final_closing = "FINAL CLOSING MESSAGE REQUIREMENTS" in str(special_instructions)
+        
+        # Enforce question ending for story retelling (but not for final closing)
+        if selected_technique["name"] == "story_retelling" and not response.strip().endswith("?") and not is_final_closing:
+            print("[DEBUG] Story retelling response missing question mark. Adding follow-up question.")
+            # Add a contextually appropriate follow-up question
+            if "remember" in response.lower():
+                response += " What else do you remember from the story?"
+            elif "think" in response.lower():
+                response += " Can you tell me more about that?"
+            else:
+                response += " What happened next in the story?"
+        
+        # For final closing messages, ensure it doesn't end with a question
+        if is_final_closing and response.strip().endswith("?"):
+            print("[DEBUG] Final closing message ended with question mark. Converting to statement.")
+            # Remove the question mark and make it a statement
+            response = response.strip().rstrip("?") + "."
+            # Add a closing phrase if it doesn't have one
+            if not any(phrase in response.lower() for phrase in ["see you", "until next", "tomorrow", "goodbye"]):
+                response += " See you tomorrow for another adventure!"
+        
+        return response
+
+
+class ResponseStream:
+    """Iterable over the text chunks of a streamed robot response.
+    
+    Iterating yields chunks as they arrive from the API. Once the stream is
+    exhausted, `text` returns the complete post-processed response, and
+    `first_token_latency` / `total_latency` hold the timings in seconds.
+    """
+    
+    def __init__(self, chunks, finalize, fallback_response):
+        """
+        Args:
+            chunks: Iterator of text chunks from the API
+            finalize: Callable applied to the complete raw text
+            fallback_response: Text used if the request fails before any chunk arrives
+        """
+        self._chunks = chunks
+        self._finalize = finalize
+        self._fallback_response = fallback_response
+        self._raw_text = None
+        self._text = None
+        self.first_token_latency = None
+        self.total_latency = None
+    
+    def __iter__(self):
+        start = time.perf_counter()
+        parts = []
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=150,
-                temperature=0.7
-            )
-            response = response.choices[0].message.content.strip()
-            
-            # Debug logging for response analysis
-            print(f"[DEBUG] Final robot response: {response}")
-            print(f"[DEBUG] Ends with question: {response.strip().endswith('?')}")
-            
-            # Check if this is a final closing message
-            is_final_closing = "FINAL CLOSING MESSAGE REQUIREMENTS" in str(special_instructions)
-            
-            # Enforce question ending for story retelling (but not for final closing)
-            if selected_technique["name"] == "story_retelling" and not response.strip().endswith("?") and not is_final_closing:
-                print("[DEBUG] Story retelling response missing question mark. Adding follow-up question.")
-                # Add a contextually appropriate follow-up question
-                if "remember" in response.lower():
-                    response += " What else do you remember from the story?"
-                elif "think" in response.lower():
-                    response += " Can you tell me more about that?"
-                else:
-                    response += " What happened next in the story?"
-            
-            # For final closing messages, ensure it doesn't end with a question
-            if is_final_closing and response.strip().endswith("?"):
-                print("[DEBUG] Final closing message ended with question mark. Converting to statement.")
-                # Remove the question mark and make it a statement
-                response = response.strip().rstrip("?") + "."
-                # Add a closing phrase if it doesn't have one
-                if not any(phrase in response.lower() for phrase in ["see you", "until next", "tomorrow", "goodbye"]):
-                    response += " See you tomorrow for another adventure!"
-            
-            return response
+            for chunk in self._chunks:
+                if self.first_token_latency is None:
+                    self.first_token_latency = time.perf_counter() - start
+                parts.append(chunk)
+                yield chunk
         except Exception as e:
             print(f"Error generating response: {e}")
-            return "That's interesting! Can you tell me more about that?"
\ No newline at end of file
+            if not parts:
+                self.first_token_latency = time.perf_counter() - start
+                parts.append(self._fallback_response)
+                yield self._fallback_response
+        
+        self._raw_text = "".join(parts).strip()
+        self.total_latency = time.perf_counter() - start
+    
+    @property
+    def text(self):
+        """The post-processed response, or None while the stream is still running."""
+        if self._text is None and self._raw_text is not None:
+            self._text = self._finalize(self._raw_text)
+        return self._text
\ No newline at end of file
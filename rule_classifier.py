@@ -0,0 +1,122 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Words ignored when matching a child's answer against offered choices
+STOPWORDS = {
+    "a", "an", "the", "i", "you", "we", "it", "he", "she", "they", "my", "your", "our", "his", "her",
+    "to", "of", "in", "on", "at", "for", "with", "and", "or", "but", "is", "are", "was", "be",
+    "do", "does", "did", "should", "would", "could", "can", "will", "think", "want", "like",
+    "which", "what", "who", "where", "whether", "one", "first", "second", "that", "this", "maybe"
+}
+
+
+def content_words(text: str) -> List[str]:
+    """Lowercase words of text without punctuation and stopwords."""
+    return [word for word in re.findall(r"[a-z']+", text.lower()) if word not in STOPWORDS]
+
+
+def extract_offered_choices(robot_text: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Find the two options of an "A or B?" question in a robot response.
+
+    Returns:
+        Tuple of (first option, second option), or None if the response offers no choice
+    """
+    if not robot_text:
+        return None
+    questions = [q for q in re.findall(r"[^.!?]*\?", robot_text) if re.search(r"\bor\b", q)]
+    if not questions:
+        return None
+    question = questions[-1].strip().rstrip("?")
+    # Keep only the clause that holds the choice ("..., should I use X or Y")
+    question = re.split(r"[,;:—-]\s*", question)[-1]
+    first, _, second = question.rpartition(" or ")
+    if not first.strip() or not second.strip():
+        return None
+    return first.strip(), second.strip()
+
+
+class RulePreClassifier:
+    """Local pre-classifier that resolves clear-cut child answers without the LLM.
+
+    It looks at the word count, whether the target vocabulary word was used, the
+    previously used technique and whether the answer picks one of the choices the
+    robot just offered. Clear-cut answers get a support level and complexity
+    score immediately; everything else returns None and goes to the LLM.
+    """
+
+    DEFAULT_CONFIG = {
+        # Single-word answers that are engaged but give little to build on
+        "short_answers": ["yes", "no", "both", "maybe", "okay", "ok", "sure", "yeah", "yep", "nope", "neither"],
+        "short_answer_score": 3,
+        # Answers that pick one of the two options offered by reducing_choices
+        "choice_max_words": 5,
+        "choice_score": 6,
+        "choice_technique": "reasoning",
+        # Long answers that use the target vocabulary word
+        "rich_answer_min_words": 10,
+        "rich_answer_score": 7,
+        # Fraction of resolved answers also sent to the LLM to measure agreement
+        "shadow_rate": 0.0
+    }
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            config: Overrides for DEFAULT_CONFIG
+        """
+        self.config = dict(self.DEFAULT_CONFIG)
+        self.config.update(config or {})
+        self.short_answers = set(self.config["short_answers"])
+
+    def classify(self, child_input: str, target_vocab: Optional[str] = None,
+                 previous_technique: Optional[str] = None,
+                 previous_response: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Classify a child's answer if the case is clear-cut.
+
+        Args:
+            child_input: The child's response
+            target_vocab: Optional target vocabulary word
+            previous_technique: Technique used for the robot's previous turn
+            previous_response: The robot's previous response (used to find offered choices)
+
+        Returns:
+            Dict with support_level, complexity_score, technique (preferred, may be None)
+            and rule, or None if the answer should be escalated to the LLM
+        """
+        clean_input = child_input.strip().lower().strip(".!? ")
+        words = clean_input.split()
+
+        # 1. The child picked one of the two options offered by reducing_choices
+        if previous_technique == "reducing_choices" and len(words) <= self.config["choice_max_words"]:
+            choices = extract_offered_choices(previous_response)
+            answer_words = set(content_words(clean_input))
+            if choices and answer_words:
+                matches = [choice for choice in choices if answer_words & set(content_words(choice))]
+                if len(matches) == 1:
+                    return {
+                        "support_level": "low",
+                        "complexity_score": self.config["choice_score"],
+                        "technique": self.config["choice_technique"],
+                        "rule": "offered_choice"
+                    }
+
+        # 2. One-word acknowledgements: engaged, but little to build on
+        if len(words) == 1 and words[0] in self.short_answers:
+            return {
+                "support_level": "high",
+                "complexity_score": self.config["short_answer_score"],
+                "technique": None,
+                "rule": "short_answer"
+            }
+
+        # 3. Long answers that use the target vocabulary word
+        if (target_vocab and len(words) >= self.config["rich_answer_min_words"]
+                and re.search(rf"\b{re.escape(target_vocab.lower())}", clean_input)):
+            return {
+                "support_level": "low",
+                "complexity_score": self.config["rich_answer_score"],
+                "technique": None,
+                "rule": "rich_vocab_answer"
+            }
+
+        return None
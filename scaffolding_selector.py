@@ -1,13 +1,22 @@
 import random
 import re
+import contextvars
 import json
 import os
 import sys
-from typing import Dict, List, Optional, Any
+import threading
+import time
+from typing import Dict, List, Mapping, Optional, Any
 
-import openai
 from dotenv import load_dotenv
 
+from llm_client import LLMClient, get_shared_client
+from model_router import ModelRouter
+from prompt_registry import get_prompt_registry
+from rule_classifier import RulePreClassifier
+from story_scorer import SCORED_ENDINGS, StoryKeywords, StoryScorer
+from tracing import llm_call_site
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -15,94 +24,59 @@ load_dotenv()
 class ScaffoldingSelector:
     """Selects appropriate scaffolding techniques based on child input and context."""
     
-    def __init__(self, use_llm: bool = True, api_key: Optional[str] = None):
+    def __init__(self, use_llm: bool = True, api_key: Optional[str] = None,
+                 llm_client: Optional[LLMClient] = None, fast_path: bool = False,
+                 fast_path_config: Optional[Dict[str, Any]] = None, router: Optional[ModelRouter] = None,
+                 ending_scorer: Optional[str] = None,
+                 ending_scorer_calibration: Optional[Dict[str, Dict[str, float]]] = None):
         """Initialize the scaffolding selector.
         
         Args:
             use_llm: Whether to use the LLM for technique selection
             api_key: OpenAI API key (optional if set in environment)
+            llm_client: Shared LLMClient (defaults to the process-wide client for api_key)
+            fast_path: Whether clear-cut answers are classified locally without the LLM
+            fast_path_config: Overrides for RulePreClassifier.DEFAULT_CONFIG
+            router: Optional ModelRouter choosing the selection and evaluation models
+            ending_scorer: 'first_pass' to score retellings and alternative endings locally and ask
+                           the LLM only when the local score is near a support-level boundary,
+                           'local' to never ask the LLM for them, or None to always ask it
+            ending_scorer_calibration: Optional story_scorer.fit_calibration result for the local scores
         """
+        if ending_scorer not in (None, "first_pass", "local"):
+            raise ValueError(f"Unknown ending_scorer '{ending_scorer}'. Expected 'first_pass' or 'local'.")
         # Track previously used techniques to avoid repetition
         self.previously_used: List[str] = []
         self.use_llm = use_llm
-        
-        # Load scaffolding techniques from JSON file
-        self.SCAFFOLDING_TECHNIQUES = self._load_scaffolding_techniques()
-        
-        # Load the system and user prompts
-        self.system_prompt = self._load_text_file('prompts/scaffolding_system_prompt.txt')
-        self.user_prompt_template = self._load_text_file('prompts/scaffolding_user_prompt.txt')
-        
-        # Set up OpenAI client if using LLM
+        self.router = router
+        
+        # Optional local pre-classifier and its statistics
+        self.pre_classifier = RulePreClassifier(fast_path_config) if fast_path else None
+        self.fast_path_counts = {"resolved": 0, "escalated": 0, "shadow_checks": 0,
+                                 "support_agreements": 0, "technique_agreements": 0}
+        self.fast_path_rules: Dict[str, int] = {}
+        self._fast_path_lock = threading.Lock()
+        
+        # Optional story-aware local scoring of retellings and alternative endings and its statistics
+        self.ending_scorer = ending_scorer
+        self.ending_scorer_calibration = ending_scorer_calibration
+        self.story_keywords: Optional[StoryKeywords] = None  # Set by the handler; otherwise built from the context
+        self.ending_scorer_counts = {"resolved": 0, "escalated": 0, "comparisons": 0,
+                                     "support_agreements": 0, "abs_error": 0.0}
+        
+        # Scaffolding techniques and prompts are loaded once per process and shared by all instances
+        self.prompts = self._load_prompt_registry()
+        
+        # Set up the shared LLM client if using LLM
         if self.use_llm:
             self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-            if not self.api_key:
-                raise ValueError("OpenAI API key is missing! Please provide it as an argument or in .env file.")
-            self.client = openai.OpenAI(api_key=self.api_key)
+            self.client = llm_client or get_shared_client(self.api_key)
     
-    def _load_text_file(self, filepath: str) -> str:
-        """Load text content from a file.
-        
-        Args:
-            filepath: Path to the text file
-            
-        Returns:
-            String content of the file
-        """
+    @staticmethod
+    def _load_prompt_registry():
+        """Get the shared prompt registry, exiting if the prompts cannot be loaded."""
         try:
-            with open(filepath, 'r') as file:
-                return file.read()
-        except FileNotFoundError:
-            print(f"ERROR: Could not find '{filepath}'")
-            print("Make sure the prompts directory exists and contains the required files.")
-            sys.exit(1)
-    
-    def _load_scaffolding_techniques(self) -> Dict[str, Dict[str, Any]]:
-        """Load scaffolding techniques from JSON file.
-        
-        Returns:
-            Dictionary containing scaffolding techniques
-        """
-        try:
-            with open('prompts/scaffolding_techniques.json', 'r') as file:
-                techniques = json.load(file)
-                
-            # Add the new ending techniques
-            techniques.update({
-                "story_retelling": {
-                    "full_definition": "Assesses the child's comprehension and memory of the story through retelling",
-                    "support_level": "low",
-                    "examples": [
-                        "Can you tell me what happened in the story?",
-                        "What do you remember about Sparky's adventure?",
-                        "Tell me about what happened with Sparky and the butterfly"
-                    ]
-                },
-                "alternative_ending": {
-                    "full_definition": "Encourages creative thinking by asking for a different story ending",
-                    "support_level": "low",
-                    "examples": [
-                        "How else could the story have ended?",
-                        "What if Sparky and the butterfly had done something different?",
-                        "Can you think of another way the story could have ended?"
-                    ]
-                },
-                "response_summary_closure": {
-                    "full_definition": "Helps children reflect on and summarize their understanding of the story through story-specific questions.",
-                    "support_level": "low",
-                    "examples": [
-                        "What was the most exciting part of the story for you?",
-                        "How did the characters solve their problem in the story?",
-                        "What would you have done if you were in the story?",
-                        "What lesson did we learn from the story?",
-                        "How did the story make you feel and why?",
-                        "What was the biggest challenge in the story?",
-                        "How did the characters help each other?",
-                        "What would you tell a friend about this story?"
-                    ]
-                }
-            })
-            return techniques
+            registry = get_prompt_registry()
         except FileNotFoundError:
             print("ERROR: Could not find 'prompts/scaffolding_techniques.json'")
             print("Make sure the prompts directory exists and contains the required files.")
@@ -111,9 +85,54 @@ class ScaffoldingSelector:
             print("ERROR: Invalid JSON in 'prompts/scaffolding_techniques.json'")
             print("The file exists but contains invalid JSON. Please check the file format.")
             sys.exit(1)
+        for name in ["scaffolding_system_prompt.txt", "scaffolding_user_prompt.txt"]:
+            if registry.current().text(name) is None:
+                print(f"ERROR: Could not find 'prompts/{name}'")
+                print("Make sure the prompts directory exists and contains the required files.")
+                sys.exit(1)
+        return registry
+    
+    def _model_for(self, purpose: str, technique: Optional[str] = None) -> str:
+        """Model for a selection or evaluation call (gpt-4o-mini unless a router decides)."""
+        if self.router is None:
+            return "gpt-4o-mini"
+        return self.router.route(purpose, technique=technique).model
+    
+    def _record_latency(self, model: str, start: float, error: Optional[BaseException] = None) -> None:
+        """Feed a call's latency to the router; failed calls count only if they timed out."""
+        if self.router is None:
+            return
+        if error is None:
+            self.router.record_latency(model, time.perf_counter() - start)
+        else:
+            self.router.record_failure(model, time.perf_counter() - start, error)
+    
+    def _prompt_text(self, name: str) -> str:
+        """Return the current content of a prompt file.
+        
+        Args:
+            name: File name inside the prompts directory
+            
+        Returns:
+            String content of the file ("" if it is missing)
+        """
+        return self.prompts.current().text_or_empty(name)
+    
+    @property
+    def SCAFFOLDING_TECHNIQUES(self) -> Mapping[str, Mapping[str, Any]]:
+        """Scaffolding techniques (read-only), including the ending techniques."""
+        return self.prompts.current().scaffolding_techniques
+    
+    @property
+    def system_prompt(self) -> str:
+        return self._prompt_text("scaffolding_system_prompt.txt")
+    
+    @property
+    def user_prompt_template(self) -> str:
+        return self._prompt_text("scaffolding_user_prompt.txt")
     
     def _evaluate_retelling_complexity(self, response: str, context_before: str) -> Dict[str, Any]:
-        """Evaluate the complexity of a story retelling response.
+        """Evaluate the complexity of a story retelling response without the LLM.
         
         Args:
             response: The child's retelling response
@@ -122,112 +141,54 @@ class ScaffoldingSelector:
         Returns:
             Dictionary containing score, support level, and scoring rationale
         """
-        # Initialize scoring components
-        sequence_accuracy = 0
-        key_event_recall = 0
-        character_involvement = 0
-        vocabulary_usage = 0
-        plot_coherence = 0
-        detail_enrichment = 0
-        
-        # Check for basic response quality
-        if not response or len(response.strip()) < 5:
-            return {
-                "score": 1,
-                "support_level": "high",
-                "rationale": {
-                    "sequence_accuracy": 0,
-                    "key_event_recall": 0,
-                    "character_involvement": 0,
-                    "vocabulary_usage": 0,
-                    "plot_coherence": 0,
-                    "detail_enrichment": 0
-                }
-            }
-        
-        # Check for memory/recall issues
-        if any(phrase in response.lower() for phrase in ["don't remember", "don't know", "forgot", "can't remember"]):
-            return {
-                "score": 2,
-                "support_level": "high",
-                "rationale": {
-                    "sequence_accuracy": 0,
-                    "key_event_recall": 0,
-                    "character_involvement": 1,
-                    "vocabulary_usage": 0,
-                    "plot_coherence": 0,
-                    "detail_enrichment": 1
-                }
-            }
-        
-        # Evaluate sequence accuracy
-        if "sparky" in response.lower() and "butterfly" in response.lower():
-            sequence_accuracy += 2
-        elif "sparky" in response.lower() or "butterfly" in response.lower():
-            sequence_accuracy += 1
-        
-        # Evaluate key event recall
-        key_events = ["box", "garden", "friends", "play", "happy"]
-        for event in key_events:
-            if event in response.lower():
-                key_event_recall += 1
-                if key_event_recall >= 3:
-                    break
-        
-        # Evaluate character involvement
-        if "sparky" in response.lower() and "butterfly" in response.lower():
-            character_involvement += 2
-        elif "sparky" in response.lower() or "butterfly" in response.lower():
-            character_involvement += 1
-        
-        # Evaluate vocabulary usage
-        target_vocab = ["explore", "butterfly", "happy", "friends"]
-        for word in target_vocab:
-            if word in response.lower():
-                vocabulary_usage += 1
-                if vocabulary_usage >= 2:
-                    break
-        
-        # Evaluate plot coherence
-        if len(response.split()) > 10 and any(word in response.lower() for word in ["because", "then", "so", "and"]):
-            plot_coherence += 2
-        elif len(response.split()) > 5:
-            plot_coherence += 1
-        
-        # Evaluate detail and enrichment
-        if len(response.split()) > 15 or any(word in response.lower() for word in ["beautiful", "colorful", "wonderful", "fun"]):
-            detail_enrichment += 1
-        
-        # Calculate total score
-        total_score = (
-            sequence_accuracy +
-            key_event_recall +
-            character_involvement +
-            vocabulary_usage +
-            plot_coherence +
-            detail_enrichment
-        )
+        return self._story_scorer(context_before).score("story_retelling", response)
+    
+    def _story_scorer(self, context: str) -> StoryScorer:
+        """Local scorer for the session's story (or for the story in `context` outside a session)."""
+        keywords = self.story_keywords or StoryKeywords.for_story(context)
+        return StoryScorer(keywords, self.ending_scorer_calibration)
+    
+    def _local_ending_score(self, ending_type: str, response: str, context: str) -> Optional[Dict[str, Any]]:
+        """Score an ending answer locally if the ending scorer is on.
         
-        # Determine support level
-        if total_score <= 3:
-            support_level = "high"
-        elif total_score <= 6:
-            support_level = "medium"
-        else:
-            support_level = "low"
+        Returns:
+            The local evaluation, which is final if its "final" key is True, or None if the scorer is off
+        """
+        if self.ending_scorer is None or ending_type not in SCORED_ENDINGS:
+            return None
+        evaluation = self._story_scorer(context).score(ending_type, response)
+        evaluation["final"] = self.ending_scorer == "local" or evaluation["confident"]
+        with self._fast_path_lock:
+            self.ending_scorer_counts["resolved" if evaluation["final"] else "escalated"] += 1
+        if evaluation["final"]:
+            print(f"DEBUG: Scored the {ending_type} answer locally: {evaluation['score']} ({evaluation['rationale']})")
+        return evaluation
+    
+    def _compare_ending_scores(self, local: Optional[Dict[str, Any]], llm_result: Dict[str, Any]) -> None:
+        """Record how an escalated local score compares with the LLM's score."""
+        if local is None:
+            return
+        with self._fast_path_lock:
+            self.ending_scorer_counts["comparisons"] += 1
+            self.ending_scorer_counts["abs_error"] += abs(local["score"] - llm_result["score"])
+            if local["support_level"] == llm_result["support_level"]:
+                self.ending_scorer_counts["support_agreements"] += 1
+    
+    def get_ending_scorer_stats(self) -> Dict[str, Any]:
+        """Return how many ending answers the local scorer settled and how it compared with the LLM.
         
-        return {
-            "score": total_score,
-            "support_level": support_level,
-            "rationale": {
-                "sequence_accuracy": sequence_accuracy,
-                "key_event_recall": key_event_recall,
-                "character_involvement": character_involvement,
-                "vocabulary_usage": vocabulary_usage,
-                "plot_coherence": plot_coherence,
-                "detail_enrichment": detail_enrichment
-            }
-        }
+        Returns:
+            Dictionary with counts, the resolved rate, and the support-level agreement rate and mean
+            absolute score difference over the escalated answers (None before any comparison)
+        """
+        with self._fast_path_lock:
+            stats = dict(self.ending_scorer_counts)
+        total = stats["resolved"] + stats["escalated"]
+        stats["resolved_rate"] = stats["resolved"] / total if total else 0.0
+        comparisons = stats["comparisons"]
+        stats["support_agreement_rate"] = stats["support_agreements"] / comparisons if comparisons else None
+        stats["mean_abs_error"] = stats.pop("abs_error") / comparisons if comparisons else None
+        return stats
     
     def _evaluate_summary_closure_complexity(self, response, context):
         """Evaluate complexity of response summary closure responses."""
@@ -267,15 +228,20 @@ class ScaffoldingSelector:
         - rationale: brief explanation of scoring
         """
         
+        model = self._model_for("evaluation", "response_summary_closure")
+        start = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that evaluates children's responses to story summary questions. Always respond with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1
-            )
+            with llm_call_site("evaluate_summary_closure"):
+                response = self.client.chat_completion(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": "You are a helpful assistant that evaluates children's responses to story summary questions. Always respond with valid JSON."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.1,
+                    cacheable=True
+                )
+            self._record_latency(model, start)
             
             # Extract JSON from the response (in case there's any extra text)
             response_text = response.choices[0].message.content.strip()
@@ -299,6 +265,7 @@ class ScaffoldingSelector:
             return result
             
         except Exception as e:
+            self._record_latency(model, start, e)
             print(f"Error evaluating summary closure complexity: {str(e)}")
             # Return a default evaluation for error cases
             return {
@@ -325,6 +292,25 @@ class ScaffoldingSelector:
         Returns:
             Dictionary containing the selected technique and its details
         """
+        local_result = self.select_technique_without_llm(
+            child_input, prompt, context_before, context_after, target_vocab, vocab_role, max_depth, depth
+        )
+        if local_result is not None:
+            return local_result
+        return self.select_technique_with_llm(child_input, prompt, context_before, context_after,
+                                              target_vocab, vocab_role)
+    
+    def select_technique_without_llm(self, child_input, prompt, context_before, context_after,
+                                     target_vocab=None, vocab_role=None, max_depth=3, depth=1):
+        """
+        Select a technique for the turns that do not need the LLM.
+        
+        Disengaged answers, the last depth, clear-cut answers resolved by the fast
+        path and selection with the LLM disabled are handled locally.
+        
+        Returns:
+            Dictionary with the selected technique details, or None if the LLM should select
+        """
         # Check for disengaged or empty responses with improved detection
         def is_disengaged_input(input_text):
             if not input_text or not input_text.strip():
@@ -368,18 +354,91 @@ class ScaffoldingSelector:
         if depth >= max_depth:
             return self._select_transition_technique()
         
+        # Resolve clear-cut answers locally before paying for an LLM round trip
+        if self.pre_classifier is not None:
+            fast_result = self._select_technique_fast(
+                child_input, prompt, context_before, context_after, target_vocab, vocab_role
+            )
+            if fast_result is not None:
+                return fast_result
+        
         # If LLM is not enabled, we still need a basic selection method
         if not self.use_llm:
             print("WARNING: LLM-based technique selection is disabled.")
-            complexity_score = 3 if len(child_input.split()) < 7 else 6
-            support_level = "high" if complexity_score < 5 else "low"
-            return self._select_technique_randomly(support_level, complexity_score)
+            return self._select_technique_local(child_input)
         
         # If child input is empty, handle this case explicitly
         if not child_input or child_input.strip() == "":
             print("WARNING: Empty child input received. Using high support technique.")
             return self._select_technique_randomly("high", 2)
+        
+        return None
+    
+    def select_technique_with_llm(self, child_input, prompt, context_before, context_after,
+                                  target_vocab=None, vocab_role=None):
+        """
+        Let the LLM select the technique, falling back to the local selection if the call fails.
+        
+        Returns:
+            Dictionary containing the selected technique and its details
+        """
+        try:
+            return self._select_technique_llm(child_input, prompt, context_before, context_after,
+                                              target_vocab, vocab_role)
+        except Exception as e:
+            # Keep the session going when the provider is slow or down
+            print(f"Warning: LLM technique selection failed ({e}). Using the local selection instead.")
+            return self._select_technique_local(child_input)
+    
+    def _select_technique_local(self, child_input):
+        """Select a technique without the LLM, scoring the answer by its length."""
+        complexity_score = 3 if len(child_input.split()) < 7 else 6
+        support_level = "high" if complexity_score < 5 else "low"
+        return self._select_technique_randomly(support_level, complexity_score)
+    
+    def _select_technique_llm(self, child_input, prompt, context_before, context_after,
+                              target_vocab=None, vocab_role=None, update_history=True):
+        """Ask the LLM to score the child's response and pick a technique.
+        
+        Args:
+            update_history: Whether the selection counts as used (False for shadow comparisons)
+        """
+        user_prompt = self._selection_user_prompt(child_input, prompt, context_before, context_after,
+                                                  target_vocab, vocab_role)
+        
+        # Make the API call to get technique recommendation
+        model = self._model_for("selection")
+        start = time.perf_counter()
+        try:
+            with llm_call_site("select_technique"):
+                response = self.client.chat_completion(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": self.system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    max_tokens=150,
+                    temperature=0.2,
+                    cacheable=True
+                )
+            self._record_latency(model, start)
+            
+            # Parse the JSON response
+            response_text = response.choices[0].message.content.strip()
+            selection_result = self._parse_llm_response(response_text, child_input, update_history)
+            
+            return selection_result
             
+        except Exception as e:
+            self._record_latency(model, start, e)
+            # select_technique falls back to the local selection; shadow checks skip the comparison
+            print(f"ERROR in LLM API call: {e}")
+            print("Failed to select a scaffolding technique using the LLM.")
+            raise
+    
+    def _selection_user_prompt(self, child_input, prompt, context_before, context_after,
+                               target_vocab=None, vocab_role=None):
+        """Format the technique selection user prompt, listing the techniques not used recently."""
         # Get available techniques by support level for the prompt
         high_support_techniques = self._get_available_techniques("high")
         low_support_techniques = self._get_available_techniques("low")
@@ -399,30 +458,92 @@ class ScaffoldingSelector:
             high_support_info=high_support_info,
             low_support_info=low_support_info
         )
+        return user_prompt
+    
+    def _select_technique_fast(self, child_input, prompt, context_before, context_after,
+                               target_vocab=None, vocab_role=None) -> Optional[Dict[str, Any]]:
+        """Select a technique with the local pre-classifier if the answer is clear-cut.
         
-        # Make the API call to get technique recommendation
+        Returns:
+            Dictionary with selected technique details, or None to escalate to the LLM
+        """
+        previous_technique = self.previously_used[-1] if self.previously_used else None
+        decision = self.pre_classifier.classify(
+            child_input, target_vocab, previous_technique, self._last_robot_turn(prompt)
+        )
+        with self._fast_path_lock:
+            if decision is None:
+                self.fast_path_counts["escalated"] += 1
+                return None
+            self.fast_path_counts["resolved"] += 1
+            self.fast_path_rules[decision["rule"]] = self.fast_path_rules.get(decision["rule"], 0) + 1
+        print(f"DEBUG: Fast path resolved '{child_input}' with rule '{decision['rule']}'")
+        
+        preferred = decision["technique"]
+        if preferred and preferred in self._get_available_techniques(decision["support_level"]):
+            self._update_previously_used(preferred)
+            technique_details = self.SCAFFOLDING_TECHNIQUES[preferred].copy()
+            technique_details["example"] = random.choice(self.SCAFFOLDING_TECHNIQUES[preferred]["examples"])
+            result = {
+                "name": preferred,
+                "details": technique_details,
+                "support_level": decision["support_level"],
+                "complexity_score": decision["complexity_score"]
+            }
+        else:
+            result = self._select_technique_randomly(decision["support_level"], decision["complexity_score"])
+        
+        # Compare a sample of local decisions with the LLM in the background
+        if self.use_llm and random.random() < self.pre_classifier.config["shadow_rate"]:
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._shadow_check, result, child_input, prompt, context_before, context_after,
+                      target_vocab, vocab_role),
+                daemon=True
+            ).start()
+        
+        return result
+    
+    def _shadow_check(self, fast_result, child_input, prompt, context_before, context_after,
+                      target_vocab, vocab_role) -> None:
+        """Record whether the LLM agrees with a fast-path decision."""
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=150,
-                temperature=0.2
-            )
-            
-            # Parse the JSON response
-            response_text = response.choices[0].message.content.strip()
-            selection_result = self._parse_llm_response(response_text, child_input)
-            
-            return selection_result
-            
+            llm_result = self._select_technique_llm(child_input, prompt, context_before, context_after,
+                                                    target_vocab, vocab_role, update_history=False)
         except Exception as e:
-            # Report error instead of using fallback
-            print(f"ERROR in LLM API call: {e}")
-            print("Failed to select a scaffolding technique using the LLM.")
-            raise
+            print(f"DEBUG: Fast path shadow check failed: {e}")
+            return
+        with self._fast_path_lock:
+            self.fast_path_counts["shadow_checks"] += 1
+            if llm_result["support_level"] == fast_result["support_level"]:
+                self.fast_path_counts["support_agreements"] += 1
+            if llm_result["name"] == fast_result["name"]:
+                self.fast_path_counts["technique_agreements"] += 1
+    
+    @staticmethod
+    def _last_robot_turn(prompt: str) -> Optional[str]:
+        """Return the robot's most recent response from a prompt's conversation history."""
+        if not prompt or "Previous conversation:" not in prompt:
+            return None
+        robot_lines = [line[len("Robot: "):] for line in prompt.split("Previous conversation:")[-1].splitlines()
+                       if line.startswith("Robot: ")]
+        return robot_lines[-1] if robot_lines else None
+    
+    def get_fast_path_stats(self) -> Dict[str, Any]:
+        """Return fast-path resolution counts and its agreement rate with the LLM.
+        
+        Returns:
+            Dictionary with counts, per-rule counts and agreement rates (None before any shadow check)
+        """
+        with self._fast_path_lock:
+            stats = dict(self.fast_path_counts)
+            stats["rules"] = dict(self.fast_path_rules)
+        total = stats["resolved"] + stats["escalated"]
+        stats["resolved_rate"] = stats["resolved"] / total if total else 0.0
+        checks = stats["shadow_checks"]
+        stats["support_agreement_rate"] = stats["support_agreements"] / checks if checks else None
+        stats["technique_agreement_rate"] = stats["technique_agreements"] / checks if checks else None
+        return stats
     
     def _select_transition_technique(self) -> Dict[str, Any]:
         """Select the transition technique to close an interaction.
@@ -448,12 +569,14 @@ class ScaffoldingSelector:
             "complexity_score": 8
         }
     
-    def _parse_llm_response(self, response_text: str, child_input: str) -> Dict[str, Any]:
+    def _parse_llm_response(self, response_text: str, child_input: str,
+                            update_history: bool = True) -> Dict[str, Any]:
         """Parse the LLM response and extract technique selection.
         
         Args:
             response_text: The raw text response from the LLM
             child_input: The child's input (used for error reporting)
+            update_history: Whether to record the technique in previously_used
             
         Returns:
             Dictionary with selected technique details
@@ -490,7 +613,8 @@ class ScaffoldingSelector:
                 raise ValueError(f"Invalid technique name: {selected_technique_name}")
             
             # Update previously used techniques
-            self._update_previously_used(selected_technique_name)
+            if update_history:
+                self._update_previously_used(selected_technique_name)
             
             # Get a random example from the selected technique
             technique_examples = self.SCAFFOLDING_TECHNIQUES[selected_technique_name]["examples"]
@@ -653,18 +777,26 @@ class ScaffoldingSelector:
         Returns:
             Dict containing score, support_level, and rationale
         """
-        prompt = self._load_text_file("prompts/retelling_user_prompt.txt").format(
+        local = self._local_ending_score("story_retelling", response, context)
+        if local is not None and local["final"]:
+            return local
+        prompt = self._prompt_text("retelling_user_prompt.txt").format(
                     context=context, response=response)
+        model = self._model_for("evaluation", "story_retelling")
+        start = time.perf_counter()
         try:
-            llm = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system",
-                     "content": self._load_text_file("prompts/retelling_system_prompt.txt")},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=150)
+            with llm_call_site("evaluate_retelling"):
+                llm = self.client.chat_completion(
+                    model=model,
+                    messages=[
+                        {"role": "system",
+                         "content": self._prompt_text("retelling_system_prompt.txt")},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.1,
+                    max_tokens=150,
+                    cacheable=True)
+            self._record_latency(model, start)
 
             # pull the JSON safely
             text = llm.choices[0].message.content.strip()
@@ -675,9 +807,13 @@ class ScaffoldingSelector:
             if js["score"]<=3: js["support_level"]="high"
             elif js["score"]<=6: js["support_level"]="medium"
             else: js["support_level"]="low"
+            self._compare_ending_scores(local, js)
             return js
         except Exception as e:
+            self._record_latency(model, start, e)
             print("LLM retelling evaluation failed:", e)
+            if local is not None:
+                return local
             return {"score":5, "support_level":"medium",
                     "rationale":["fallback"]*5}
 
@@ -692,18 +828,24 @@ class ScaffoldingSelector:
         Returns:
             Dict containing score, support_level, and rationale
         """
-        prompt = (self._load_text_file(
-                    "prompts/altending_user_prompt.txt")
+        local = self._local_ending_score("alternative_ending", response, context)
+        if local is not None and local["final"]:
+            return local
+        prompt = (self._prompt_text("altending_user_prompt.txt")
                   .format(context=context, response=response))
+        model = self._model_for("evaluation", "alternative_ending")
+        start = time.perf_counter()
         try:
-            out = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                   {"role":"system",
-                    "content": self._load_text_file(
-                               "prompts/altending_system_prompt.txt")},
-                   {"role":"user", "content": prompt}],
-                temperature=0.1, max_tokens=150)
+            with llm_call_site("evaluate_alt_ending"):
+                out = self.client.chat_completion(
+                    model=model,
+                    messages=[
+                       {"role":"system",
+                        "content": self._prompt_text("altending_system_prompt.txt")},
+                       {"role":"user", "content": prompt}],
+                    temperature=0.1, max_tokens=150,
+                    cacheable=True)
+            self._record_latency(model, start)
 
             # Extract JSON with better error handling
             response_text = out.choices[0].message.content.strip()
@@ -711,6 +853,8 @@ class ScaffoldingSelector:
             
             if not json_match:
                 print("Warning: Could not find JSON in LLM response:", response_text)
+                if local is not None:
+                    return local
                 return {
                     "score": 5,
                     "support_level": "medium",
@@ -730,11 +874,15 @@ class ScaffoldingSelector:
             else:
                 js["support_level"] = "low"
                 
+            self._compare_ending_scores(local, js)
             return js
             
         except Exception as e:
+            self._record_latency(model, start, e)
             print(f"Alt-ending LLM eval failed: {str(e)}")
             print(f"Response text: {response_text if 'response_text' in locals() else 'No response'}")
+            if local is not None:
+                return local
             return {
                 "score": 5,
                 "support_level": "medium",
@@ -0,0 +1,86 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+from channels import BlockingChannelBridge
+from interaction_handler import StoryInteractionHandler
+from llm_client import LLMClient, get_shared_client
+
+
+class SessionEngine:
+    """Run many children's story sessions concurrently on one event loop.
+
+    Every session is a coroutine with its own async channel (see channels.py).
+    The handler's story sections, depth logic and ending logic run unchanged in
+    a worker thread, and each exchange with the child is scheduled on the event
+    loop through the session's channel. A child who is still typing therefore
+    only holds an idle worker thread, never the loop or the other sessions, and
+    all sessions share one pooled LLM client.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, llm_client: Optional[LLMClient] = None,
+                 max_concurrent_sessions: int = 256, **handler_options):
+        """
+        Args:
+            api_key: OpenAI API key (optional if set in environment)
+            llm_client: Shared LLMClient (defaults to the process-wide client for api_key)
+            max_concurrent_sessions: Sessions allowed to run at once; later ones wait for a slot
+            **handler_options: Default StoryInteractionHandler options for every session
+                               (max_interaction_depth, response_length, stream_responses, ...)
+        """
+        self.api_key = api_key
+        self.llm_client = llm_client or get_shared_client(api_key)
+        self.max_concurrent_sessions = max_concurrent_sessions
+        self.handler_options = handler_options
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent_sessions,
+                                           thread_name_prefix="story-session")
+        self._session_slots = asyncio.Semaphore(max_concurrent_sessions)
+
+    async def run_session(self, story_file_path: str, channel, **handler_options) -> StoryInteractionHandler:
+        """Run the pre-story interaction and the full story for one child.
+
+        Args:
+            story_file_path: Path to the story file
+            channel: Async channel with say, say_partial and ask coroutines
+            **handler_options: Per-session overrides of the engine's handler options
+
+        Returns:
+            The finished StoryInteractionHandler (story_log, turn_latencies, ...)
+        """
+        loop = asyncio.get_running_loop()
+        options = dict(self.handler_options, **handler_options)
+        bridge = BlockingChannelBridge(channel, loop)
+
+        def run():
+            handler = StoryInteractionHandler(
+                story_file_path, self.api_key,
+                llm_client=self.llm_client, channel=bridge, auto_start=False, **options
+            )
+            try:
+                handler.pre_story_interaction()
+                handler.process_story()
+            finally:
+                # The handler's worker threads and log files do not outlive the session
+                handler.close()
+            return handler
+
+        async with self._session_slots:
+            return await loop.run_in_executor(self.executor, run)
+
+    async def run_sessions(self, sessions: Iterable[Tuple[str, object]]) -> List[object]:
+        """Run several sessions concurrently.
+
+        Args:
+            sessions: Iterable of (story_file_path, channel) pairs
+
+        Returns:
+            One finished handler per session, or the exception the session ended with
+        """
+        return await asyncio.gather(
+            *(self.run_session(story_file_path, channel) for story_file_path, channel in sessions),
+            return_exceptions=True
+        )
+
+    def shutdown(self) -> None:
+        """Release the worker threads once all sessions have finished."""
+        self.executor.shutdown(wait=True)
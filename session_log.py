@@ -0,0 +1,195 @@
+import gzip
+import io
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+from tracing import current_trace
+
+# "Ella: ...", "Child: ...", "Child (Follow-up 2): ...", "Robot:\n..."
+_SPEAKER = re.compile(r"^(Ella|Child|Robot)(?: \(Follow-up \d+\))?:\s*", re.DOTALL)
+
+
+class SessionLogWriter:
+    """Append-only file sink for session log entries.
+
+    Entries are written as they happen through a buffered file, flushed and
+    fsync'ed at most every `fsync_interval` seconds and when the writer is
+    closed, so a crash loses at most the last few seconds of the transcript.
+    The "text" format writes the same lines as save_interaction_log; "jsonl"
+    writes one JSON object per entry. Paths ending in .gz are gzip-compressed
+    (each sync ends a deflate block, so the file stays readable up to the last
+    sync).
+    """
+
+    FORMATS = ("text", "jsonl")
+
+    def __init__(self, path: str, format: Optional[str] = None, compress: Optional[bool] = None,
+                 fsync_interval: float = 5.0, buffer_size: int = 64 * 1024, append: bool = False):
+        """
+        Args:
+            path: File to write
+            format: "text" or "jsonl" (defaults to "jsonl" for .jsonl / .jsonl.gz paths, "text" otherwise)
+            compress: Whether to gzip the file (defaults to whether the path ends in .gz)
+            fsync_interval: Maximum seconds between flushes to disk
+            buffer_size: Size of the write buffer in bytes
+            append: Whether to append to an existing file instead of replacing it
+        """
+        compress = path.endswith(".gz") if compress is None else compress
+        if format is None:
+            format = "jsonl" if path[:-3 if path.endswith(".gz") else None].endswith(".jsonl") else "text"
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown session log format '{format}'. Expected one of {self.FORMATS}.")
+        self.path = path
+        self.format = format
+        self.fsync_interval = fsync_interval
+        self._raw = open(path, "ab" if append else "wb", buffering=buffer_size)
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="ab" if append else "wb") if compress else None
+        self._file = io.TextIOWrapper(self._gzip or self._raw, encoding="utf-8")
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+        self.entries_written = 0
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        """Append one entry (needs a "line" field for the text format)."""
+        if self.format == "text":
+            line = entry["line"].strip()
+            if not line:
+                return
+        else:
+            line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self.entries_written += 1
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        if self._gzip is not None:
+            self._gzip.flush()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._last_sync = time.monotonic()
+
+    def flush(self) -> None:
+        """Write everything buffered so far to disk."""
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            # Closing the text wrapper closes the gzip stream, which does not close the raw file
+            self._file.close()
+            self._raw.close()
+
+    def __enter__(self) -> "SessionLogWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SessionLog:
+    """The session's story log: the logged lines in memory plus structured entries for the sinks.
+
+    `append(line, **fields)` keeps the line (iterating the log yields lines, as
+    with the plain list it replaces) and sends each sink an entry with typed
+    fields: sequence number, time, session id, kind ("utterance", "strategy",
+    "routing", ...), speaker and text for utterances, the interaction and depth
+    from the current trace context, and any fields passed by the caller
+    (technique, support_level, score, vocab, ...). With `memory_limit` only the
+    most recent lines are kept in memory; the sinks have the full transcript.
+    """
+
+    def __init__(self, sinks: Optional[List[SessionLogWriter]] = None, session_id: Optional[str] = None,
+                 memory_limit: Optional[int] = None):
+        """
+        Args:
+            sinks: Writers that receive every entry as it is logged
+            session_id: Session id recorded in every entry
+            memory_limit: Optional number of most recent lines kept in memory
+        """
+        self.sinks = list(sinks or [])
+        self.session_id = session_id
+        self._lines = deque(maxlen=memory_limit)
+        self._seq = 0
+
+    def append(self, line: str, kind: str = "utterance", **fields: Any) -> None:
+        """Log one line.
+
+        Args:
+            line: The line as it appears in the text log (e.g. "Ella: Hello!")
+            kind: Kind of entry ("utterance", "strategy", "routing", ...)
+            fields: Structured fields for the JSONL entry
+        """
+        self._lines.append(line)
+        self._seq += 1
+        if not self.sinks:
+            return
+        entry = {"seq": self._seq, "time": round(time.time(), 3), "session_id": self.session_id, "kind": kind}
+        match = _SPEAKER.match(line)
+        if match or kind == "utterance":
+            entry["speaker"] = match.group(1) if match else None
+            entry["text"] = line[match.end():] if match else line
+        _, trace_fields = current_trace()
+        for name in ("interaction", "depth"):
+            if name in trace_fields:
+                entry[name] = trace_fields[name]
+        entry.update(fields)
+        entry["line"] = line
+        for sink in self.sinks:
+            sink.write(entry)
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self) -> None:
+        """Flush and close every sink."""
+        for sink in self.sinks:
+            sink.close()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._lines)
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def __contains__(self, line: object) -> bool:
+        return line in self._lines
+
+    def __getitem__(self, index: int) -> str:
+        return self._lines[index]
+
+
+def _read_text(path: str) -> str:
+    """Read a session log, decompressing every gzip member and tolerating a file cut off by a crash."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not path.endswith(".gz"):
+        return data.decode("utf-8", errors="replace")
+    chunks = []
+    while data:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks.append(decompressor.decompress(data))
+        data = decompressor.unused_data
+    return b"".join(chunks).decode("utf-8", errors="replace")
+
+
+def load_entries(path: str) -> List[Dict[str, Any]]:
+    """Read the entries of a JSONL session log (gzipped if the path ends in .gz).
+
+    A last line without its newline (the process stopped mid-write) is skipped.
+    """
+    lines = _read_text(path).split("\n")[:-1]
+    return [json.loads(line) for line in lines if line.strip()]
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Precompute the story facts the ending phase needs and cache them next to the story.
+
+The ending evaluators and responses used to receive the whole story on every
+turn. Story assets hold the same facts in a compact form: the characters, the
+setting, the key events in order, a recap of the target words with the
+sentence each appears in, and seeds for alternative endings. They are
+extracted once per story, either locally (first sentences, names and vocab
+sentences; no LLM) or by gpt-4o-mini, and written to <story>.assets.json
+together with the story's hash, so every later session loads them from disk.
+
+Usage: python story_assets.py story.txt [story2.txt ...] [--llm] [--check]
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from story_compiler import ARTIFACT_SUFFIX, content_hash, load_compiled_story
+from story_sections import DISPLAY_TAG_PATTERN, StorySection, parse_story_sections
+from tracing import llm_call_site
+
+ASSETS_FORMAT = "story-assets"
+# Bump when the assets change; cached assets of another version are rebuilt
+ASSETS_VERSION = 1
+ASSETS_SUFFIX = ".assets.json"
+MAX_EVENTS = 8
+MAX_CHARACTERS = 6
+MAX_SENTENCE_WORDS = 25
+
+EXTRACTION_SYSTEM_PROMPT = """You extract facts from a children's story for a storytelling robot.
+Reply with JSON only, in this form:
+{"characters": ["..."], "setting": "...", "key_events": ["..."], "alternative_ending_seeds": ["..."]}
+- characters: the story's characters (names, or short descriptions like "the butterfly")
+- setting: where the story happens, in a few words
+- key_events: at most 8 short sentences, in story order, covering the whole story including its ending
+- alternative_ending_seeds: 3 short "What if ...?" ideas a child could build a different ending from"""
+
+# Capitalized words that start sentences rather than name characters
+_NOT_NAMES = {"The", "A", "An", "And", "But", "So", "Then", "When", "One", "Once", "He", "She", "They", "It",
+              "His", "Her", "Their", "Its", "I", "We", "You", "What", "Why", "How", "Where", "This", "That",
+              "There", "Suddenly", "Finally", "After", "Before", "Soon", "Now", "Every", "Oh", "Yes", "No"}
+_SENTENCE = re.compile(r"[^.!?]*[.!?]")
+
+_cache: Dict[str, Tuple[str, "StoryAssets"]] = {}
+_cache_lock = threading.Lock()
+
+
+class StoryAssets:
+    """Compact facts about one story, shared by every session that tells it.
+
+    Attributes:
+        characters: Character names or descriptions
+        setting: Where the story happens (None if unknown)
+        key_events: Short sentences in story order
+        vocab_recap: One {"word", "role", "sentence"} dict per target word
+        alternative_ending_seeds: "What if ...?" ideas for alternative endings
+        method: "local" or "llm:<model>"
+    """
+
+    __slots__ = ("characters", "setting", "key_events", "vocab_recap", "alternative_ending_seeds", "method",
+                 "content_hash")
+
+    FIELDS = ("characters", "setting", "key_events", "vocab_recap", "alternative_ending_seeds", "method")
+
+    def __init__(self, characters: List[str], setting: Optional[str], key_events: List[str],
+                 vocab_recap: List[Dict[str, Optional[str]]], alternative_ending_seeds: List[str],
+                 method: str = "local", content_hash: Optional[str] = None):
+        self.characters = characters
+        self.setting = setting
+        self.key_events = key_events
+        self.vocab_recap = vocab_recap
+        self.alternative_ending_seeds = alternative_ending_seeds
+        self.method = method
+        self.content_hash = content_hash
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def as_context(self) -> str:
+        """The facts as story context for the ending evaluators and responses."""
+        lines = ["Story facts (the whole story, summarized):"]
+        if self.characters:
+            lines.append(f"Characters: {', '.join(self.characters)}")
+        if self.setting:
+            lines.append(f"Setting: {self.setting}")
+        lines.append("Key events, in order:")
+        lines.extend(f"{i}. {event}" for i, event in enumerate(self.key_events, 1))
+        if self.vocab_recap:
+            lines.append("Target words: " + "; ".join(
+                f"{item['word']}" + (f" (\"{item['sentence']}\")" if item.get("sentence") else "")
+                for item in self.vocab_recap))
+        return "\n".join(lines)
+
+    def instructions(self, ending_type: str) -> str:
+        """Extra special instructions for an ending type, based on the facts."""
+        if ending_type == "story_retelling":
+            return ("- Use the key events in the story facts to see which parts the child has retold; "
+                    "ask about the next event they left out")
+        if ending_type == "alternative_ending" and self.alternative_ending_seeds:
+            return ("- If the child needs help, offer two of these ideas as a choice (never as the answer): "
+                    + " | ".join(self.alternative_ending_seeds))
+        if ending_type == "response_summary_closure" and self.vocab_recap:
+            return "- The target words to ask about are: " + ", ".join(item["word"] for item in self.vocab_recap)
+        return ""
+
+
+def assets_path_for(story_path: str) -> str:
+    """Path of a story's assets: next to the story (or its compiled artifact), ending in .assets.json."""
+    base = story_path[:-len(ARTIFACT_SUFFIX)] if story_path.endswith(ARTIFACT_SUFFIX) else os.path.splitext(story_path)[0]
+    return base + ASSETS_SUFFIX
+
+
+def _sentences(text: str) -> List[str]:
+    """The sentences of a text without its interaction tags, whitespace collapsed."""
+    text = DISPLAY_TAG_PATTERN.sub(" ", text)
+    sentences = [" ".join(sentence.split()) for sentence in _SENTENCE.findall(text)]
+    rest = " ".join(_SENTENCE.sub(" ", text).split())
+    return [sentence for sentence in sentences + [rest] if sentence]
+
+
+def _clip(sentence: str) -> str:
+    words = sentence.split()
+    return sentence if len(words) <= MAX_SENTENCE_WORDS else " ".join(words[:MAX_SENTENCE_WORDS]) + " ..."
+
+
+def _key_events(sections: List[StorySection]) -> List[str]:
+    """The first sentence of each section, evenly thinned out to MAX_EVENTS (keeping the first and last)."""
+    events = []
+    for section in sections:
+        sentences = _sentences(section.display_text)
+        if sentences:
+            events.append(_clip(sentences[0]))
+    if len(events) <= MAX_EVENTS:
+        return events
+    step = (len(events) - 1) / (MAX_EVENTS - 1)
+    return [events[round(i * step)] for i in range(MAX_EVENTS)]
+
+
+def _characters(story: str) -> List[str]:
+    """Capitalized words that never appear in lowercase, in order of appearance."""
+    text = DISPLAY_TAG_PATTERN.sub(" ", story)
+    lowercase = set(re.findall(r"\b[a-z]+\b", text))
+    names = []
+    for word in re.findall(r"\b[A-Z][a-z]+\b", text):
+        if word not in _NOT_NAMES and word.lower() not in lowercase and word not in names:
+            names.append(word)
+    return names[:MAX_CHARACTERS]
+
+
+def _vocab_recap(story: str, sections: List[StorySection]) -> List[Dict[str, Optional[str]]]:
+    recap = []
+    sentences = _sentences(story)
+    for section in sections:
+        if section.vocab and section.vocab not in [item["word"] for item in recap]:
+            pattern = re.compile(rf"\b{re.escape(section.vocab)}\b", re.IGNORECASE)
+            sentence = next((s for s in sentences if pattern.search(s)), None)
+            recap.append({"word": section.vocab, "role": section.vocab_role,
+                          "sentence": _clip(sentence) if sentence else None})
+    return recap
+
+
+def extract_local(story: str, sections: Optional[List[StorySection]] = None) -> StoryAssets:
+    """Extract the assets without an LLM."""
+    sections = sections if sections is not None else parse_story_sections(story)
+    characters = _characters(story)
+    hero = characters[0] if characters else "the hero"
+    seeds = [f"What if {hero} made a different choice at the end?",
+             "What if the story ended in a different place?",
+             f"What if a new friend came to help {hero}?"]
+    return StoryAssets(characters, None, _key_events(sections), _vocab_recap(story, sections), seeds,
+                       method="local", content_hash=content_hash(story))
+
+
+def _string_list(value: Any, limit: int) -> Optional[List[str]]:
+    if not isinstance(value, list):
+        return None
+    items = [" ".join(str(item).split()) for item in value if isinstance(item, (str, int, float)) and str(item).strip()]
+    return items[:limit] or None
+
+
+def extract_with_llm(story: str, llm_client, model: str = "gpt-4o-mini",
+                     sections: Optional[List[StorySection]] = None) -> StoryAssets:
+    """Extract the assets with one LLM call; fields the model leaves out or gets wrong are extracted locally."""
+    local = extract_local(story, sections)
+    try:
+        with llm_call_site("extract_story_assets"):
+            response = llm_client.chat_completion(
+                model=model,
+                messages=[
+                    {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+                    {"role": "user", "content": DISPLAY_TAG_PATTERN.sub("", story).strip()}
+                ],
+                temperature=0,
+                max_tokens=500,
+                cacheable=True
+            )
+        text = response.choices[0].message.content
+        facts = json.loads(re.search(r"\{.*\}", text, re.DOTALL).group(0))
+    except Exception as e:
+        print(f"Warning: Could not extract story assets with the LLM ({e}). Using the local extraction.")
+        return local
+    setting = facts.get("setting")
+    return StoryAssets(
+        _string_list(facts.get("characters"), MAX_CHARACTERS) or local.characters,
+        " ".join(setting.split()) if isinstance(setting, str) and setting.strip() else None,
+        _string_list(facts.get("key_events"), MAX_EVENTS) or local.key_events,
+        local.vocab_recap,
+        _string_list(facts.get("alternative_ending_seeds"), 3) or local.alternative_ending_seeds,
+        method=f"llm:{model}",
+        content_hash=local.content_hash
+    )
+
+
+def _read_assets(path: str, story_hash: str) -> Optional[StoryAssets]:
+    """Cached assets for a story with this hash, or None if missing, stale or of another version."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        if (data.get("format") != ASSETS_FORMAT or data.get("version") != ASSETS_VERSION
+                or data.get("content_hash") != story_hash):
+            return None
+        return StoryAssets(*(data[name] for name in StoryAssets.FIELDS), content_hash=story_hash)
+    except (OSError, KeyError, TypeError, ValueError):
+        return None
+
+
+def write_assets(assets: StoryAssets, path: str) -> None:
+    data = {"format": ASSETS_FORMAT, "version": ASSETS_VERSION, "content_hash": assets.content_hash,
+            **assets.to_dict()}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def load_story_assets(story_path: str, story: str, llm_client=None,
+                      sections: Optional[List[StorySection]] = None) -> StoryAssets:
+    """Load a story's cached assets, extracting and caching them first if needed.
+
+    Assets are reused while the story's hash matches; local assets are
+    replaced when an LLM client is given. If the cache cannot be written
+    (e.g. a read-only story directory), the assets are still returned.
+
+    Args:
+        story_path: Path of the story file or compiled artifact
+        story: The story text
+        llm_client: Optional LLMClient; without one the assets are extracted locally
+        sections: The story's sections, if already parsed
+    """
+    path = assets_path_for(story_path)
+    story_hash = content_hash(story)
+    key = os.path.abspath(path)
+    with _cache_lock:
+        cached = _cache.get(key)
+    assets = cached[1] if cached is not None and cached[0] == story_hash else _read_assets(path, story_hash)
+    if assets is not None and (llm_client is None or assets.method != "local"):
+        with _cache_lock:
+            _cache[key] = (story_hash, assets)
+        return assets
+
+    if llm_client is not None:
+        assets = extract_with_llm(story, llm_client, sections=sections)
+    else:
+        assets = extract_local(story, sections)
+    try:
+        write_assets(assets, path)
+    except OSError as e:
+        print(f"Warning: Could not cache story assets at {path} ({e}).")
+    with _cache_lock:
+        _cache[key] = (story_hash, assets)
+    return assets
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    use_llm = "--llm" in args
+    check = "--check" in args
+    story_paths = [arg for arg in args if not arg.startswith("--")]
+
+    llm_client = None
+    if use_llm and not check:
+        from llm_client import get_shared_client
+        llm_client = get_shared_client(os.getenv("OPENAI_API_KEY"))
+
+    missing = 0
+    for story_path in story_paths:
+        if story_path.endswith(ARTIFACT_SUFFIX):
+            story = load_compiled_story(story_path).story
+        else:
+            with open(story_path, "r") as f:
+                story = f.read()
+        path = assets_path_for(story_path)
+        if check:
+            up_to_date = _read_assets(path, content_hash(story)) is not None
+            missing += not up_to_date
+            print(f"{path}: {'up to date' if up_to_date else 'missing or stale'}")
+        else:
+            assets = load_story_assets(story_path, story, llm_client)
+            print(f"{story_path} -> {path} ({assets.method}, {len(assets.key_events)} key events)")
+    if missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Compile story files into artifacts that handlers load without parsing.
+
+An artifact (<story>.story.json) holds the story text, each section's offsets,
+prompt, vocab, role and special tag, the display text with the interaction tags
+already removed, the story's three target words and a SHA-256 hash of the
+source. Handlers given an artifact path load it through a per-process cache, so
+every session after the first reuses the same read-only sections.
+
+Usage: python story_compiler.py story.txt [story2.txt ...] [--out-dir DIR] [--check]
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from story_sections import StorySection, parse_story_sections
+
+ARTIFACT_FORMAT = "story-artifact"
+# Bump when the artifact layout changes; artifacts of another version are rejected
+ARTIFACT_VERSION = 1
+ARTIFACT_SUFFIX = ".story.json"
+
+_cache: Dict[str, Tuple[Tuple[int, int], "CompiledStory"]] = {}
+_cache_lock = threading.Lock()
+
+
+class StoryArtifactError(ValueError):
+    """Raised when an artifact is malformed or of an unsupported version."""
+
+
+def content_hash(story: str) -> str:
+    return hashlib.sha256(story.encode("utf-8")).hexdigest()
+
+
+def artifact_path_for(story_path: str, out_dir: Optional[str] = None) -> str:
+    """Default artifact path: the story's path with .story.json instead of its extension."""
+    base = os.path.splitext(os.path.basename(story_path))[0] + ARTIFACT_SUFFIX
+    return os.path.join(out_dir or os.path.dirname(story_path), base)
+
+
+def story_vocabs(sections: Iterable[StorySection]) -> Optional[List[str]]:
+    """The first three distinct vocabulary words of the story, or None if it has fewer."""
+    words = []
+    for section in sections:
+        if section.vocab and section.vocab not in words:
+            words.append(section.vocab)
+        if len(words) == 3:
+            return words
+    return None
+
+
+class CompiledStory:
+    """A story's text, sections and target words as loaded from an artifact.
+
+    The sections carry their display text, so showing them needs no regex.
+    A CompiledStory is shared by every handler that loads the same artifact
+    and must not be modified.
+    """
+
+    __slots__ = ("story", "sections", "vocabs", "content_hash", "source")
+
+    def __init__(self, story: str, sections: List[StorySection], vocabs: Optional[List[str]],
+                 content_hash: str, source: Optional[str] = None):
+        self.story = story
+        self.sections = sections
+        self.vocabs = vocabs
+        self.content_hash = content_hash
+        self.source = source
+
+
+def compile_story(story: str, source: Optional[str] = None,
+                  special_tags: Iterable[str] = ("summary",)) -> Dict[str, Any]:
+    """Parse a story and return its artifact as a JSON-serializable dict.
+
+    Args:
+        story: The full story text
+        source: Path of the story file, relative to the artifact
+        special_tags: Vocab values that are structural indicators rather than vocabulary words
+    """
+    sections = parse_story_sections(story, special_tags)
+    return {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "content_hash": content_hash(story),
+        "source": source,
+        "vocabs": story_vocabs(sections),
+        "story": story,
+        "sections": [
+            [section.text_start, section.interaction_start, section.interaction_end, section.prompt,
+             section.vocab, section.vocab_role, section.special_tag, section.display_text]
+            for section in sections
+        ]
+    }
+
+
+def compile_file(story_path: str, artifact_path: Optional[str] = None) -> str:
+    """Compile a story file and write its artifact.
+
+    Returns:
+        Path of the written artifact
+    """
+    artifact_path = artifact_path or artifact_path_for(story_path)
+    with open(story_path, "r") as f:
+        story = f.read()
+    source = os.path.relpath(story_path, os.path.dirname(os.path.abspath(artifact_path)))
+    artifact = compile_story(story, source)
+    tmp_path = f"{artifact_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(artifact, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, artifact_path)
+    return artifact_path
+
+
+def _from_artifact(artifact: Dict[str, Any]) -> CompiledStory:
+    if artifact.get("format") != ARTIFACT_FORMAT or artifact.get("version") != ARTIFACT_VERSION:
+        raise StoryArtifactError(f"Unsupported story artifact {artifact.get('format')!r} "
+                                 f"version {artifact.get('version')!r} (expected version {ARTIFACT_VERSION})")
+    story = artifact["story"]
+    if content_hash(story) != artifact["content_hash"]:
+        raise StoryArtifactError("Story artifact content does not match its hash")
+    sections = [StorySection(story, start, interaction_start, interaction_end, prompt=prompt, vocab=vocab,
+                             vocab_role=vocab_role, special_tag=special_tag, display=display)
+                for start, interaction_start, interaction_end, prompt, vocab, vocab_role, special_tag, display
+                in artifact["sections"]]
+    return CompiledStory(story, sections, artifact["vocabs"], artifact["content_hash"], artifact.get("source"))
+
+
+def is_stale(artifact_path: str, compiled: CompiledStory) -> bool:
+    """Whether the artifact's source file exists and no longer matches the artifact's hash."""
+    if not compiled.source:
+        return False
+    source_path = os.path.join(os.path.dirname(os.path.abspath(artifact_path)), compiled.source)
+    try:
+        with open(source_path, "r") as f:
+            return content_hash(f.read()) != compiled.content_hash
+    except OSError:
+        return False
+
+
+def load_compiled_story(artifact_path: str) -> CompiledStory:
+    """Load an artifact, reusing the process-wide copy while the file is unchanged.
+
+    Raises:
+        OSError: If the artifact cannot be read
+        StoryArtifactError: If the artifact is malformed or of another version
+    """
+    stat = os.stat(artifact_path)
+    key = os.path.abspath(artifact_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with open(artifact_path, "r") as f:
+        try:
+            compiled = _from_artifact(json.load(f))
+        except StoryArtifactError:
+            raise
+        except (KeyError, TypeError, ValueError) as e:
+            raise StoryArtifactError(f"Malformed story artifact {artifact_path}: {e}") from e
+    if is_stale(artifact_path, compiled):
+        print(f"Warning: {artifact_path} is older than its source story {compiled.source}. "
+              f"Run story_compiler.py again to update it.")
+    with _cache_lock:
+        _cache[key] = (signature, compiled)
+    return compiled
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    out_dir = None
+    check = False
+    story_paths = []
+    i = 0
+    while i < len(args):
+        if args[i] == "--out-dir" and i + 1 < len(args):
+            out_dir = args[i + 1]
+            i += 2
+        elif args[i] == "--check":
+            check = True
+            i += 1
+        else:
+            story_paths.append(args[i])
+            i += 1
+
+    stale = 0
+    for story_path in story_paths:
+        artifact_path = artifact_path_for(story_path, out_dir)
+        if check:
+            try:
+                up_to_date = not is_stale(artifact_path, load_compiled_story(artifact_path))
+            except (OSError, StoryArtifactError):
+                up_to_date = False
+            stale += not up_to_date
+            print(f"{artifact_path}: {'up to date' if up_to_date else 'missing or stale'}")
+        else:
+            compile_file(story_path, artifact_path)
+            print(f"Compiled {story_path} -> {artifact_path}")
+    if stale:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
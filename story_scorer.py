@@ -0,0 +1,307 @@
+"""
+Story-aware local scoring of the child's retellings and alternative endings.
+
+The keywords come from each story instead of being written into the rubric:
+the characters, the key events and the interaction vocabulary (see
+story_assets.py). Every distinct word of a story gets a bit position, so a
+keyword group is an integer bitmask and matching an answer against all the
+groups is one AND and popcount per group. The raw score follows the same five
+criteria (0-2 points each) as the LLM rubric for that ending type and can be
+calibrated against LLM scores with a linear fit per ending type (see
+`rescore_transcripts.py --calibrate`).
+"""
+
+import json
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from rule_classifier import STOPWORDS
+from story_assets import StoryAssets, extract_local
+from story_compiler import content_hash
+from story_sections import DISPLAY_TAG_PATTERN, StorySection
+
+SCORED_ENDINGS = ("story_retelling", "alternative_ending")
+CONNECTIVES = {"because", "then", "so", "and", "but", "after", "when", "until", "finally"}
+DETAIL_WORDS = {"beautiful", "colorful", "wonderful", "fun", "big", "little", "happy", "sad", "scared", "surprised"}
+MEMORY_PHRASES = ("don't remember", "don't know", "forgot", "can't remember", "no idea")
+# Scores within this distance of a support-level boundary (3.5 and 6.5) go to the LLM in first-pass mode
+DEFAULT_MARGIN = 1.0
+MIN_CALIBRATION_SAMPLES = 5
+
+_WORD = re.compile(r"[a-z']+")
+
+# Keyword indexes shared by every session in the process, keyed by story hash and assets method
+_keywords_cache: Dict[Tuple[str, str], "StoryKeywords"] = {}
+_keywords_lock = threading.Lock()
+
+
+def stem(word: str) -> str:
+    """A crude stem, so that "boxes", "flying" and "played" match "box", "fly" and "play"."""
+    word = word.strip("'")
+    if word.endswith("'s"):
+        word = word[:-2]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("ches", "shes", "xes", "sses")):
+        return word[:-2]
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokens(text: str) -> List[str]:
+    """Stemmed content words of `text`, in order."""
+    return [stem(word) for word in _WORD.findall(text.lower()) if word not in STOPWORDS and len(word) > 1]
+
+
+def _bit_count(mask: int) -> int:
+    """Number of set bits in a non-negative mask (int.bit_count needs Python 3.10)."""
+    return bin(mask).count("1")
+
+
+def support_level(score: float) -> str:
+    """The support level of a 0-10 score, with the LLM rubric's boundaries."""
+    if score <= 3:
+        return "high"
+    if score <= 6:
+        return "medium"
+    return "low"
+
+
+class StoryKeywords:
+    """Keyword groups of one story as bitmasks over the story's word index.
+
+    Attributes:
+        index: Bit position of every stemmed word of the story
+        characters: One mask per character (any of its words counts as a mention)
+        events: One mask per key event, in story order
+        vocab: One mask per target word
+        story_words: Mask of every word of the story
+    """
+
+    def __init__(self, story: str, assets: StoryAssets, sections: Optional[Sequence[StorySection]] = None):
+        """
+        Args:
+            story: The story text, with its interaction tags
+            assets: The story's facts (characters, key events, target words)
+            sections: Parsed sections, used for the target words when given
+        """
+        self.index: Dict[str, int] = {}
+        for token in tokens(DISPLAY_TAG_PATTERN.sub(" ", story)):
+            self._bit(token)
+        self.story_words = (1 << len(self.index)) - 1
+        self.characters = [mask for mask in (self.mask(name) for name in assets.characters) if mask]
+        character_words = 0
+        for mask in self.characters:
+            character_words |= mask
+        # An event is recognised by what happens in it, not by who is in it
+        self.events = [mask for mask in (self.mask(event) & ~character_words for event in assets.key_events) if mask]
+        words = [item["word"] for item in assets.vocab_recap]
+        if sections is not None:
+            words += [section.vocab for section in sections if section.vocab]
+        self.vocab = list(dict.fromkeys(mask for mask in (self.mask(word) for word in words) if mask))
+
+    def _bit(self, token: str) -> int:
+        if token not in self.index:
+            self.index[token] = len(self.index)
+        return 1 << self.index[token]
+
+    def mask(self, text: str) -> int:
+        """Bitmask of the words of `text` that occur in the story (other words are ignored)."""
+        mask = 0
+        for token in tokens(text):
+            position = self.index.get(token)
+            if position is not None:
+                mask |= 1 << position
+        return mask
+
+    @classmethod
+    def for_story(cls, story: str, sections: Optional[Sequence[StorySection]] = None,
+                  assets: Optional[StoryAssets] = None) -> "StoryKeywords":
+        """Keywords of a story, built once per process (local assets are extracted when none are given)."""
+        key = (content_hash(story), assets.method if assets is not None else "local")
+        with _keywords_lock:
+            cached = _keywords_cache.get(key)
+        if cached is not None:
+            return cached
+        keywords = cls(story, assets if assets is not None else extract_local(story, sections), sections)
+        with _keywords_lock:
+            _keywords_cache[key] = keywords
+        return keywords
+
+
+class StoryScorer:
+    """Scores ending answers locally against one story's keywords.
+
+    Retellings are scored on sequence accuracy, key events, characters, plot
+    coherence and vocabulary; alternative endings on creativity, connection to
+    the story, logical consistency, characters and theme. Each criterion is
+    worth 0-2 points. The raw score is mapped through the ending type's
+    calibration (score = slope * raw + intercept) and clamped to 0-10.
+    """
+
+    def __init__(self, keywords: StoryKeywords, calibration: Optional[Dict[str, Dict[str, float]]] = None,
+                 margin: float = DEFAULT_MARGIN):
+        """
+        Args:
+            keywords: The story's keyword groups
+            calibration: Optional {ending_type: {"slope", "intercept", ...}} from fit_calibration
+            margin: Distance from a support-level boundary below which a score is not confident
+        """
+        self.keywords = keywords
+        self.calibration = calibration or {}
+        self.margin = margin
+
+    def score(self, ending_type: str, response: str) -> Dict[str, Any]:
+        """Score an answer to a retelling or alternative-ending question.
+
+        Returns:
+            Dict with score, support_level, rationale (points per criterion), raw_score,
+            confident (whether the score is far enough from a support-level boundary) and method
+        """
+        if ending_type not in SCORED_ENDINGS:
+            raise ValueError(f"Cannot score '{ending_type}' locally. Expected one of {SCORED_ENDINGS}.")
+        text = response.strip().lower() if response else ""
+        if len(text) < 5:
+            rationale = {"too_short": 0}
+        elif any(phrase in text for phrase in MEMORY_PHRASES):
+            rationale = {"memory_difficulty": 1}
+        elif ending_type == "story_retelling":
+            rationale = self._retelling_rationale(text)
+        else:
+            rationale = self._alt_ending_rationale(text)
+        raw = sum(rationale.values())
+        fit = self.calibration.get(ending_type, {})
+        score = max(0.0, min(10.0, fit.get("slope", 1.0) * raw + fit.get("intercept", 0.0)))
+        distance = min(abs(score - 3.5), abs(score - 6.5))
+        return {
+            "score": round(score),
+            "support_level": support_level(round(score)),
+            "rationale": rationale,
+            "raw_score": raw,
+            "confident": distance >= self.margin,
+            "method": "local"
+        }
+
+    def _answer(self, text: str) -> Tuple[List[str], int, Dict[int, int]]:
+        """Tokens, bitmask and the first token position of each matched story word."""
+        answer_tokens = tokens(text)
+        mask, first = 0, {}
+        for position, token in enumerate(answer_tokens):
+            bit = self.keywords.index.get(token)
+            if bit is not None:
+                mask |= 1 << bit
+                first.setdefault(bit, position)
+        return answer_tokens, mask, first
+
+    @staticmethod
+    def _points(hits: int, full: int) -> int:
+        """2 points for at least `full` hits, 1 for at least one."""
+        return 2 if hits >= max(full, 1) else 1 if hits else 0
+
+    @staticmethod
+    def _coherence(text: str) -> int:
+        words = text.split()
+        if len(words) > 10 and CONNECTIVES & set(_WORD.findall(text)):
+            return 2
+        return 1 if len(words) > 5 else 0
+
+    def _retelling_rationale(self, text: str) -> Dict[str, int]:
+        keywords = self.keywords
+        _, mask, first = self._answer(text)
+        characters = sum(1 for group in keywords.characters if mask & group)
+        # An event is recalled when the answer has two of its words (or its only word)
+        recalled = []
+        for event in keywords.events:
+            hits = mask & event
+            if _bit_count(hits) >= min(2, _bit_count(event)):
+                recalled.append(min(first[bit] for bit in range(hits.bit_length()) if hits >> bit & 1))
+        in_order = sum(1 for earlier, later in zip(recalled, recalled[1:]) if earlier <= later)
+        vocab = sum(1 for group in keywords.vocab if mask & group)
+        return {
+            "sequence_accuracy": 2 if recalled and in_order == len(recalled) - 1 and len(recalled) >= 2
+                                 else 1 if recalled else 0,
+            "key_event_recall": self._points(len(recalled), min(3, len(keywords.events))),
+            "character_involvement": self._points(characters, min(2, len(keywords.characters))),
+            "plot_coherence": self._coherence(text),
+            "vocabulary_usage": self._points(vocab, min(2, len(keywords.vocab)))
+        }
+
+    def _alt_ending_rationale(self, text: str) -> Dict[str, int]:
+        keywords = self.keywords
+        answer_tokens, mask, _ = self._answer(text)
+        characters = sum(1 for group in keywords.characters if mask & group)
+        character_words = 0
+        for group in keywords.characters:
+            character_words |= group
+        new_words = {token for token in answer_tokens if token not in keywords.index}
+        story_elements = _bit_count(mask & keywords.story_words & ~character_words)
+        theme = sum(1 for group in keywords.events + keywords.vocab if mask & group)
+        return {
+            "creativity": self._points(len(new_words | (DETAIL_WORDS & set(answer_tokens))), 3),
+            "story_connection": self._points(story_elements, 3),
+            "logical_consistency": self._coherence(text),
+            "character_consistency": self._points(characters, min(2, len(keywords.characters))),
+            "theme_alignment": self._points(theme, 2)
+        }
+
+
+def fit_calibration(pairs: Iterable[Tuple[str, float, float]],
+                    min_samples: int = MIN_CALIBRATION_SAMPLES) -> Dict[str, Dict[str, float]]:
+    """Fit llm_score ~ slope * raw_score + intercept per ending type by least squares.
+
+    Args:
+        pairs: (ending_type, raw local score, LLM score) triples
+        min_samples: Ending types with fewer pairs keep the identity mapping
+
+    Returns:
+        {ending_type: {"slope", "intercept", "samples", "mean_abs_error", "support_agreement"}}, where the
+        error and agreement compare the calibrated local scores with the LLM scores
+    """
+    by_type: Dict[str, List[Tuple[float, float]]] = {}
+    for ending_type, raw, llm_score in pairs:
+        by_type.setdefault(ending_type, []).append((float(raw), float(llm_score)))
+    calibration = {}
+    for ending_type, samples in by_type.items():
+        slope, intercept = 1.0, 0.0
+        if len(samples) >= min_samples:
+            mean_raw = sum(raw for raw, _ in samples) / len(samples)
+            mean_llm = sum(llm for _, llm in samples) / len(samples)
+            spread = sum((raw - mean_raw) ** 2 for raw, _ in samples)
+            if spread:
+                slope = sum((raw - mean_raw) * (llm - mean_llm) for raw, llm in samples) / spread
+            intercept = mean_llm - slope * mean_raw
+        scores = [max(0.0, min(10.0, slope * raw + intercept)) for raw, _ in samples]
+        calibration[ending_type] = {
+            "slope": round(slope, 4),
+            "intercept": round(intercept, 4),
+            "samples": len(samples),
+            "mean_abs_error": sum(abs(score - llm) for score, (_, llm) in zip(scores, samples)) / len(samples),
+            "support_agreement": sum(support_level(round(score)) == support_level(llm)
+                                     for score, (_, llm) in zip(scores, samples)) / len(samples)
+        }
+    return calibration
+
+
+def save_calibration(calibration: Dict[str, Dict[str, float]], path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(calibration, f, indent=2)
+
+
+def load_calibration(path: str) -> Dict[str, Dict[str, float]]:
+    """Read a calibration written by save_calibration.
+
+    Raises:
+        ValueError: If the file is not a calibration
+    """
+    with open(path, "r") as f:
+        calibration = json.load(f)
+    if not isinstance(calibration, dict) or not all(
+            isinstance(fit, dict) and {"slope", "intercept"} <= set(fit) for fit in calibration.values()):
+        raise ValueError(f"{path} is not a story scorer calibration")
+    return calibration
@@ -0,0 +1,143 @@
+import re
+from typing import Iterable, List, Optional
+
+# Pattern used to extract vocab attribute and role from interaction tags
+INTERACTION_PATTERN = re.compile(
+    r'<interaction(?: vocab="([^"]*)")?(?:\s+role="([^"]*)")?>([^<]*)</interaction>', re.DOTALL
+)
+# Interaction tags removed from a section's text before it is shown to the child
+DISPLAY_TAG_PATTERN = re.compile(r'<interaction.*?</interaction>')
+
+
+class StorySection:
+    """A story section stored as offsets into the shared story text.
+
+    Sections used to be dicts holding full copies of the story before and after
+    each interaction, so memory grew quadratically with the number of
+    interactions. A StorySection keeps only offsets and builds `text`,
+    `context_before` and `context_after` on demand. It still supports
+    dict-style access (section['prompt']) for existing callers.
+    """
+
+    __slots__ = ("story", "text_start", "interaction_start", "interaction_end",
+                 "prompt", "vocab", "vocab_role", "special_tag", "display")
+
+    KEYS = ("text", "prompt", "vocab", "vocab_role", "special_tag", "context_before", "context_after")
+
+    def __init__(self, story: str, text_start: int, interaction_start: Optional[int] = None,
+                 interaction_end: Optional[int] = None, prompt: Optional[str] = None,
+                 vocab: Optional[str] = None, vocab_role: Optional[str] = None,
+                 special_tag: Optional[str] = None, display: Optional[str] = None):
+        """
+        Args:
+            story: The full story text, shared by all sections of the story
+            text_start: Offset where this section's narrative text begins
+            interaction_start: Offset of the section's interaction tag (None for trailing text)
+            interaction_end: Offset just past the section's interaction tag
+            prompt: The interaction prompt
+            vocab: Target vocabulary word
+            vocab_role: Vocabulary role (new, easy, review)
+            special_tag: Structural tag such as "summary"
+            display: Precomputed display_text (set by compiled story artifacts)
+        """
+        self.story = story
+        self.text_start = text_start
+        self.interaction_start = interaction_start
+        self.interaction_end = interaction_end
+        self.prompt = prompt
+        self.vocab = vocab
+        self.vocab_role = vocab_role
+        self.special_tag = special_tag
+        self.display = display
+
+    @property
+    def text(self) -> str:
+        """Narrative text of the section followed by a bare interaction tag for the prompt."""
+        if self.interaction_start is None:
+            return self.story[self.text_start:]
+        return self.story[self.text_start:self.interaction_start] + f"<interaction>{self.prompt}</interaction>"
+
+    @property
+    def display_text(self) -> str:
+        """The section's text with its interaction tags removed, as shown to the child."""
+        if self.display is None:
+            return DISPLAY_TAG_PATTERN.sub('', self.text)
+        return self.display
+
+    @property
+    def context_before(self) -> str:
+        """Full story content before the interaction."""
+        if self.interaction_start is None:
+            return ""
+        return self.story[:self.interaction_start]
+
+    @property
+    def context_after(self) -> str:
+        """Full story content after the interaction."""
+        if self.interaction_end is None:
+            return ""
+        return self.story[self.interaction_end:]
+
+    def __getitem__(self, key: str):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.KEYS
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.KEYS else default
+
+    def keys(self):
+        return self.KEYS
+
+    def to_dict(self) -> dict:
+        """Materialize the section as a plain dict (builds the context strings)."""
+        return {key: getattr(self, key) for key in self.KEYS}
+
+    def __repr__(self) -> str:
+        return (f"StorySection(text_start={self.text_start}, interaction_start={self.interaction_start}, "
+                f"prompt={self.prompt!r}, vocab={self.vocab!r}, special_tag={self.special_tag!r})")
+
+
+def parse_story_sections(story_content: str, special_tags: Iterable[str] = ("summary",)) -> List[StorySection]:
+    """Split a story into sections at its interaction tags.
+
+    The format for interactions is: <interaction vocab="target_word" role="vocab_role">Prompt text</interaction>
+    Special tags like "summary" are reported as special_tag instead of vocab.
+
+    Args:
+        story_content: The full story text
+        special_tags: Vocab values that are structural indicators rather than vocabulary words
+
+    Returns:
+        List of StorySection objects sharing story_content
+    """
+    sections = []
+    last_end = 0
+    for match in INTERACTION_PATTERN.finditer(story_content):
+        vocab = match.group(1) if match.group(1) else None
+        vocab_role = match.group(2) if match.group(2) else None
+
+        # Determine if this is a special tag or a vocabulary target
+        special_tag = None
+        target_vocab = None
+        if vocab in special_tags:
+            special_tag = vocab
+        elif vocab:
+            target_vocab = vocab
+
+        sections.append(StorySection(
+            story_content, last_end, match.start(), match.end(),
+            prompt=match.group(3).strip(),
+            vocab=target_vocab,
+            vocab_role=vocab_role,
+            special_tag=special_tag
+        ))
+        last_end = match.end()
+
+    if not sections or last_end < len(story_content):
+        sections.append(StorySection(story_content, last_end))
+
+    return sections
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for the story context window: verbatim paragraphs next to the interaction,
+summaries of the rest, no story content past the interaction in the context
+before it, and bounded prompts in a session on a long story.
+"""
+
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from channels import ScriptedChannel
+from context_window import LATER_IN_STORY, STORY_SO_FAR, SectionSummarizer, StoryContextWindow
+from fake_llm import FakeLLMClient
+from story_sections import parse_story_sections
+from test_fake_llm import STORY, run_offline_session
+
+
+def long_story(parts, tag="part"):
+    """A story whose paragraph i is "Paragraph i starts here. More about <tag> i."."""
+    story = "".join(f"Paragraph {i} starts here. More about {tag} {i}.\n\n"
+                    f"<interaction vocab=\"box\" role=\"new\">What happens in part {i}?</interaction>\n\n"
+                    for i in range(parts))
+    return story + "The end.\n\n<interaction vocab=\"summary\">What was your favorite part?</interaction>\n"
+
+
+def test_short_contexts_are_unchanged():
+    sections = parse_story_sections(STORY)
+    window = StoryContextWindow(sections, keep_paragraphs=3)
+    for i, section in enumerate(sections):
+        if section.prompt:
+            assert window.context_before(i) == section.context_before
+            assert window.context_after(i) == section.context_after
+
+
+def test_long_contexts_keep_recent_paragraphs_and_summarize_the_rest():
+    sections = parse_story_sections(long_story(40))
+    window = StoryContextWindow(sections, keep_paragraphs=3, summary_words=60)
+
+    before = window.context_before(20)
+    assert before.startswith(STORY_SO_FAR + "Paragraph 0 starts here.")
+    assert "More about part 18." in before and "More about part 20." in before
+    assert "More about part 17." not in before and "Paragraph 17 starts here." in before
+    # Nothing from the interaction onwards
+    assert "Paragraph 21" not in before and "part 20?" not in before
+
+    after = window.context_after(5)
+    assert after.startswith("\n\nParagraph 6 starts here.") and "More about part 8." in after
+    assert f"{LATER_IN_STORY}Paragraph 9 starts here." in after and "More about part 9." not in after
+    assert "Paragraph 5 " not in after
+
+    # The size no longer grows with the position in the story
+    sizes = [len(window.context_before(i)) for i in (20, 30, 39)]
+    assert max(sizes) - min(sizes) < 40 and max(sizes) < len(sections[10].context_before)
+
+
+def test_llm_summaries_are_precomputed_once():
+    sections = parse_story_sections(long_story(6, tag="llm"))
+    client = FakeLLMClient()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        window = StoryContextWindow(sections, SectionSummarizer(client), keep_paragraphs=1, executor=executor)
+        before = window.context_before(5)
+    assert "Paragraph 0 starts here." in before and "More about llm 0." not in before
+    summary_calls = len(client.calls)
+    # Every section but the blank one after the last interaction
+    assert summary_calls == len(sections) - 1
+    # A second window (another session) reuses the process-wide summaries
+    StoryContextWindow(sections, SectionSummarizer(client), keep_paragraphs=1).context_before(5)
+    assert len(client.calls) == summary_calls
+
+
+def test_session_prompts_stay_bounded_on_a_long_story():
+    def largest_prompt(context_paragraphs):
+        random.seed(3)
+        client = FakeLLMClient()
+        run_offline_session(long_story(30, tag="session"), pre_story=False, llm_client=client,
+                            channel=ScriptedChannel(["yes"], max_default_answers=500),
+                            context_paragraphs=context_paragraphs)
+        last_turns = [call for call in client.calls
+                      if "What happens in part 29?" in call["messages"][-1]["content"]]
+        assert last_turns
+        assert all(("More about session 3." in call["messages"][-1]["content"]) == (context_paragraphs is None)
+                   for call in last_turns)
+        return max(sum(len(message["content"]) for message in call["messages"]) for call in client.calls)
+
+    assert largest_prompt(2) < largest_prompt(None)
+
+
+if __name__ == "__main__":
+    test_short_contexts_are_unchanged()
+    test_long_contexts_keep_recent_paragraphs_and_summarize_the_rest()
+    test_llm_summaries_are_precomputed_once()
+    test_session_prompts_stay_bounded_on_a_long_story()
+    print("All context window tests passed.")
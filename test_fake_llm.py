@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end tests: a full scripted session against FakeLLMClient, and
+replaying a recording made with RecordingLLMClient.
+"""
+
+import json
+import os
+import tempfile
+
+from channels import ScriptedChannel
+from fake_llm import FakeLLMClient, RecordingLLMClient
+from interaction_handler import StoryInteractionHandler
+from scaffolding_selector import ScaffoldingSelector
+
+STORY = """Once upon a time Sparky found a box in the garden.
+
+<interaction vocab="box" role="new">What do you think is in the box?</interaction>
+
+Sparky opened the box and a butterfly flew out.
+
+<interaction vocab="summary">What was your favorite part?</interaction>
+"""
+ANSWERS = ["a rainbow", "a", "box", "box", "garden", "garden", "flower", "flower",
+           "I think it is a butterfly", "the butterfly"]
+
+
+def run_offline_session(story=STORY, answers=ANSWERS, story_path=None, pre_story=True, ending_type=None,
+                        **handler_kwargs):
+    """Run a whole scripted session offline and return the closed handler.
+
+    Args:
+        story: Story text, written to a temporary file (ignored if story_path is given)
+        answers: The child's answers, used unless a channel is passed in handler_kwargs
+        story_path: Existing story or compiled story file to run instead of `story`
+        pre_story: Whether the pre-story interaction runs before the story
+        ending_type: Optional ending type to use instead of a random one
+        **handler_kwargs: Further StoryInteractionHandler arguments; llm_client
+            defaults to a new FakeLLMClient
+    """
+    handler_kwargs.setdefault("llm_client", FakeLLMClient())
+    handler_kwargs.setdefault("channel", ScriptedChannel(answers))
+    with tempfile.TemporaryDirectory() as tmp:
+        if story_path is None:
+            story_path = os.path.join(tmp, "story.txt")
+            with open(story_path, "w") as f:
+                f.write(story)
+        with StoryInteractionHandler(story_path, auto_start=False, **handler_kwargs) as handler:
+            handler.chosen_ending_type = ending_type
+            if pre_story:
+                handler.pre_story_interaction()
+            handler.process_story()
+    return handler
+
+
+def test_scripted_session_runs_offline():
+    client = FakeLLMClient()
+    channel = ScriptedChannel(ANSWERS)
+    handler = run_offline_session(llm_client=client, channel=channel)
+
+    assert any("Sparky opened the box" in line for line in channel.transcript)
+    assert channel.asks >= len(ANSWERS)
+    assert client.stats()["calls"] > 0 and client.stats()["recorded"] == 0
+    assert any(line.startswith("Child: I think it is a butterfly") for line in handler.story_log)
+
+
+def test_scripted_channel_runs_out():
+    channel = ScriptedChannel(["yes"], default="no", max_default_answers=1)
+    assert channel.ask("Caro: ") == "yes"
+    assert channel.ask("Caro: ") == "no"
+    try:
+        channel.ask("Caro: ")
+        assert False, "expected EOFError"
+    except EOFError:
+        pass
+
+
+def test_recording_replays_offline():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "calls.jsonl")
+        recorder = RecordingLLMClient(FakeLLMClient(default_completion="Recorded line?"), path)
+        messages = [{"role": "system", "content": "Be kind."}, {"role": "user", "content": "Hi"}]
+        recorder.chat_completion("gpt-4o-mini", messages, max_tokens=60)
+        with open(path) as f:
+            assert json.loads(f.readline())["content"] == "Recorded line?"
+
+        replay = FakeLLMClient(recording=path)
+        response = replay.chat_completion("gpt-4o-mini", messages, max_tokens=60)
+        assert response.choices[0].message.content == "Recorded line?"
+        # Different parameters are a different request and fall back to the templates
+        replay.chat_completion("gpt-4o-mini", messages, max_tokens=100)
+        assert replay.stats()["recorded"] == 1 and replay.stats()["templated"] == 1
+
+
+def test_templated_technique_selection_is_valid():
+    selector = ScaffoldingSelector(llm_client=FakeLLMClient())
+    result = selector.select_technique("yes", "Do you like the box?", "story", "more story")
+    assert result["support_level"] == "high"
+    result = selector.select_technique("I think the box has a tiny butterfly inside it",
+                                       "What is in the box?", "story", "more story")
+    assert result["support_level"] == "low"
+
+
+if __name__ == "__main__":
+    test_scripted_session_runs_offline()
+    test_scripted_channel_runs_out()
+    test_recording_replays_offline()
+    test_templated_technique_selection_is_valid()
+    print("All fake LLM tests passed.")
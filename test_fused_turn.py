@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the single-call technique selection and response mode.
+"""
+
+import json
+
+from fake_llm import DEFAULT_COMPLETION, FakeLLMClient
+from fused_turn import FusedTurnGenerator
+from response_generator import ResponseGenerator
+from scaffolding_selector import ScaffoldingSelector
+from test_fake_llm import run_offline_session
+from tracing import Tracer
+
+FUSED_MARKER = "write the robot's reply to the child in the same step"
+
+
+def make_fused(client):
+    selector = ScaffoldingSelector(llm_client=client)
+    generator = ResponseGenerator(llm_client=client)
+    return FusedTurnGenerator(selector, generator)
+
+
+def run_session(client):
+    return run_offline_session(llm_client=client, fused_turns=True)
+
+
+def test_valid_output_selects_and_responds():
+    fused = make_fused(FakeLLMClient())
+    result = fused.select_and_respond("Sparky opened the box because he was curious",
+                                      "Why did Sparky open the box?", "Sparky found a box.")
+    technique, response = result
+    assert technique["name"] in fused.selector.SCAFFOLDING_TECHNIQUES and technique["support_level"] == "low"
+    assert response == DEFAULT_COMPLETION
+    assert fused.selector.previously_used == [technique["name"]]
+    assert fused.generator.usage_log and fused.stats()["fused"] == 1
+    # The prompt keeps the selection rules but replaces the selection-only output format
+    assert "PART 2: TECHNIQUE SELECTION" in fused.system_prompt
+    assert fused.system_prompt.count("Your response must be in this exact JSON format") == 1
+
+
+def test_invalid_output_is_rejected():
+    outputs = [
+        "Sure! Here is my answer.",
+        json.dumps({"complexity_score": 7, "support_level": "low", "selected_technique": "transition",
+                    "response": "Let's keep reading!"}),
+        json.dumps({"complexity_score": 2, "support_level": "high", "selected_technique": "eliciting",
+                    "response": " "}),
+    ]
+    for output in outputs:
+        fused = make_fused(FakeLLMClient(routes=[(FUSED_MARKER, output)]))
+        assert fused.select_and_respond("a rocket", "What did you see?", "") is None
+        assert fused.stats()["invalid"] == 1 and fused.selector.previously_used == []
+
+
+def test_session_uses_one_call_per_turn():
+    tracer = Tracer()
+    handler = run_session(FakeLLMClient(tracer=tracer))
+    sites = [span["call_site"] for span in tracer.spans]
+    assert "select_and_respond" in sites and "select_technique" not in sites
+    assert handler.fused_turn.stats()["fused"] == sites.count("select_and_respond")
+    assert any(line.startswith("[Scaffolding Strategy:") for line in handler.story_log)
+
+
+def test_fused_turns_do_not_see_the_upcoming_story():
+    client = FakeLLMClient()
+    handler = run_session(client)
+    fused_calls = [call for call in client.calls if FUSED_MARKER in call["messages"][0]["content"]]
+    assert fused_calls and handler.fused_turn.stats()["fused"] > 0
+    for call in fused_calls:
+        user_prompt = call["messages"][-1]["content"]
+        # The first interaction's context after is the end of the story
+        assert "a butterfly flew out" not in user_prompt
+        assert "Not shown in this step" in user_prompt
+
+
+def test_session_falls_back_to_two_calls():
+    tracer = Tracer()
+    client = FakeLLMClient(tracer=tracer, routes=[(FUSED_MARKER, '{"selected_technique": "dancing"}')])
+    handler = run_session(client)
+    sites = [span["call_site"] for span in tracer.spans]
+    assert sites.count("select_technique") == sites.count("select_and_respond") > 0
+    assert handler.fused_turn.stats()["fused"] == 0
+
+
+if __name__ == "__main__":
+    test_valid_output_selects_and_responds()
+    test_invalid_output_is_rejected()
+    test_session_uses_one_call_per_turn()
+    test_fused_turns_do_not_see_the_upcoming_story()
+    test_session_falls_back_to_two_calls()
+    print("All fused turn tests passed.")
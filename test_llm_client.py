@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the process-wide LLMClient shared by a session's components.
+"""
+
+import os
+import tempfile
+
+import llm_client
+from fake_llm import FakeLLMClient
+from interaction_handler import StoryInteractionHandler
+from llm_client import LLMClient, get_shared_client
+from test_fake_llm import STORY
+
+
+def close_shared_clients(*api_keys):
+    for api_key in api_keys:
+        client = llm_client._shared_clients.pop(api_key, None)
+        if client is not None:
+            client.close()
+
+
+def test_shared_client_per_api_key():
+    saved_key = os.environ.get("OPENAI_API_KEY")
+    try:
+        first = get_shared_client("key-a")
+        assert isinstance(first, LLMClient) and get_shared_client("key-a") is first
+        assert get_shared_client("key-b") is not first
+        # Without an explicit key, the key from the environment picks the client
+        os.environ["OPENAI_API_KEY"] = "key-a"
+        assert get_shared_client() is first
+
+        del os.environ["OPENAI_API_KEY"]
+        try:
+            get_shared_client()
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+    finally:
+        if saved_key is None:
+            os.environ.pop("OPENAI_API_KEY", None)
+        else:
+            os.environ["OPENAI_API_KEY"] = saved_key
+        close_shared_clients("key-a", "key-b")
+
+
+def test_handler_selector_and_generator_share_one_client():
+    with tempfile.TemporaryDirectory() as tmp:
+        story_path = os.path.join(tmp, "story.txt")
+        with open(story_path, "w") as f:
+            f.write(STORY)
+        try:
+            with StoryInteractionHandler(story_path, api_key="key-shared", auto_start=False) as handler:
+                assert handler.client is get_shared_client("key-shared")
+                assert handler.scaffolding_selector.client is handler.client
+                assert handler.response_generator.client is handler.client
+            # A second session with the same key reuses the same pool
+            with StoryInteractionHandler(story_path, api_key="key-shared", auto_start=False) as second:
+                assert second.client is handler.client
+        finally:
+            close_shared_clients("key-shared")
+
+        # A client passed in is used everywhere instead of the shared one
+        client = FakeLLMClient()
+        with StoryInteractionHandler(story_path, llm_client=client, auto_start=False) as handler:
+            assert handler.client is client
+            assert handler.scaffolding_selector.client is client and handler.response_generator.client is client
+        assert "key-shared" not in llm_client._shared_clients
+
+
+if __name__ == "__main__":
+    test_shared_client_per_api_key()
+    test_handler_selector_and_generator_share_one_client()
+    print("All LLM client tests passed.")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the load simulator: synthetic child answers and a small multi-process
+run against the stub LLM server.
+"""
+
+import os
+import random
+import tempfile
+
+from load_simulator import (ENDING_TYPES, StubLLMServer, SyntheticChildChannel, format_report, parse_mix,
+                            run_load)
+from llm_client import LLMClient
+from test_fake_llm import STORY
+
+
+def test_synthetic_child_answers():
+    assert parse_mix("rich=1,short=3") == {"rich": 0.25, "short": 0.75}
+    try:
+        parse_mix("chatty=1")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+    channel = SyntheticChildChannel("rich", {"rich": 1.0}, random.Random(0), answers=["hello"])
+    assert channel.ask("Child: ") == "hello"
+    channel.say("Can you say 'sunflower'?")
+    assert channel.ask("Child: ") == "sunflower"
+    channel.say("1. Outer space adventures (planets, rockets)")
+    channel.say("2. Ocean life (fish, whales)")
+    assert channel.ask("Child: ") in ("adventures", "life")
+    assert channel.ask("\nPlease choose a theme (1-2): ") in ("1", "2")
+    assert len(channel.turn_latencies) == 3
+
+
+def test_small_load_run_covers_every_ending():
+    with tempfile.TemporaryDirectory() as tmp, StubLLMServer(latency=0.0) as server:
+        story_path = os.path.join(tmp, "story.txt")
+        with open(story_path, "w") as f:
+            f.write(STORY)
+        client = LLMClient(api_key="stub", base_url=server.base_url)
+        reply = client.chat_completion("gpt-4o-mini", [{"role": "system", "content": "Reply."},
+                                                       {"role": "user", "content": "Hi"}])
+        assert reply.choices[0].message.content
+        client.close()
+        report = run_load(story_path, sessions=3, processes=2, base_url=server.base_url,
+                          mix={"rich": 0.5, "disengaged": 0.5})
+
+    assert report["sessions"] == 3 and not report["failed_sessions"], report["failed_sessions"]
+    assert report["ending_types"] == {ending: 1 for ending in ENDING_TYPES}
+    assert report["calls_per_session"] > 0 and report["turn_latency"]["p99"] >= report["turn_latency"]["p50"]
+    assert "sessions/s" in format_report(report)
+
+
+if __name__ == "__main__":
+    test_synthetic_child_answers()
+    test_small_load_run_covers_every_ending()
+    print("All load simulator tests passed.")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-session model router and its use by the handler.
+"""
+
+
+from fake_llm import FakeLLMClient
+from model_router import ModelRouter
+from resilience import ResiliencePolicy
+from response_generator import ResponseGenerator
+from scaffolding_selector import ScaffoldingSelector
+from test_fake_llm import STORY, run_offline_session
+
+
+def test_rules_and_defaults():
+    router = ModelRouter(rules=[
+        {"name": "deep_fast", "purpose": "response", "min_depth": 3, "model": "gpt-4o-mini"},
+        {"name": "summary_eval", "purpose": "evaluation", "special_tags": ["summary"], "model": "gpt-4"},
+    ])
+    assert router.route("response", "eliciting", "low", 1).model == "gpt-4"
+    decision = router.route("response", "eliciting", "low", 3)
+    assert decision.model == "gpt-4o-mini" and decision.rule == "deep_fast"
+    assert router.route("evaluation", special_tag="summary").model == "gpt-4"
+    assert router.route("selection").model == "gpt-4o-mini"
+    try:
+        router.route("greeting")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+    default = ModelRouter()
+    assert default.route("response", "transition", depth=3).model == "gpt-4o-mini"
+    assert default.route("response", "co-participating").model == "gpt-4"
+
+
+def test_slow_model_is_downgraded_and_probed():
+    router = ModelRouter(latency_targets={"response": 2.0}, probe_interval=3)
+    router.record_latency("gpt-4", 5.0)
+    models = [router.route("response", "eliciting").model for _ in range(3)]
+    assert models == ["gpt-4o-mini", "gpt-4o-mini", "gpt-4"]
+    # Pinned rules keep the strongest model
+    assert router.route("response", "co-participating").model == "gpt-4"
+    # Fast measurements bring the average back under the target
+    for _ in range(5):
+        router.record_latency("gpt-4", 0.5)
+    assert router.route("response", "eliciting").model == "gpt-4"
+
+
+def test_session_budget():
+    router = ModelRouter(session_budget=3.0)
+    router.record_latency("gpt-4", 2.0)
+    assert router.route("response", "eliciting").model == "gpt-4"
+    router.record_latency("gpt-4", 1.5)
+    decision = router.route("response", "eliciting")
+    assert decision.model == "gpt-4o-mini" and "budget" in decision.reason
+    assert "3.5/3.0" in router.format_stats()
+
+
+def test_timeouts_count_as_latency():
+    router = ModelRouter(latency_targets={"response": 0.05, "evaluation": 0.05})
+    # Every attempt is slower than the 0.1 s deadline and times out
+    client = FakeLLMClient(latency=0.5, resilience=ResiliencePolicy(deadline=0.1, max_attempts=1))
+    generator = ResponseGenerator(llm_client=client, router=router)
+    technique = {"name": "eliciting", "details": {}, "support_level": "medium"}
+    assert generator.generate_response("a toy", "What is in the box?", STORY, "", technique) == \
+        generator.FALLBACK_RESPONSE
+    assert router.rolling_latency["gpt-4"] >= 0.1 and router.spent >= 0.1
+    assert router.route("response", "eliciting").model == "gpt-4o-mini"
+
+    selector = ScaffoldingSelector(llm_client=client, router=router)
+    selector._evaluate_retelling_complexity_llm("Sparky found a box", STORY)
+    assert router.rolling_latency["gpt-4o-mini"] >= 0.1
+
+    # Errors that are not about speed do not count
+    failing = ModelRouter()
+    ResponseGenerator(llm_client=FakeLLMClient(error_rate=1.0), router=failing).generate_response(
+        "a toy", "What is in the box?", STORY, "", technique)
+    assert failing.spent == 0 and not failing.rolling_latency
+
+
+class NoUsageClient(FakeLLMClient):
+    """FakeLLMClient whose streams end without a usage chunk, as some providers' do."""
+
+    def chat_completion_stream(self, model, messages, **params):
+        params.pop("stream_options", None)
+        return super().chat_completion_stream(model, messages, **params)
+
+
+def test_streamed_latency_without_usage():
+    technique = {"name": "eliciting", "details": {}, "support_level": "medium"}
+    router = ModelRouter()
+    generator = ResponseGenerator(llm_client=NoUsageClient(latency=0.05), router=router)
+    stream = generator.generate_response_stream("a toy", "What is in the box?", STORY, "", technique)
+    # Nothing is sent, or recorded, until the stream is read
+    assert not router.rolling_latency
+    assert "".join(stream) and stream.text
+    assert router.rolling_latency["gpt-4"] >= 0.05 and not generator.usage_log
+
+    # A stream that fails on its first chunk counts as a failure, not as a latency
+    failing = ModelRouter()
+    generator = ResponseGenerator(llm_client=FakeLLMClient(error_rate=1.0), router=failing)
+    stream = generator.generate_response_stream("a toy", "What is in the box?", STORY, "", technique)
+    assert list(stream) == [generator.FALLBACK_RESPONSE]
+    assert not failing.rolling_latency
+
+
+def test_handler_routes_responses_and_logs_decisions():
+    handler = run_offline_session(model_routing=True,
+                                  model_routing_config={"default_models": {"response": "gpt-4o-mini"}})
+
+    routing_lines = [line for line in handler.story_log if line.startswith("[Routing]")]
+    routed_models = [line.split(" -> ")[1].split(":")[0] for line in routing_lines]
+    assert routed_models == [entry["model"] for entry in handler.response_generator.usage_log]
+    assert all(model == "gpt-4o-mini" or "co-participating" in line
+               for model, line in zip(routed_models, routing_lines))
+    assert handler.model_router.stats()["spent"] > 0
+
+
+if __name__ == "__main__":
+    test_rules_and_defaults()
+    test_slow_model_is_downgraded_and_probed()
+    test_session_budget()
+    test_timeouts_count_as_latency()
+    test_streamed_latency_without_usage()
+    test_handler_routes_responses_and_logs_decisions()
+    print("All model router tests passed.")
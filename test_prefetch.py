@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for SpeculativePrefetcher: used and wasted counters, and the pre-story
+lines it generates ahead of the child's answers.
+"""
+
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from channels import ScriptedChannel
+from fake_llm import FakeLLMClient
+from interaction_handler import StoryInteractionHandler
+from prefetch import SpeculativePrefetcher
+from test_fake_llm import ANSWERS, STORY
+
+
+def test_used_and_wasted_counters():
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        prefetcher = SpeculativePrefetcher(executor)
+        assert prefetcher.format_stats() == "Prefetch: none"
+        # The single worker is busy with "red", so "blue" and "green" are still queued
+        prefetcher.submit("colour", "red", lambda: release.wait(5) and "RED")
+        prefetcher.submit("colour", "blue", lambda: "BLUE")
+        prefetcher.submit("shape", "square", lambda: "SQUARE")
+        prefetcher.discard("blue")
+        prefetcher.discard("blue")  # already dropped: not counted twice
+        release.set()
+        assert prefetcher.take("red") == "RED"
+        prefetcher.discard_all()
+
+    assert prefetcher.counters == {"colour": {"used": 1, "wasted": 1}, "shape": {"used": 0, "wasted": 1}}
+    assert prefetcher.format_stats() == "Prefetch: colour 1 used/1 wasted, shape 0 used/1 wasted"
+    try:
+        prefetcher.take("red")
+        assert False, "expected KeyError"
+    except KeyError:
+        pass
+
+
+def test_pre_story_lines_are_prefetched():
+    client = FakeLLMClient(latency=0.01)
+    with tempfile.TemporaryDirectory() as tmp:
+        story_path = os.path.join(tmp, "story.txt")
+        with open(story_path, "w") as f:
+            f.write(STORY)
+        with StoryInteractionHandler(story_path, llm_client=client, channel=ScriptedChannel(ANSWERS),
+                                     auto_start=False) as handler:
+            handler.pre_story_interaction()
+
+    # Both theme acknowledgements are prefetched, and the one for the theme not picked is wasted
+    assert handler.prefetcher.counters == {"game_intro": {"used": 1, "wasted": 0},
+                                           "theme_ack": {"used": 1, "wasted": 1}}
+    theme_acks = [call for call in client.calls if "Show excitement about their choice" in call["messages"][-1]["content"]]
+    assert len(theme_acks) == 2 and all(call["thread"] != threading.get_ident() for call in theme_acks)
+
+    # The praise depends on the child's last magic word, so it is generated after that answer, never prefetched
+    last_word = [line for line in handler.story_log if line.startswith("Child: ")][-1][len("Child: "):]
+    praise = [call for call in client.calls if "special, enthusiastic praise" in call["messages"][-1]["content"]]
+    assert len(praise) == 1 and praise[0]["thread"] == threading.get_ident()
+    assert f"referencing their last response: '{last_word}'" in praise[0]["messages"][-1]["content"]
+    assert client.calls.index(praise[0]) == len(client.calls) - 1
+
+
+if __name__ == "__main__":
+    test_used_and_wasted_counters()
+    test_pre_story_lines_are_prefetched()
+    print("All prefetch tests passed.")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for the cache-friendly response prompt layout and the prompt token usage report.
+"""
+
+from fake_llm import FakeLLMClient
+from response_generator import ResponseGenerator
+
+PROMPT = "What is in the box?\nPrevious conversation:\nChild: a toy\nRobot: What kind of toy?"
+STORY = "Once upon a time Sparky found a box in the garden. " * 200
+SPECIAL = "SPECIAL INSTRUCTIONS: Mention the butterfly."
+REASONING = {"name": "reasoning", "support_level": "low", "complexity_score": 7}
+
+
+def test_cache_friendly_layout_orders_stable_parts_first():
+    generator = ResponseGenerator(llm_client=FakeLLMClient(), prompt_layout="cache_friendly")
+    system, user = generator._build_messages("I don't know", PROMPT, STORY, "", REASONING, "box", "new", SPECIAL)
+    assert system["content"] == generator.technique_prompts["reasoning"]
+    content = user["content"]
+    positions = [content.index(part) for part in
+                 [STORY, "Target vocabulary word: box", "Previous conversation:", SPECIAL, "\"I don't know\""]]
+    assert positions == sorted(positions)
+
+
+def test_layouts_differ_only_in_order():
+    args = ("I don't know", PROMPT, STORY, "", REASONING, "box", "new", SPECIAL)
+    standard = ResponseGenerator(llm_client=FakeLLMClient())._build_messages(*args)[1]["content"]
+    friendly = ResponseGenerator(llm_client=FakeLLMClient(), prompt_layout="cache_friendly")._build_messages(*args)[1]["content"]
+    assert sorted(standard.split()) == sorted(friendly.split())
+    try:
+        ResponseGenerator(llm_client=FakeLLMClient(), prompt_layout="sideways")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_usage_reports_cached_tokens():
+    generator = ResponseGenerator(llm_client=FakeLLMClient(prompt_cache=True), prompt_layout="cache_friendly")
+    generator.generate_response("a toy", PROMPT, STORY, "", REASONING, "box", "new")
+    generator.generate_response("a red ball", PROMPT, STORY, "", REASONING, "box", "new")
+    first, second = generator.usage_log
+    assert first["cached_tokens"] == 0 and second["cached_tokens"] > 1024
+    stats = generator.get_usage_stats()
+    assert stats["requests"] == 2 and stats["uncached_tokens"] == stats["prompt_tokens"] - stats["cached_tokens"]
+
+    # Streaming requests report their usage through the final chunk
+    stream = generator.generate_response_stream("a blue car", PROMPT, STORY, "", REASONING, "box", "new")
+    "".join(stream)
+    assert len(generator.usage_log) == 3 and generator.usage_log[-1]["cached_tokens"] > 1024
+
+
+if __name__ == "__main__":
+    test_cache_friendly_layout_orders_stable_parts_first()
+    test_layouts_differ_only_in_order()
+    test_usage_reports_cached_tokens()
+    print("All prompt layout tests passed.")
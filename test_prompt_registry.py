@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the process-wide prompt registry.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from fake_llm import FakeLLMClient
+from prompt_registry import PromptRegistry, get_prompt_registry
+from response_generator import ResponseGenerator
+from scaffolding_selector import ScaffoldingSelector
+
+
+def test_instances_share_one_snapshot():
+    client = FakeLLMClient()
+    first, second = ResponseGenerator(llm_client=client), ResponseGenerator(llm_client=client)
+    assert first.technique_prompts is second.technique_prompts
+    selector = ScaffoldingSelector(llm_client=client)
+    assert selector.SCAFFOLDING_TECHNIQUES is get_prompt_registry().current().scaffolding_techniques
+
+
+def test_technique_prompts_include_guidelines():
+    snapshot = get_prompt_registry().current()
+    with open("prompts/response_reasoning.txt") as f:
+        reasoning = f.read()
+    with open("prompts/response_common_guidelines.txt") as f:
+        guidelines = f.read()
+    assert snapshot.technique_prompts["reasoning"] == f"{reasoning}\n\n{guidelines}"
+
+
+def test_snapshot_is_read_only():
+    techniques = get_prompt_registry().current().scaffolding_techniques
+    try:
+        techniques["reasoning"]["support_level"] = "high"
+        assert False, "expected TypeError"
+    except TypeError:
+        pass
+    # Callers copy a technique before adding their example
+    details = techniques["reasoning"].copy()
+    details["example"] = techniques["reasoning"]["examples"][0]
+    assert "example" not in techniques["reasoning"]
+
+
+def test_hot_reload_picks_up_edits():
+    with tempfile.TemporaryDirectory() as tmp:
+        prompt_dir = os.path.join(tmp, "prompts")
+        shutil.copytree("prompts", prompt_dir)
+        registry = PromptRegistry(prompt_dir, hot_reload=True, check_interval=0)
+        assert registry.current().version == 1
+
+        path = os.path.join(prompt_dir, "response_common_guidelines.txt")
+        with open(path, "w") as f:
+            f.write("Be brief.")
+        later = time.time() + 5
+        os.utime(path, (later, later))
+        snapshot = registry.current()
+        assert snapshot.version == 2
+        assert snapshot.technique_prompts["reasoning"].endswith("\n\nBe brief.")
+
+        # A broken file keeps the previous snapshot
+        with open(os.path.join(prompt_dir, "scaffolding_techniques.json"), "w") as f:
+            f.write("{not json")
+        os.utime(prompt_dir, (later + 5, later + 5))
+        assert registry.current() is snapshot
+
+
+if __name__ == "__main__":
+    test_instances_share_one_snapshot()
+    test_technique_prompts_include_guidelines()
+    test_snapshot_is_read_only()
+    test_hot_reload_picks_up_edits()
+    print("All prompt registry tests passed.")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Equivalence tests: detect_question returns exactly what the previous
+contains_question returned.
+"""
+
+import random
+
+from bench_question_detector import generate_texts, legacy_contains_question
+from question_detector import detect_question
+
+EDGE_CASES = [
+    None, "", "   ", "?", "...?", "Hi. ?", "Why? Why?", "  What is it?  ", "ok?\n",
+    "Tell me about the box.", "Do you like it.", "How wonderful.", "Somehow it worked.",
+    "I shared the cake.", "Let's talk about Sparky!", "It's great! Isn't it?!", "He said \"hi\" to me?",
+    "what.", "Whatever you want.", "I was thinking about the rainbow.", "Ça va? Très bien",
+    "The box is red\nand blue?", "Great job, Caro! What else did you see", "2 cats?", "!?"
+]
+FRAGMENTS = ["what", "how", " you", "can", "tell me", "do you", "share", "think about", "imagine",
+             "?", ".", "!", " ", "\n", "a", "Z", "7", "é", "let's talk about", "whatever", "'"]
+
+
+def test_matches_legacy_on_edge_cases():
+    for text in EDGE_CASES:
+        assert detect_question(text) == legacy_contains_question(text), text
+
+
+def test_matches_legacy_on_generated_responses():
+    for text in generate_texts(500, seed=1):
+        assert detect_question(text) == legacy_contains_question(text), text
+
+
+def test_matches_legacy_on_random_fragments():
+    rng = random.Random(3)
+    for _ in range(5000):
+        text = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 10)))
+        assert detect_question(text) == legacy_contains_question(text), repr(text)
+
+
+if __name__ == "__main__":
+    test_matches_legacy_on_edge_cases()
+    test_matches_legacy_on_generated_responses()
+    test_matches_legacy_on_random_fragments()
+    print("All question detector tests passed.")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for batch re-scoring of saved session logs: rebuilding the answers'
+contexts from text and JSONL logs, deduplication, checkpoint resume and output.
+"""
+
+import csv
+import os
+import random
+import tempfile
+
+from fake_llm import FakeLLMClient
+from rescore_transcripts import load_answers, parse_transcript, read_log, rescore, write_results
+from scaffolding_selector import ScaffoldingSelector
+from session_log import SessionLogWriter
+from story_sections import parse_story_sections
+from test_fake_llm import STORY, run_offline_session
+
+
+def write_session_logs(tmp, name, ending_type):
+    """Run a scripted session and save its text and JSONL logs."""
+    random.seed(1)
+    handler = run_offline_session(ending_type=ending_type,
+                                  log_sinks=[SessionLogWriter(os.path.join(tmp, f"{name}.jsonl"))])
+    handler.save_interaction_log(os.path.join(tmp, f"{name}_interaction_log.txt"))
+    return handler
+
+
+def test_answers_are_rebuilt_from_text_and_jsonl_logs():
+    sections = parse_story_sections(STORY)
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = write_session_logs(tmp, "session", "alternative_ending")
+        lines, _ = read_log(os.path.join(tmp, "session_interaction_log.txt"))
+        from_text = parse_transcript(lines, "text")
+        lines, session_id = read_log(os.path.join(tmp, "session.jsonl"))
+        from_jsonl = parse_transcript(lines, "jsonl", session_id)
+
+    assert session_id == handler.session_id
+    assert [answer["child_input"] for answer in from_text] == [answer["child_input"] for answer in from_jsonl]
+    assert from_text[0]["child_input"] == "I think it is a butterfly" and from_text[0]["depth"] == 1
+    assert from_text[1]["prompt"].startswith("What do you think is in the box?\nPrevious conversation:")
+    for answer in from_text:
+        section = sections[answer["interaction"]]
+        assert answer["context_before"] == section.context_before
+        assert answer["vocab"] == section.vocab and answer["vocab_role"] == section.vocab_role
+        assert answer["evaluator"] == ("alternative_ending" if section.special_tag == "summary" else "selection")
+
+
+def test_rescore_deduplicates_and_resumes_from_the_checkpoint():
+    with tempfile.TemporaryDirectory() as tmp:
+        write_session_logs(tmp, "a", "story_retelling")
+        write_session_logs(tmp, "b", "response_summary_closure")
+        answers = load_answers([tmp])
+        checkpoint = os.path.join(tmp, "out.checkpoint.jsonl")
+
+        failing = FakeLLMClient(error_rate=1.0)
+        counts = rescore(answers, ScaffoldingSelector(llm_client=failing), checkpoint, concurrency=4)
+        failed = counts["failed"]
+        assert failed > 0 and any(answer["error"] for answer in answers)
+
+        client = FakeLLMClient()
+        counts = rescore(answers, ScaffoldingSelector(llm_client=client), checkpoint, concurrency=4)
+        assert counts["failed"] == 0 and counts["distinct"] < counts["answers"]
+        # Only the inputs that failed are scored again, one call each
+        assert counts["scored"] == failed == len(client.calls)
+        assert all(answer["score"] is not None and not answer["error"] for answer in answers)
+        assert {answer["evaluator"] for answer in answers} == {"selection", "story_retelling",
+                                                               "response_summary_closure"}
+
+        # Everything is in the checkpoint now: a second run makes no calls
+        resumed = FakeLLMClient()
+        counts = rescore(load_answers([tmp]), ScaffoldingSelector(llm_client=resumed), checkpoint)
+        assert counts["reused"] == counts["distinct"] and counts["scored"] == 0 and not resumed.calls
+
+        path = write_results(answers, os.path.join(tmp, "rescored.csv"))
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    assert len(rows) == len(answers) and rows[0]["technique"]
+
+
+if __name__ == "__main__":
+    test_answers_are_rebuilt_from_text_and_jsonl_logs()
+    test_rescore_deduplicates_and_resumes_from_the_checkpoint()
+    print("All transcript re-scoring tests passed.")
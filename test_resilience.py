@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for the LLM resilience policy (retries, deadlines, hedging, circuit
+breaker) and for the local fallbacks used when the provider is down.
+"""
+
+import threading
+import time
+
+import httpx
+import openai
+
+from channels import ScriptedChannel
+from fake_llm import FAKE_URL, FakeLLMClient
+from resilience import CircuitBreaker, CircuitOpenError, ResiliencePolicy
+from test_fake_llm import ANSWERS, run_offline_session
+
+
+def connection_error():
+    return openai.APIConnectionError(request=httpx.Request("POST", FAKE_URL))
+
+
+def test_retries_retryable_errors_only():
+    policy = ResiliencePolicy(max_attempts=3, backoff_base=0.001, seed=0)
+    attempts = []
+
+    def flaky(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise connection_error()
+        return "ok"
+
+    assert policy.call(flaky) == "ok"
+    assert len(attempts) == 3 and policy.last_call()["attempts"] == 3
+    # Each attempt gets the time left before the deadline
+    assert attempts[0] <= policy.deadline and attempts[2] < attempts[0]
+
+    def bad_request(timeout):
+        attempts.append(timeout)
+        raise ValueError("not retryable")
+
+    attempts.clear()
+    try:
+        policy.call(bad_request)
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    assert len(attempts) == 1 and policy.stats()["retries"] == 2
+
+
+def test_deadline_bounds_slow_calls():
+    client = FakeLLMClient(latency=1.0, resilience=ResiliencePolicy(deadline=0.1, backoff_base=0.001))
+    start = time.perf_counter()
+    try:
+        client.chat_completion("gpt-4o-mini", [{"role": "user", "content": "Hi"}])
+        assert False, "expected a timeout"
+    except (openai.APITimeoutError, TimeoutError):
+        pass
+    assert time.perf_counter() - start < 0.5
+
+
+def test_hedged_request_returns_the_faster_answer():
+    policy = ResiliencePolicy(hedge_after=0.05)
+    calls = []
+    lock = threading.Lock()
+
+    def first_slow(timeout):
+        with lock:
+            calls.append(timeout)
+            first = len(calls) == 1
+        time.sleep(0.5 if first else 0.0)
+        return "slow" if first else "fast"
+
+    start = time.perf_counter()
+    assert policy.call(first_slow, hedge=True) == "fast"
+    assert time.perf_counter() - start < 0.4
+    assert policy.stats()["hedges"] == 1 and policy.stats()["hedge_wins"] == 1
+    # Calls that are not hedgeable (streams) never send a backup
+    calls.clear()
+    assert policy.call(first_slow) == "slow"
+    policy.close()
+
+
+def test_hedging_counts_from_the_start_of_the_request_and_respects_the_slot_limit():
+    # 24 concurrent 100 ms calls on 8 workers: queued calls wait, but none runs longer than hedge_after
+    policy = ResiliencePolicy(hedge_after=0.2, hedge_workers=8)
+    threads = [threading.Thread(target=policy.call, args=(lambda timeout: time.sleep(0.1),), kwargs={"hedge": True})
+               for _ in range(24)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert policy.stats()["hedges"] == 0
+
+    # No backup is sent while the model's concurrency limit has no free slot
+    slot = threading.BoundedSemaphore(1)
+    with slot:
+        assert policy.call(lambda timeout: time.sleep(0.3) or "primary", hedge=True, hedge_slot=slot) == "primary"
+    assert policy.stats()["hedges"] == 0
+    # With a free slot, the backup holds it until it finishes
+    assert policy.call(lambda timeout: time.sleep(0.3) or "done", hedge=True, hedge_slot=slot) == "done"
+    assert policy.stats()["hedges"] == 1
+    time.sleep(0.35)
+    assert slot.acquire(blocking=False)
+    slot.release()
+    policy.close()
+
+
+def test_circuit_breaker_opens_and_recovers():
+    policy = ResiliencePolicy(max_attempts=1, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.05))
+
+    def down(timeout):
+        raise connection_error()
+
+    for _ in range(2):
+        try:
+            policy.call(down)
+        except openai.APIConnectionError:
+            pass
+    assert policy.breaker.state == "open"
+    try:
+        policy.call(lambda timeout: "never called")
+        assert False, "expected CircuitOpenError"
+    except CircuitOpenError:
+        pass
+
+    time.sleep(0.06)
+    assert policy.breaker.state == "half_open"
+    assert policy.call(lambda timeout: "probe") == "probe"
+    assert policy.breaker.state == "closed" and policy.stats()["short_circuited"] == 1
+
+
+def test_session_completes_during_provider_outage():
+    resilience = ResiliencePolicy(backoff_base=0.001)
+    channel = ScriptedChannel(ANSWERS)
+    handler = run_offline_session(llm_client=FakeLLMClient(error_rate=1.0, resilience=resilience), channel=channel)
+
+    # The LLM-guided pre-story ran on its fallback lines instead of dropping to the basic flow
+    assert "Ella: I need three magic words to unlock our story. Are you ready?" in handler.story_log
+    assert any("Sparky opened the box" in line for line in channel.transcript)
+    assert resilience.breaker.state == "open" and resilience.stats()["short_circuited"] > 0
+
+
+if __name__ == "__main__":
+    test_retries_retryable_errors_only()
+    test_deadline_bounds_slow_calls()
+    test_hedged_request_returns_the_faster_answer()
+    test_hedging_counts_from_the_start_of_the_request_and_respects_the_slot_limit()
+    test_circuit_breaker_opens_and_recovers()
+    test_session_completes_during_provider_outage()
+    print("All resilience tests passed.")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the opt-in response cache and its use by LLMClient.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import httpx
+import openai
+
+from llm_client import LLMClient
+from response_cache import ResponseCache
+
+MESSAGES = [{"role": "system", "content": "Evaluate."}, {"role": "user", "content": "I don't know"}]
+
+
+def fake_completion(content):
+    return {
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+    }
+
+
+def offline_client(cache):
+    """LLMClient whose HTTP transport answers locally and counts requests."""
+    requests = []
+
+    def handle(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json=fake_completion('{"score": 2, "support_level": "high"}'))
+
+    client = LLMClient(api_key="test-key", cache=cache)
+    client.client = openai.OpenAI(api_key="test-key", http_client=httpx.Client(transport=httpx.MockTransport(handle)))
+    return client, requests
+
+
+def test_key_depends_on_model_messages_and_params():
+    key = ResponseCache.make_key("gpt-4o-mini", MESSAGES, {"temperature": 0.1})
+    assert key == ResponseCache.make_key("gpt-4o-mini", MESSAGES, {"temperature": 0.1})
+    assert key != ResponseCache.make_key("gpt-4", MESSAGES, {"temperature": 0.1})
+    assert key != ResponseCache.make_key("gpt-4o-mini", MESSAGES, {"temperature": 0.2})
+    assert key != ResponseCache.make_key("gpt-4o-mini", MESSAGES[:1], {"temperature": 0.1})
+
+
+def test_lru_eviction_and_ttl():
+    cache = ResponseCache(max_entries=2, ttl=0.05)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1 and stats["misses"] == 2 and stats["expired"] == 1
+
+
+def test_sqlite_tier_survives_new_instance():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        first = ResponseCache(db_path=db_path)
+        first.set("key", "payload")
+        first.close()
+        second = ResponseCache(db_path=db_path)
+        assert second.get("key") == "payload"
+        assert second.get("key") == "payload"
+        assert second.stats()["disk_hits"] == 1 and second.stats()["memory_hits"] == 1
+        second.close()
+
+
+def test_llm_client_serves_repeated_cacheable_calls_from_cache():
+    client, requests = offline_client(ResponseCache())
+    for _ in range(3):
+        response = client.chat_completion("gpt-4o-mini", MESSAGES, cacheable=True, temperature=0.1)
+        assert json.loads(response.choices[0].message.content)["score"] == 2
+    assert len(requests) == 1
+
+    # Calls that are not marked cacheable always reach the API
+    client.chat_completion("gpt-4o-mini", MESSAGES, temperature=0.1)
+    assert len(requests) == 2
+    assert client.cache.stats()["memory_hits"] == 2
+
+
+if __name__ == "__main__":
+    test_key_depends_on_model_messages_and_params()
+    test_lru_eviction_and_ttl()
+    test_sqlite_tier_survives_new_instance()
+    test_llm_client_serves_repeated_cacheable_calls_from_cache()
+    print("All response cache tests passed.")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the rule-based pre-classifier and the ScaffoldingSelector fast path.
+"""
+
+from rule_classifier import RulePreClassifier, extract_offered_choices
+from scaffolding_selector import ScaffoldingSelector
+
+CHOICE_RESPONSE = ("That's interesting! I'm not sure whether to use my magic wand or try talking "
+                   "to the friendly monster first. Which do you think I should try?")
+TWO_PATHS = "I see two paths. Should we walk through the misty swamp or climb the sunny hills?"
+
+
+def test_extract_offered_choices():
+    assert extract_offered_choices(TWO_PATHS) == ("Should we walk through the misty swamp", "climb the sunny hills")
+    assert extract_offered_choices("What do you think happens next?") is None
+    assert extract_offered_choices(None) is None
+
+
+def test_offered_choice_match():
+    classifier = RulePreClassifier()
+    decision = classifier.classify("the sunny hills", None, "reducing_choices", TWO_PATHS)
+    assert decision["rule"] == "offered_choice" and decision["support_level"] == "low"
+    # Words from both options are ambiguous and go to the LLM
+    assert classifier.classify("swamp and hills", None, "reducing_choices", TWO_PATHS) is None
+    # Without a reducing_choices turn before, a short answer is not a choice
+    assert classifier.classify("the sunny hills", None, "eliciting", TWO_PATHS) is None
+
+
+def test_short_and_rich_answers():
+    classifier = RulePreClassifier()
+    assert classifier.classify("Yes!", None, None, None)["rule"] == "short_answer"
+    assert classifier.classify("maybe", None, None, None)["support_level"] == "high"
+    rich = "I think the box had a tiny butterfly inside because it was moving around"
+    assert classifier.classify(rich, "box", None, None)["rule"] == "rich_vocab_answer"
+    assert classifier.classify(rich, "alligator", None, None) is None
+    assert classifier.classify("the butterfly was scared", "box", None, None) is None
+
+
+def test_config_overrides():
+    classifier = RulePreClassifier({"short_answers": ["yes"]})
+    assert classifier.classify("maybe", None, None, None) is None
+
+
+def test_selector_fast_path_skips_llm():
+    selector = ScaffoldingSelector(use_llm=False, fast_path=True)
+    selector.previously_used = ["reducing_choices"]
+    prompt = f"Which path should we take?\nPrevious conversation:\nChild: hmm\nRobot: {TWO_PATHS}"
+    result = selector.select_technique("the misty swamp", prompt, "story", "more story", depth=2, max_depth=3)
+    assert result["name"] == "reasoning" and result["support_level"] == "low"
+
+    result = selector.select_technique("yes", "Do you like it?", "story", "more story")
+    assert result["support_level"] == "high" and result["name"] in ["co-participating", "reducing_choices", "eliciting"]
+
+    stats = selector.get_fast_path_stats()
+    assert stats["resolved"] == 2 and stats["escalated"] == 0
+    assert stats["rules"] == {"offered_choice": 1, "short_answer": 1}
+
+
+if __name__ == "__main__":
+    test_extract_offered_choices()
+    test_offered_choice_match()
+    test_short_and_rich_answers()
+    test_config_overrides()
+    test_selector_fast_path_skips_llm()
+    print("All rule classifier tests passed.")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent session engine and its async channels.
+"""
+
+import asyncio
+import os
+import tempfile
+
+from channels import BlockingChannelBridge, QueueChannel
+from fake_llm import FakeLLMClient
+from session_engine import SessionEngine
+from test_fake_llm import ANSWERS, STORY
+
+
+async def scripted_child(channel, answers):
+    """Answer every question on the channel from `answers`, then with "yes"."""
+    answers = list(answers)
+    while True:
+        kind, _ = await channel.outbox.get()
+        if kind == "ask":
+            await channel.inbox.put(answers.pop(0) if answers else "yes")
+
+
+async def run_children(engine, story_path, count):
+    channels = [QueueChannel() for _ in range(count)]
+    children = [asyncio.create_task(scripted_child(channel, [f"child {i} says {answer}" for answer in ANSWERS]))
+                for i, channel in enumerate(channels)]
+    try:
+        return await engine.run_sessions((story_path, channel) for channel in channels)
+    finally:
+        for child in children:
+            child.cancel()
+
+
+def test_concurrent_queue_channel_sessions():
+    with tempfile.TemporaryDirectory() as tmp:
+        story_path = os.path.join(tmp, "story.txt")
+        with open(story_path, "w") as f:
+            f.write(STORY)
+        engine = SessionEngine(llm_client=FakeLLMClient(latency=0.01), max_concurrent_sessions=4)
+        handlers = asyncio.run(run_children(engine, story_path, 4))
+        engine.shutdown()
+
+    assert len(handlers) == 4 and not any(isinstance(handler, Exception) for handler in handlers)
+    assert len({handler.session_id for handler in handlers}) == 4
+    for i, handler in enumerate(handlers):
+        transcript = list(handler.story_log)
+        # Every transcript reaches the ending question, and holds only its own child's answers
+        assert any("What was your favorite part?" in line for line in transcript)
+        assert sum(f"child {i} says" in line for line in transcript if line.startswith("Child")) >= 3
+        assert not any(f"child {j} says" in line for line in transcript for j in range(4) if j != i)
+        # Each session's own worker threads were stopped when it ended
+        assert handler.executor._shutdown
+    assert engine.executor._shutdown
+
+
+def test_bridge_runs_channel_calls_on_the_loop():
+    async def main():
+        channel = QueueChannel()
+        bridge = BlockingChannelBridge(channel, asyncio.get_running_loop())
+        await channel.inbox.put("a rocket")
+        answer = await asyncio.get_running_loop().run_in_executor(None, bridge.ask, "What did you see?")
+        await asyncio.get_running_loop().run_in_executor(None, bridge.say, "Wow!")
+        return answer, [channel.outbox.get_nowait() for _ in range(channel.outbox.qsize())]
+
+    answer, sent = asyncio.run(main())
+    assert answer == "a rocket"
+    assert sent == [("ask", "What did you see?"), ("say", "Wow!")]
+
+
+if __name__ == "__main__":
+    test_concurrent_queue_channel_sessions()
+    test_bridge_runs_channel_calls_on_the_loop()
+    print("All session engine tests passed.")
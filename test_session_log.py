@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming session log: the text and JSONL sinks written during a
+scripted session, and reading a gzipped log that was never closed.
+"""
+
+import os
+import tempfile
+
+from session_log import SessionLog, SessionLogWriter, load_entries
+from test_fake_llm import run_offline_session
+
+
+def test_session_streams_text_and_jsonl_logs():
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path = os.path.join(tmp, "log.txt")
+        jsonl_path = os.path.join(tmp, "log.jsonl.gz")
+        sinks = [SessionLogWriter(text_path), SessionLogWriter(jsonl_path)]
+        handler = run_offline_session(log_sinks=sinks)
+
+        saved_path = os.path.join(tmp, "saved.txt")
+        handler.save_interaction_log(saved_path)
+        with open(text_path) as f, open(saved_path) as g:
+            assert f.read().rstrip("\n") == g.read()
+        entries = load_entries(jsonl_path)
+
+    assert sinks[1].format == "jsonl" and len(entries) == len(handler.story_log)
+    assert [entry["seq"] for entry in entries] == list(range(1, len(entries) + 1))
+    assert all(entry["session_id"] == handler.session_id for entry in entries)
+    strategies = [entry for entry in entries if entry["kind"] == "strategy"]
+    assert strategies and all(isinstance(entry["score"], (int, float)) and entry["technique"]
+                              and isinstance(entry["depth"], int) for entry in strategies)
+    assert any(entry["vocab"] for entry in strategies)
+    children = [entry for entry in entries if entry.get("speaker") == "Child"]
+    assert any(entry["text"] == "I think it is a butterfly" and entry["interaction"] == 0 for entry in children)
+
+
+def test_unclosed_gzip_log_is_readable_up_to_the_last_sync():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "log.jsonl.gz")
+        log = SessionLog([SessionLogWriter(path, fsync_interval=0.0)], session_id="s1", memory_limit=2)
+        for i in range(5):
+            log.append(f"Child: answer {i}", depth=i)
+        # No close(): as if the process had been killed
+        entries = load_entries(path)
+    assert [entry["text"] for entry in entries] == [f"answer {i}" for i in range(5)]
+    assert list(log) == ["Child: answer 3", "Child: answer 4"]
+
+
+if __name__ == "__main__":
+    test_session_streams_text_and_jsonl_logs()
+    test_unclosed_gzip_log_is_readable_up_to_the_last_sync()
+    print("All session log tests passed.")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for precomputed story assets: local and LLM extraction, the cache next to
+the story, and an ending phase that uses the facts instead of the whole story.
+"""
+
+import os
+import random
+import tempfile
+
+import story_assets
+from fake_llm import FakeLLMClient
+from story_assets import assets_path_for, extract_local, load_story_assets
+from test_fake_llm import STORY, run_offline_session
+
+
+def test_local_extraction():
+    assets = extract_local(STORY)
+    assert assets.characters == ["Sparky"]
+    assert assets.key_events == ["Once upon a time Sparky found a box in the garden.",
+                                 "Sparky opened the box and a butterfly flew out."]
+    assert assets.vocab_recap == [{"word": "box", "role": "new",
+                                   "sentence": "Once upon a time Sparky found a box in the garden."}]
+    assert "Key events, in order:\n1. Once upon a time" in assets.as_context()
+    assert "Sparky" in assets.instructions("alternative_ending")
+
+
+def test_assets_are_cached_next_to_the_story():
+    with tempfile.TemporaryDirectory() as tmp:
+        story_path = os.path.join(tmp, "story.txt")
+        assert assets_path_for(story_path) == os.path.join(tmp, "story.assets.json")
+        assert assets_path_for(os.path.join(tmp, "story.story.json")) == os.path.join(tmp, "story.assets.json")
+
+        local = load_story_assets(story_path, STORY)
+        assert os.path.exists(assets_path_for(story_path)) and local.method == "local"
+        story_assets._cache.clear()
+        assert load_story_assets(story_path, STORY).to_dict() == local.to_dict()
+
+        # Local assets are upgraded once an LLM client is given, and then reused
+        client = FakeLLMClient()
+        upgraded = load_story_assets(story_path, STORY, client)
+        assert upgraded.method == "llm:gpt-4o-mini" and "the butterfly" in upgraded.characters
+        assert upgraded.vocab_recap == local.vocab_recap and len(client.calls) == 1
+        story_assets._cache.clear()
+        assert load_story_assets(story_path, STORY, client).to_dict() == upgraded.to_dict()
+        assert len(client.calls) == 1
+
+        # A changed story gets new assets
+        changed = load_story_assets(story_path, STORY.replace("garden", "park"))
+        assert changed.key_events[0].endswith("in the park.")
+
+
+def test_ending_phase_uses_the_story_facts():
+    random.seed(2)
+    client = FakeLLMClient()
+    run_offline_session(pre_story=False, ending_type="alternative_ending", llm_client=client, ending_assets="local")
+
+    evaluations = [call for call in client.calls if "alternative-ending" in call["messages"][0]["content"]]
+    assert evaluations
+    for call in evaluations:
+        assert "Key events, in order:" in call["messages"][-1]["content"]
+        assert "<interaction" not in call["messages"][-1]["content"]
+    ending_responses = [call for call in client.calls if "offer two of these ideas" in call["messages"][-1]["content"]]
+    assert ending_responses and all("Story facts" in call["messages"][-1]["content"] for call in ending_responses)
+
+
+if __name__ == "__main__":
+    test_local_extraction()
+    test_assets_are_cached_next_to_the_story()
+    test_ending_phase_uses_the_story_facts()
+    print("All story asset tests passed.")
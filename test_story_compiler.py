@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for compiled story artifacts: round trip, use by the handler, staleness
+and version checks.
+"""
+
+import json
+import os
+import random
+import tempfile
+
+from bench_parse_story import generate_story
+from channels import ScriptedChannel
+from story_compiler import StoryArtifactError, compile_file, compile_story, is_stale, load_compiled_story
+from story_sections import parse_story_sections
+from test_fake_llm import ANSWERS, STORY, run_offline_session
+from test_story_sections import TEST_STORY
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_artifact_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        for story in [TEST_STORY, generate_story(25), "A story without interactions."]:
+            story_path = os.path.join(tmp, "story.txt")
+            write(story_path, story)
+            artifact_path = compile_file(story_path)
+            assert artifact_path == os.path.join(tmp, "story.story.json")
+            compiled = load_compiled_story(artifact_path)
+            parsed = parse_story_sections(story)
+            assert [section.to_dict() for section in compiled.sections] == [section.to_dict() for section in parsed]
+            assert [section.display_text for section in compiled.sections] == [
+                section.display_text for section in parsed]
+            # Unchanged artifacts are served from the process-wide cache
+            assert load_compiled_story(artifact_path) is compiled
+    assert compile_story(TEST_STORY)["vocabs"] is None
+    assert compile_story(generate_story(5))["vocabs"] == ["jumped", "box", "tiny"]
+
+
+def run_session(story_path):
+    random.seed(7)
+    channel = ScriptedChannel(ANSWERS)
+    handler = run_offline_session(story_path=story_path, channel=channel)
+    return handler, channel
+
+
+def test_handler_runs_the_same_session_from_an_artifact():
+    with tempfile.TemporaryDirectory() as tmp:
+        story_path = os.path.join(tmp, "story.txt")
+        write(story_path, STORY)
+        artifact_path = compile_file(story_path)
+        from_text, text_channel = run_session(story_path)
+        from_artifact, artifact_channel = run_session(artifact_path)
+    assert artifact_channel.transcript == text_channel.transcript
+    assert list(from_artifact.story_log) == list(from_text.story_log)
+    assert from_artifact.story_sections is from_artifact.compiled_story.sections
+
+
+def test_stale_and_unsupported_artifacts():
+    with tempfile.TemporaryDirectory() as tmp:
+        story_path = os.path.join(tmp, "story.txt")
+        write(story_path, TEST_STORY)
+        artifact_path = compile_file(story_path)
+        assert not is_stale(artifact_path, load_compiled_story(artifact_path))
+        write(story_path, TEST_STORY + "\nA new ending.")
+        assert is_stale(artifact_path, load_compiled_story(artifact_path))
+
+        with open(artifact_path) as f:
+            artifact = json.load(f)
+        for change in [{"version": 99}, {"content_hash": "0" * 64}, {"sections": [[0]]}]:
+            write(artifact_path, json.dumps({**artifact, **change}))
+            try:
+                load_compiled_story(artifact_path)
+                assert False, "expected StoryArtifactError"
+            except StoryArtifactError:
+                pass
+
+
+if __name__ == "__main__":
+    test_artifact_round_trip()
+    test_handler_runs_the_same_session_from_an_artifact()
+    test_stale_and_unsupported_artifacts()
+    print("All story compiler tests passed.")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for the story-aware local ending scorer: keywords taken from the story,
+calibration against LLM scores, and first-pass and replacement modes.
+"""
+
+import os
+import random
+import tempfile
+
+from channels import ScriptedChannel
+from fake_llm import FakeLLMClient
+from scaffolding_selector import ScaffoldingSelector
+from story_scorer import StoryKeywords, StoryScorer, fit_calibration, load_calibration, save_calibration
+from test_fake_llm import STORY, run_offline_session
+
+DRAGON_STORY = """Mia met a dragon near the old castle.
+
+<interaction vocab="castle" role="new">Who lives in the castle?</interaction>
+
+The dragon was sad because it had lost its golden egg.
+
+<interaction vocab="golden" role="new">What color was the egg?</interaction>
+
+Mia searched the forest and found the egg under a tree. The dragon smiled and they became friends.
+
+<interaction vocab="summary">Can you tell me the story?</interaction>
+"""
+
+
+def test_keywords_come_from_the_story():
+    scorer = StoryScorer(StoryKeywords.for_story(DRAGON_STORY))
+    good = scorer.score("story_retelling", "Mia met a dragon at the castle, then the dragon lost its golden egg "
+                                           "and Mia searched the forest and found the egg")
+    reversed_order = scorer.score("story_retelling", "Mia found the egg in the forest and then met the dragon "
+                                                     "at the castle")
+    assert good["support_level"] == "low" and good["rationale"]["sequence_accuracy"] == 2
+    assert reversed_order["rationale"]["sequence_accuracy"] < 2
+    assert scorer.score("story_retelling", "I don't remember")["support_level"] == "high"
+
+    # The old rubric's hard-coded words mean nothing for this story
+    selector = ScaffoldingSelector(use_llm=False)
+    assert selector._evaluate_retelling_complexity("Sparky and the butterfly in the garden box", DRAGON_STORY)[
+        "support_level"] == "high"
+    assert selector._evaluate_retelling_complexity("Sparky opened the box and a butterfly flew out of it",
+                                                   STORY)["rationale"]["character_involvement"] == 2
+
+    ending = scorer.score("alternative_ending", "What if the dragon flew Mia home to the castle with the golden "
+                                                "egg because they were friends")
+    assert ending["support_level"] == "low" and ending["rationale"]["character_consistency"] == 2
+
+
+def test_calibration_is_fitted_and_saved():
+    pairs = [("story_retelling", raw, 0.5 * raw + 2) for raw in range(0, 11, 2)]
+    calibration = fit_calibration(pairs + [("alternative_ending", 4, 9)])
+    assert calibration["story_retelling"]["slope"] == 0.5 and calibration["story_retelling"]["intercept"] == 2
+    assert calibration["story_retelling"]["mean_abs_error"] == 0
+    # Too few samples keep the identity mapping
+    assert calibration["alternative_ending"]["slope"] == 1.0 and calibration["alternative_ending"]["samples"] == 1
+
+    scorer = StoryScorer(StoryKeywords.for_story(DRAGON_STORY), calibration)
+    assert scorer.score("story_retelling", "um")["score"] == 2
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "calibration.json")
+        save_calibration(calibration, path)
+        assert load_calibration(path) == calibration
+        with open(path, "w") as f:
+            f.write('{"story_retelling": 3}')
+        try:
+            load_calibration(path)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+
+
+def test_first_pass_asks_the_llm_only_near_a_boundary():
+    client = FakeLLMClient()
+    selector = ScaffoldingSelector(llm_client=client, ending_scorer="first_pass")
+    clear = selector._evaluate_alt_ending_complexity_llm("a cat", DRAGON_STORY)
+    assert clear["method"] == "local" and not client.calls
+    # Two characters and the target word, but a short answer: raw score 6, next to the medium/low boundary
+    close = selector._evaluate_retelling_complexity_llm("Mia and the dragon at the castle", DRAGON_STORY)
+    assert close["rationale"] == ["fake"] * 5 and len(client.calls) == 1
+    stats = selector.get_ending_scorer_stats()
+    assert stats["resolved"] == 1 and stats["escalated"] == 1 and stats["comparisons"] == 1
+
+    try:
+        ScaffoldingSelector(llm_client=client, ending_scorer="always")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_local_mode_replaces_the_llm_evaluator_in_a_session():
+    random.seed(2)
+    client = FakeLLMClient()
+    answers = ["a butterfly", "it flew", "Sparky found a box in the garden and then he opened the box "
+                                         "and a butterfly flew out"]
+    handler = run_offline_session(pre_story=False, ending_type="story_retelling", llm_client=client,
+                                  channel=ScriptedChannel(answers, default="yes", max_default_answers=20),
+                                  ending_scorer="local")
+
+    assert handler.scaffolding_selector.story_keywords is not None
+    assert not any("story-retelling answers" in call["messages"][0]["content"] for call in client.calls)
+    assert handler.scaffolding_selector.get_ending_scorer_stats()["resolved"] > 0
+
+
+if __name__ == "__main__":
+    test_keywords_come_from_the_story()
+    test_calibration_is_fitted_and_saved()
+    test_first_pass_asks_the_llm_only_near_a_boundary()
+    test_local_mode_replaces_the_llm_evaluator_in_a_session()
+    print("All story scorer tests passed.")
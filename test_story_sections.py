@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the offset-based story sections produced by parse_story_sections.
+"""
+
+from bench_parse_story import generate_story, legacy_parse_story
+from story_sections import parse_story_sections
+
+TEST_STORY = """Once upon a time, Sparky found a box in the garden.
+
+<interaction vocab="box" role="new">What do you think is in the box?</interaction>
+
+A butterfly flew out of the box!
+
+<interaction vocab="summary">What was your favorite part of the story?</interaction>
+
+The end."""
+
+
+def test_sections_match_legacy_dicts():
+    """Sections expose the same values as the previous dict-based parser."""
+    for story in [TEST_STORY, generate_story(25), "A story without interactions.", ""]:
+        legacy = legacy_parse_story(story)
+        sections = parse_story_sections(story)
+        if not legacy:
+            # The previous parser returned a single text-only section without context keys
+            assert len(sections) == 1 and sections[0]["text"] == story and sections[0]["prompt"] is None
+            continue
+        assert [section.to_dict() for section in sections] == legacy
+
+
+def test_dict_style_access():
+    """Existing callers use section['key'] access."""
+    sections = parse_story_sections(TEST_STORY)
+    first, summary, trailing = sections
+    assert first["prompt"] == "What do you think is in the box?"
+    assert first["vocab"] == "box" and first["vocab_role"] == "new"
+    assert summary["special_tag"] == "summary" and summary["vocab"] is None
+    assert summary["context_after"] == "\n\nThe end."
+    assert trailing["prompt"] is None and trailing["context_before"] == ""
+    try:
+        first["missing"]
+        assert False, "Expected KeyError"
+    except KeyError:
+        pass
+
+
+def test_sections_share_story_buffer():
+    """Sections keep a reference to the story instead of copies of it."""
+    story = generate_story(100)
+    sections = parse_story_sections(story)
+    assert all(section.story is story for section in sections)
+
+
+if __name__ == "__main__":
+    test_sections_match_legacy_dicts()
+    test_dict_style_access()
+    test_sections_share_story_buffer()
+    print("All story section tests passed.")
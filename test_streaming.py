@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed robot responses in a whole session: what is shown, what is
+logged, and the fallback line when every request fails.
+"""
+
+import random
+
+from fake_llm import FakeLLMClient
+from response_generator import ResponseGenerator
+from test_fake_llm import run_offline_session
+
+# Story retelling responses without a question get one added by post-processing
+REPLY = "You remember the box."
+RETELLING_REPLY = f"{REPLY} What else do you remember from the story?"
+
+
+def run_retelling_session(stream_responses, **client_kwargs):
+    random.seed(5)
+    client = FakeLLMClient(routes=[("Follow these response guidelines", REPLY)], **client_kwargs)
+    return run_offline_session(pre_story=False, ending_type="story_retelling", llm_client=client,
+                               stream_responses=stream_responses)
+
+
+def robot_responses(handler):
+    """The logged robot responses, without the story text."""
+    return [line for line in handler.story_log if line.startswith("Robot: ")]
+
+
+def test_streamed_session_logs_the_post_processed_text():
+    streamed = run_retelling_session(True, token_latency=0.001)
+    turns = streamed.turn_latencies
+    assert len(turns) == len(robot_responses(streamed))
+    assert all(turn["first_token_latency"] <= turn["total_latency"] for turn in turns)
+
+    # The log holds the post-processed full text, exactly as without streaming
+    assert list(streamed.story_log) == list(run_retelling_session(False).story_log)
+    retellings = [turn for turn in turns if turn["technique"] == "story_retelling"]
+    assert retellings and robot_responses(streamed)[-len(retellings):] == [f"Robot: {RETELLING_REPLY}"] * len(retellings)
+
+    # The child first sees the raw stream, then the corrected text once post-processing changed it
+    transcript = streamed.channel.transcript
+    shown = [line for line in transcript if line in (f"Robot: {REPLY}", f"Robot: {RETELLING_REPLY}")]
+    assert shown[-2 * len(retellings):] == [f"Robot: {REPLY}", f"Robot: {RETELLING_REPLY}"] * len(retellings)
+
+
+def test_streamed_session_falls_back_when_every_request_fails():
+    handler = run_retelling_session(True, error_rate=1.0)
+    responses = robot_responses(handler)
+    assert responses and len(responses) == len(handler.turn_latencies)
+    assert all(line == f"Robot: {ResponseGenerator.FALLBACK_RESPONSE}" for line in responses)
+    assert any("What do you think is in the box?" in line for line in handler.channel.transcript)
+
+
+if __name__ == "__main__":
+    test_streamed_session_logs_the_post_processed_text()
+    test_streamed_session_falls_back_when_every_request_fails()
+    print("All streaming tests passed.")
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Tests for the output sanitization pipeline.
+"""
+
+from bench_text_sanitizer import generate_lines, legacy_clean_response, legacy_remove_emojis
+from text_sanitizer import remove_emojis, sanitize_line, strip_quotes
+
+
+def test_emojis_and_spaces_collapse_in_one_pass():
+    assert sanitize_line("Great job! \U0001F389 Let's go!") == "Great job! Let's go!"
+    assert sanitize_line("Wow\U0001F308! So pretty  ✨") == "Wow! So pretty"
+    assert sanitize_line("Yay✨✨ friends") == "Yay friends"
+    assert sanitize_line("  \"What a  lovely\tday!\"  ") == "What a lovely day!"
+    assert sanitize_line("Line one.\nLine two.") == "Line one.\nLine two."
+    assert sanitize_line(None) == ""
+
+
+def test_matches_previous_steps_apart_from_spacing():
+    for line in generate_lines(2000):
+        legacy = legacy_clean_response(legacy_remove_emojis(line.strip()))
+        assert sanitize_line(line) == " ".join(legacy.split())
+
+
+def test_helpers_keep_previous_behavior():
+    assert remove_emojis("Hi \U0001F60A") == legacy_remove_emojis("Hi \U0001F60A")
+    assert strip_quotes('"Hello"') == legacy_clean_response('"Hello"')
+    assert strip_quotes(None) == ""
+
+
+if __name__ == "__main__":
+    test_emojis_and_spaces_collapse_in_one_pass()
+    test_matches_previous_steps_apart_from_spacing()
+    test_helpers_keep_previous_behavior()
+    print("All text sanitizer tests passed.")
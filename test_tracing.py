@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the LLM call spans: call sites and session fields in a scripted
+session, retry counting in LLMClient, and the JSONL/OTLP exports.
+"""
+
+import json
+import os
+import tempfile
+
+import httpx
+import openai
+
+from fake_llm import FakeLLMClient
+from llm_client import LLMClient
+from resilience import ResiliencePolicy
+from test_fake_llm import run_offline_session
+from tracing import Tracer, llm_call_site, load_jsonl, summarize, trace_context
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+
+def test_session_spans_have_call_sites_and_session_fields():
+    tracer = Tracer()
+    handler = run_offline_session(llm_client=FakeLLMClient(tracer=tracer), stream_responses=True)
+
+    sites = {span["call_site"] for span in tracer.spans}
+    assert {"pre_story_checkin", "pre_story_game_intro", "pre_story_theme_ack", "generate_response"} <= sites
+    assert "unknown" not in sites
+    # Prefetched lines run on worker threads and still belong to the session
+    assert all(span["session_id"] == handler.session_id for span in tracer.spans)
+    responses = [span for span in tracer.spans if span["call_site"] == "generate_response"]
+    assert all("interaction" in span and "depth" in span for span in responses)
+    assert all(span["first_token_latency"] is not None and span["prompt_tokens"] for span in responses)
+    assert summarize(tracer.spans)["generate_response"]["calls"] == len(responses)
+
+
+def test_stream_span_keeps_call_site_of_the_call():
+    tracer = Tracer()
+    client = FakeLLMClient(tracer=tracer)
+    with llm_call_site("generate_response"), trace_context(depth=2):
+        stream = client.chat_completion_stream("gpt-4", MESSAGES, stream_options={"include_usage": True})
+    # Consumed after the block exited
+    list(stream)
+    span = tracer.spans[0]
+    assert span["call_site"] == "generate_response" and span["depth"] == 2
+    assert span["completion_tokens"] is not None
+
+
+def test_llm_client_counts_retries_and_errors():
+    tracer = Tracer()
+    client = LLMClient(api_key="test-key", tracer=tracer,
+                       resilience=ResiliencePolicy(max_attempts=2, backoff_base=0.001))
+    requests = []
+
+    def handle(request):
+        requests.append(request)
+        if len(requests) == 1:
+            return httpx.Response(429, headers={"retry-after-ms": "1"}, json={"error": {"message": "slow down"}})
+        return httpx.Response(200, json={
+            "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "Hi"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11}
+        })
+
+    client.client = openai.OpenAI(api_key="test-key", max_retries=0,
+                                  http_client=httpx.Client(transport=httpx.MockTransport(handle)))
+    with llm_call_site("select_technique"):
+        client.chat_completion("gpt-4o-mini", MESSAGES)
+    span = tracer.spans[0]
+    assert span["retries"] == 1 and span["prompt_tokens"] == 10 and span["error"] is None
+
+    requests.clear()
+    client.resilience.max_attempts = 1
+    try:
+        client.chat_completion("gpt-4o-mini", MESSAGES)
+        assert False, "expected RateLimitError"
+    except openai.RateLimitError:
+        pass
+    assert tracer.spans[1]["error"].startswith("RateLimitError")
+    assert summarize(tracer.spans)["unknown"]["errors"] == 1
+
+
+def test_exports():
+    tracer = Tracer()
+    client = FakeLLMClient(tracer=tracer)
+    with trace_context(session_id="c18560f0-03b6-434a-9e5c-0200d56acd20", interaction=3):
+        for site in ("select_technique", "generate_response", "generate_response"):
+            with llm_call_site(site):
+                client.chat_completion("gpt-4o-mini", MESSAGES)
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl_path = os.path.join(tmp, "traces.jsonl")
+        otlp_path = os.path.join(tmp, "traces.json")
+        tracer.export_jsonl(jsonl_path)
+        tracer.export_otlp_json(otlp_path)
+        assert load_jsonl(jsonl_path) == tracer.spans
+        with open(otlp_path) as f:
+            otlp = json.load(f)
+    spans = otlp["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert [span["name"] for span in spans] == ["select_technique", "generate_response", "generate_response"]
+    assert {span["traceId"] for span in spans} == {"c18560f003b6434a9e5c0200d56acd20"}
+    attributes = {item["key"]: item["value"] for item in spans[0]["attributes"]}
+    assert attributes["llm.interaction"] == {"intValue": "3"}
+    assert "generate_response" in tracer.format_summary()
+
+
+if __name__ == "__main__":
+    test_session_spans_have_call_sites_and_session_fields()
+    test_stream_span_keeps_call_site_of_the_call()
+    test_llm_client_counts_retries_and_errors()
+    test_exports()
+    print("All tracing tests passed.")
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for the follow-up turn loop in StoryInteractionHandler.handle_interaction:
+it must behave as the recursive version did, with a bounded conversation history,
+and answer a child's question alongside the technique selection.
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from channels import ScriptedChannel
+from fake_llm import DEFAULT_COMPLETION, FakeLLMClient
+from interaction_handler import StoryInteractionHandler
+from test_fake_llm import STORY
+
+PROMPT = "What do you think is in the box?"
+FIRST_REPLY = "Where is it? I wonder. Where is it?"
+FOLLOW_UP_REPLY = "Good thinking! What else could be in the box?"
+
+
+def scaffolding_reply(messages):
+    """FIRST_REPLY to the child's first answer, FOLLOW_UP_REPLY to every later one."""
+    if '"a rainbow"' in messages[-1]["content"]:
+        return FIRST_REPLY
+    return FOLLOW_UP_REPLY
+
+
+def run_interaction(max_interaction_depth, completion=None, child_input="a rainbow", routes=(), latency=0.0):
+    """Run the story's first interaction from the child's answer."""
+    # The transition prompt has no common guidelines, so transitions get DEFAULT_COMPLETION
+    client = FakeLLMClient(routes=[*routes, ("Follow these response guidelines", completion or scaffolding_reply)],
+                           latency=latency)
+    channel = ScriptedChannel([f"answer {i}" for i in range(20)])
+    with tempfile.TemporaryDirectory() as tmp:
+        story_path = os.path.join(tmp, "story.txt")
+        with open(story_path, "w") as f:
+            f.write(STORY)
+        with StoryInteractionHandler(story_path, llm_client=client, channel=channel, auto_start=False,
+                                     max_interaction_depth=max_interaction_depth) as handler:
+            result = handler.handle_interaction(child_input, PROMPT, "Once upon a time Sparky found a box.",
+                                                "Sparky opened the box.", "box", "new")
+    return result, handler, client, channel
+
+
+def test_follow_up_turns_up_to_max_depth():
+    for max_depth in (1, 2, 3, 5):
+        result, handler, client, channel = run_interaction(max_depth)
+        transcript = list(handler.story_log)
+        strategies = [line for line in transcript if line.startswith("[Scaffolding Strategy")]
+
+        # One turn per depth, with a child follow-up between turns
+        assert channel.asks == max_depth - 1
+        assert len(strategies) == max_depth
+        expected_children = [f"Child (Follow-up {depth}): answer {depth - 1}" if depth > 1 else "Child: answer 0"
+                             for depth in range(1, max_depth)]
+        assert [line for line in transcript if line.startswith("Child")] == expected_children
+
+        # The last turn is the transition, chosen without asking the selector
+        assert strategies[-1].startswith("[Scaffolding Strategy: transition (low support)")
+        assert not any("transition" in line for line in strategies[:-1])
+        selections = [call for call in client.calls if "selects appropriate" in call["messages"][0]["content"]]
+        assert len(selections) == max_depth - 1
+
+        # The first turn's technique is returned, with the final response
+        assert isinstance(result, tuple) and len(result) == 2
+        response, technique = result
+        assert technique["name"] != "transition" or max_depth == 1
+        assert technique["name"] in strategies[0]
+        if max_depth == 1:
+            assert response == DEFAULT_COMPLETION
+        else:
+            # The first turn's text after its question is added once, to the final response only
+            assert response == f"{DEFAULT_COMPLETION} I wonder. Where is it?"
+            assert transcript[-1] == f"Robot: {DEFAULT_COMPLETION}"
+            assert all(line.count("I wonder") <= 1 for line in transcript)
+
+
+def test_no_follow_up_without_a_question():
+    result, handler, client, channel = run_interaction(3, completion="Great job, a rainbow in the box.")
+    assert channel.asks == 0
+    assert result[0] == "Great job, a rainbow in the box."
+    assert [line for line in handler.story_log if line.startswith("Robot")] == ["Robot: Great job, a rainbow in the box."]
+
+
+def test_history_is_capped_at_max_turns():
+    result, handler, client, channel = run_interaction(10)
+    assert channel.asks == 9
+    responses = [call for call in client.calls if "selects appropriate" not in call["messages"][0]["content"]]
+    assert len(responses) == 10
+
+    # Every prompt carries the history once, and never more than max_turns exchanges
+    for call in responses:
+        user_prompt = call["messages"][-1]["content"]
+        assert user_prompt.count("Previous conversation:") <= 1
+        history = [line for line in user_prompt.splitlines() if line.startswith(("Child: ", "Robot: "))]
+        assert len(history) <= 6 * 2
+    last_history = [line for line in responses[-1]["messages"][-1]["content"].splitlines()
+                    if line.startswith(("Child: ", "Robot: "))]
+    # The last turn sees only the six exchanges before the child's last answer
+    assert last_history[0] == "Child: answer 2" and last_history[-1] == f"Robot: {FOLLOW_UP_REPLY}"
+    assert '"answer 8"' in responses[-1]["messages"][-1]["content"]
+
+
+def test_quick_answer_runs_alongside_technique_selection():
+    latency = 0.3
+    start = time.perf_counter()
+    result, handler, client, channel = run_interaction(
+        2, completion="Great job, a butterfly in the box.", child_input="Is it a butterfly?",
+        routes=[("answer the child's question", "Butterflies love gardens!")], latency=latency)
+    elapsed = time.perf_counter() - start
+
+    # The answer to the child's question is said and logged before the robot's response
+    assert channel.transcript.index("Ella: Butterflies love gardens!") < channel.transcript.index(
+        "Robot: Great job, a butterfly in the box.")
+    transcript = list(handler.story_log)
+    assert transcript.index("Ella: Butterflies love gardens!") < transcript.index(
+        "Robot: Great job, a butterfly in the box.")
+
+    # It is generated on a worker thread while the technique is selected: the turn's three
+    # calls take about two calls' latency, not three
+    assert len(client.calls) == 3
+    quick = [call for call in client.calls if "answer the child's question" in call["messages"][0]["content"]]
+    assert len(quick) == 1 and quick[0]["messages"][-1]["content"] == "Is it a butterfly?"
+    assert quick[0]["thread"] != threading.get_ident()
+    assert all(call["thread"] == threading.get_ident() for call in client.calls if call is not quick[0])
+    assert elapsed < 2.5 * latency
+    assert result[0] == "Great job, a butterfly in the box."
+
+
+if __name__ == "__main__":
+    test_follow_up_turns_up_to_max_depth()
+    test_no_follow_up_without_a_question()
+    test_history_is_capped_at_max_turns()
+    test_quick_answer_runs_alongside_technique_selection()
+    print("All turn loop tests passed.")
@@ -0,0 +1,56 @@
+import re
+from typing import Optional
+
+# Emoji ranges removed from every robot line
+EMOJI_RANGES = (
+    "\U0001F600-\U0001F64F"  # emoticons
+    "\U0001F300-\U0001F5FF"  # symbols & pictographs
+    "\U0001F680-\U0001F6FF"  # transport & map symbols
+    "\U0001F1E0-\U0001F1FF"  # flags (iOS)
+    "\U00002700-\U000027BF"  # Dingbats
+    "\U000024C2-\U0001F251"  # Enclosed characters
+)
+EMOJI_PATTERN = re.compile(f"[{EMOJI_RANGES}]+")
+
+# Runs of spaces or tabs, including the ones left around removed emojis
+_SPACE_RUN_PATTERN = re.compile(r"[ \t]{2,}|\t")
+
+
+def remove_emojis(text: str) -> str:
+    """Remove emoji characters from text."""
+    return EMOJI_PATTERN.sub("", text)
+
+
+def strip_quotes(text: Optional[str]) -> str:
+    """Remove one pair of surrounding double quotes and surrounding whitespace."""
+    if text is None:
+        return ""
+    if text.startswith('"'):
+        text = text[1:]
+    if text.endswith('"'):
+        text = text[:-1]
+    return text.strip()
+
+
+def sanitize_line(text: Optional[str]) -> str:
+    """Clean a generated robot line before it is shown and logged.
+
+    Emojis are removed, the spaces left around them and other runs of spaces
+    are collapsed to one, and surrounding quotes and whitespace are stripped.
+    Newlines are kept.
+
+    Args:
+        text: The generated line
+
+    Returns:
+        str: The cleaned line ("" for None)
+    """
+    if text is None:
+        return ""
+    # Every emoji range lies outside ASCII, so plain ASCII lines (most of them)
+    # skip the emoji scan and only need a regex when they contain repeated spaces
+    if not text.isascii():
+        text = EMOJI_PATTERN.sub("", text)
+    if "  " in text or "\t" in text:
+        text = _SPACE_RUN_PATTERN.sub(" ", text)
+    return strip_quotes(text.strip())
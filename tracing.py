@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Structured spans around LLM calls.
+
+Every call made through an LLMClient (or FakeLLMClient) with a Tracer records a
+span with its call site, model, prompt/completion/cached tokens, latency, retry
+count and the session / interaction / depth it belongs to. The call site and
+the session fields are carried in context variables, so code only has to wrap a
+call in `llm_call_site("...")` and the handler sets `trace_context(...)` once
+per turn. Work submitted to other threads must run in a copy of the current
+context (contextvars.copy_context().run) to keep these fields.
+
+Spans can be exported as JSONL or as OTLP/JSON (OpenTelemetry) and summarized
+per call site. Run this module on an exported JSONL file to print the summary:
+
+Usage: python tracing.py traces.jsonl
+"""
+
+import contextvars
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+_call_site: contextvars.ContextVar = contextvars.ContextVar("llm_call_site", default="unknown")
+_trace_fields: contextvars.ContextVar = contextvars.ContextVar("trace_fields", default={})
+
+
+@contextmanager
+def llm_call_site(name: str) -> Iterator[None]:
+    """Name the LLM calls made inside the block (e.g. "select_technique")."""
+    token = _call_site.set(name)
+    try:
+        yield
+    finally:
+        _call_site.reset(token)
+
+
+@contextmanager
+def trace_context(**fields: Any) -> Iterator[None]:
+    """Attach fields such as session_id, interaction and depth to the spans recorded inside the block."""
+    token = _trace_fields.set({**_trace_fields.get(), **fields})
+    try:
+        yield
+    finally:
+        _trace_fields.reset(token)
+
+
+def set_trace_context(**fields: Any) -> None:
+    """Attach fields to all later spans in the current context (e.g. the session id at session start)."""
+    _trace_fields.set({**_trace_fields.get(), **fields})
+
+
+def current_trace() -> Tuple[str, Dict[str, Any]]:
+    """Return the current call site and trace fields.
+
+    Streaming calls capture these when the call is made, since the stream may
+    be consumed after the caller's `llm_call_site` block has exited.
+    """
+    return _call_site.get(), dict(_trace_fields.get())
+
+
+class LLMSpan:
+    """One LLM call being timed. Created by Tracer.llm_span."""
+
+    def __init__(self, model: str, trace: Optional[Tuple[str, Dict[str, Any]]] = None):
+        self.model = model
+        self.call_site, self.fields = trace or current_trace()
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.first_token_latency: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.cached_tokens: Optional[int] = None
+        self.retries = 0
+        self.hedged = False
+        self.cache_hit = False
+        self.error: Optional[str] = None
+
+    def set_usage(self, usage: Any) -> None:
+        """Take token counts from an OpenAI usage object (ignored if None)."""
+        if usage is None:
+            return
+        self.prompt_tokens = usage.prompt_tokens
+        self.completion_tokens = usage.completion_tokens
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+    def first_token(self) -> None:
+        """Mark the arrival of the first streamed chunk."""
+        if self.first_token_latency is None:
+            self.first_token_latency = time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        latency = time.perf_counter() - self._start
+        return {
+            "span_id": uuid.uuid4().hex[:16],
+            "call_site": self.call_site,
+            "model": self.model,
+            "start_time": self.start_time,
+            "latency": latency,
+            "first_token_latency": self.first_token_latency,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "retries": self.retries,
+            "hedged": self.hedged,
+            "cache_hit": self.cache_hit,
+            "error": self.error,
+            **self.fields
+        }
+
+
+class Tracer:
+    """Collects LLM call spans and exports them."""
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def llm_span(self, model: str, trace: Optional[Tuple[str, Dict[str, Any]]] = None) -> Iterator[LLMSpan]:
+        """Time one LLM call; the span is recorded when the block exits (also on errors).
+
+        Args:
+            model: Model name
+            trace: (call site, fields) captured earlier with current_trace(); defaults to the current ones
+        """
+        span = LLMSpan(model, trace)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record = span.to_dict()
+            with self._lock:
+                self.spans.append(record)
+
+    def export_jsonl(self, path: str) -> None:
+        """Write one JSON object per span."""
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "w") as f:
+            for span in spans:
+                f.write(json.dumps(span) + "\n")
+
+    def export_otlp_json(self, path: str, service_name: str = "interaction-handler") -> None:
+        """Write the spans in the OTLP/JSON format accepted by OpenTelemetry collectors."""
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "w") as f:
+            json.dump(to_otlp(spans, service_name), f)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return summarize(self.spans)
+
+    def format_summary(self) -> str:
+        with self._lock:
+            return format_summary(self.spans)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[Dict[str, Any]], service_name: str = "interaction-handler") -> Dict[str, Any]:
+    """Convert span dicts to an OTLP/JSON ExportTraceServiceRequest. Each session is one trace."""
+    trace_ids: Dict[Any, str] = {}
+    otlp_spans = []
+    for span in spans:
+        session = span.get("session_id")
+        trace_id = trace_ids.setdefault(session, uuid.UUID(session).hex if _is_uuid(session) else uuid.uuid4().hex)
+        start_ns = int(span["start_time"] * 1e9)
+        attributes = [{"key": f"llm.{key}", "value": _otlp_value(value)} for key, value in span.items()
+                      if key not in ("span_id", "start_time", "latency", "call_site", "error") and value is not None]
+        otlp_spans.append({
+            "traceId": trace_id,
+            "spanId": span["span_id"],
+            "name": span["call_site"],
+            "kind": 3,  # SPAN_KIND_CLIENT
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int(span["latency"] * 1e9)),
+            "attributes": attributes,
+            "status": {"code": 2, "message": span["error"]} if span.get("error") else {"code": 1}
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "interaction_handler.llm"}, "spans": otlp_spans}]
+    }]}
+
+
+def _is_uuid(value: Any) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per call site: call count, p50/p95 latency, mean tokens, retries, cache hits and errors."""
+    by_site: Dict[str, List[Dict[str, Any]]] = {}
+    for span in spans:
+        by_site.setdefault(span["call_site"], []).append(span)
+    summary = {}
+    for site, site_spans in sorted(by_site.items()):
+        latencies = [span["latency"] for span in site_spans]
+        prompt_tokens = [span["prompt_tokens"] for span in site_spans if span.get("prompt_tokens") is not None]
+        summary[site] = {
+            "calls": len(site_spans),
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "total_latency": sum(latencies),
+            "mean_prompt_tokens": sum(prompt_tokens) / len(prompt_tokens) if prompt_tokens else None,
+            "retries": sum(span.get("retries", 0) for span in site_spans),
+            "cache_hits": sum(1 for span in site_spans if span.get("cache_hit")),
+            "errors": sum(1 for span in site_spans if span.get("error"))
+        }
+    return summary
+
+
+def format_summary(spans: List[Dict[str, Any]]) -> str:
+    """Table of the per-call-site summary."""
+    summary = summarize(spans)
+    lines = [f"{'call site':<28} {'calls':>5} {'p50 s':>7} {'p95 s':>7} {'total s':>8} "
+             f"{'prompt tok':>10} {'retries':>7} {'cache hits':>10} {'errors':>6}"]
+    for site, stats in summary.items():
+        tokens = f"{stats['mean_prompt_tokens']:.0f}" if stats["mean_prompt_tokens"] is not None else "-"
+        lines.append(f"{site:<28} {stats['calls']:>5} {stats['p50']:>7.3f} {stats['p95']:>7.3f} "
+                     f"{stats['total_latency']:>8.2f} {tokens:>10} {stats['retries']:>7} "
+                     f"{stats['cache_hits']:>10} {stats['errors']:>6}")
+    return "\n".join(lines)
+
+
+def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    if len(sys.argv) != 2 or not os.path.exists(sys.argv[1]):
+        print("Usage: python tracing.py traces.jsonl")
+        sys.exit(1)
+    print(format_summary(load_jsonl(sys.argv[1])))
+
+
+if __name__ == "__main__":
+    main()